@@ -0,0 +1,66 @@
+import asyncio
+import re
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics, job
+from api.db.database import Base, DATABASE_URL
+
+config = context.config
+
+# Skip logging setup when migrations are run from inside the application
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Virtual tables and their shadow tables are created by hand: FTS5 search (0004), R*Tree (0005)
+VIRTUAL_TABLE = re.compile(r".+_(fts|rtree)(_(data|idx|content|docsize|config|node|rowid|parent))?$")
+
+def include_name(name, type_, parent_names) -> bool:
+    return not (type_ == "table" and VIRTUAL_TABLE.match(name or ""))
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_name=include_name,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def do_run_migrations(connection) -> None:
+    # Batch mode lets ALTER-style operations work on SQLite
+    context.configure(
+        connection=connection, target_metadata=target_metadata, render_as_batch=True, include_name=include_name
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+async def run_async_migrations() -> None:
+    engine = create_async_engine(database_url())
+    async with engine.begin() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+def run_migrations_online() -> None:
+    # The application passes its own connection in (see api.db.migrations)
+    connection = config.attributes.get("connection")
+    if connection is None:
+        asyncio.run(run_async_migrations())
+    else:
+        do_run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
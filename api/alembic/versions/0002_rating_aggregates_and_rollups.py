@@ -0,0 +1,117 @@
+"""Restaurant rating aggregates and analytics rollup tables
+
+Both are backfilled from the existing reviews/orders data.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('restaurants') as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'restaurant_stats',
+        sa.Column('restaurant_id', sa.Integer(), nullable=False),
+        sa.Column('total_orders', sa.Integer(), nullable=False),
+        sa.Column('delivered_orders', sa.Integer(), nullable=False),
+        sa.Column('cancelled_orders', sa.Integer(), nullable=False),
+        sa.Column('total_revenue', sa.DECIMAL(precision=12, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('restaurant_id'),
+    )
+    op.create_table(
+        'customer_stats',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('total_orders', sa.Integer(), nullable=False),
+        sa.Column('delivered_orders', sa.Integer(), nullable=False),
+        sa.Column('cancelled_orders', sa.Integer(), nullable=False),
+        sa.Column('total_spending', sa.DECIMAL(precision=12, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id'),
+    )
+    op.create_table(
+        'customer_restaurant_stats',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('restaurant_id', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id', 'restaurant_id'),
+    )
+    op.create_index(
+        'ix_customer_restaurant_stats_customer_orders', 'customer_restaurant_stats',
+        ['customer_id', 'order_count'], unique=False
+    )
+    op.create_table(
+        'menu_item_sales',
+        sa.Column('menu_item_id', sa.Integer(), nullable=False),
+        sa.Column('restaurant_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_sold', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('menu_item_id'),
+    )
+    op.create_index(
+        'ix_menu_item_sales_restaurant_quantity', 'menu_item_sales',
+        ['restaurant_id', 'quantity_sold'], unique=False
+    )
+
+    # Backfill from existing data (same logic as recompute_restaurant_ratings / rebuild_rollups)
+    op.execute("""
+        UPDATE restaurants SET
+            rating_sum = (SELECT coalesce(sum(rating), 0) FROM reviews WHERE reviews.restaurant_id = restaurants.id),
+            rating_count = (SELECT count(id) FROM reviews WHERE reviews.restaurant_id = restaurants.id)
+    """)
+    for table, key, amount in (
+        ('restaurant_stats', 'restaurant_id', 'total_revenue'),
+        ('customer_stats', 'customer_id', 'total_spending'),
+    ):
+        op.execute(f"""
+            INSERT INTO {table} ({key}, total_orders, delivered_orders, cancelled_orders, {amount})
+            SELECT {key},
+                   count(id),
+                   sum(CASE WHEN order_status = 'delivered' THEN 1 ELSE 0 END),
+                   sum(CASE WHEN order_status = 'cancelled' THEN 1 ELSE 0 END),
+                   coalesce(sum(CASE WHEN order_status = 'delivered' THEN total_amount ELSE 0 END), 0)
+            FROM orders GROUP BY {key}
+        """)
+    op.execute("""
+        INSERT INTO customer_restaurant_stats (customer_id, restaurant_id, order_count)
+        SELECT customer_id, restaurant_id, count(id) FROM orders GROUP BY customer_id, restaurant_id
+    """)
+    op.execute("""
+        INSERT INTO menu_item_sales (menu_item_id, restaurant_id, quantity_sold)
+        SELECT order_items.menu_item_id, orders.restaurant_id, sum(order_items.quantity)
+        FROM order_items JOIN orders ON order_items.order_id = orders.id
+        GROUP BY order_items.menu_item_id, orders.restaurant_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_menu_item_sales_restaurant_quantity', table_name='menu_item_sales')
+    op.drop_table('menu_item_sales')
+    op.drop_index('ix_customer_restaurant_stats_customer_orders', table_name='customer_restaurant_stats')
+    op.drop_table('customer_restaurant_stats')
+    op.drop_table('customer_stats')
+    op.drop_table('restaurant_stats')
+    with op.batch_alter_table('restaurants') as batch_op:
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
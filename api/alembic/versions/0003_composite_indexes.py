@@ -0,0 +1,42 @@
+"""Composite indexes for the filtered and keyset-paginated list queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_orders_restaurant_date', 'orders', ['restaurant_id', 'order_date', 'id']),
+    ('ix_orders_customer_date', 'orders', ['customer_id', 'order_date', 'id']),
+    ('ix_order_items_order', 'order_items', ['order_id']),
+    ('ix_menu_items_restaurant_available_category', 'menu_items', ['restaurant_id', 'is_available', 'category']),
+    ('ix_menu_items_name', 'menu_items', ['name', 'id']),
+    ('ix_menu_items_created', 'menu_items', ['created_at', 'id']),
+    ('ix_reviews_restaurant_created', 'reviews', ['restaurant_id', 'created_at', 'id']),
+    ('ix_reviews_customer_created', 'reviews', ['customer_id', 'created_at', 'id']),
+    ('ix_restaurants_name', 'restaurants', ['name', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
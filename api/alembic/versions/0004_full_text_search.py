@@ -0,0 +1,58 @@
+"""Full-text search tables for menu items and restaurants
+
+SQLite only, and only when the SQLite build has FTS5. Otherwise the
+application falls back to its in-process index (see api.utils.search).
+The tables are kept in sync by the CRUD functions, not by triggers.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_TABLES = [
+    ('menu_items_fts', 'menu_items', ['name', 'description']),
+    ('restaurants_fts', 'restaurants', ['name', 'cuisine_type']),
+]
+
+
+def fts5_available(bind) -> bool:
+    if bind.dialect.name != 'sqlite':
+        return False
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(probe)")
+    except sa.exc.OperationalError:
+        return False
+    bind.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if not fts5_available(bind):
+        return
+    for fts_table, table, columns in FTS_TABLES:
+        column_list = ', '.join(columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(f"INSERT INTO {fts_table} (rowid, {column_list}) SELECT id, {column_list} FROM {table}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for fts_table, _, _ in reversed(FTS_TABLES):
+        op.execute(f"DROP TABLE IF EXISTS {fts_table}")
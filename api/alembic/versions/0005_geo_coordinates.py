@@ -0,0 +1,75 @@
+"""Restaurant and customer coordinates with an R*Tree index on restaurants
+
+The R*Tree table is SQLite only and is kept in sync by triggers on
+restaurants. Without it, nearby searches fall back to scanning the
+coordinate columns (see api.utils.geo). A batch migration that rebuilds
+the restaurants table drops the triggers and has to recreate them.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Point boxes; R*Tree stores 32-bit floats rounded outwards
+INDEX_ROW = (
+    "SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+    "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL"
+)
+
+TRIGGERS = {
+    'restaurants_rtree_insert': f"AFTER INSERT ON restaurants BEGIN INSERT INTO restaurants_rtree {INDEX_ROW}; END",
+    'restaurants_rtree_update': (
+        "AFTER UPDATE OF latitude, longitude ON restaurants BEGIN "
+        "DELETE FROM restaurants_rtree WHERE id = old.id; "
+        f"INSERT INTO restaurants_rtree {INDEX_ROW}; END"
+    ),
+    'restaurants_rtree_delete': "AFTER DELETE ON restaurants BEGIN DELETE FROM restaurants_rtree WHERE id = old.id; END",
+}
+
+
+def rtree_available(bind) -> bool:
+    if bind.dialect.name != 'sqlite':
+        return False
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE temp.rtree_probe USING rtree(id, min_x, max_x)")
+    except sa.exc.OperationalError:
+        return False
+    bind.exec_driver_sql("DROP TABLE temp.rtree_probe")
+    return True
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('restaurants', 'customers'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+    if not rtree_available(op.get_bind()):
+        return
+    op.execute("CREATE VIRTUAL TABLE restaurants_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in reversed(list(TRIGGERS)):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS restaurants_rtree")
+    for table in ('customers', 'restaurants'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('longitude')
+            batch_op.drop_column('latitude')
@@ -0,0 +1,73 @@
+"""Restaurant opening hours as minute-of-day windows
+
+Backfilled from restaurants.opening_time/closing_time; hours that cross
+midnight become two windows (see api.utils.schedule).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def open_windows(opening_time, closing_time):
+    # Frozen copy of api.utils.schedule.open_windows
+    opening = opening_time.hour * 60 + opening_time.minute
+    closing = closing_time.hour * 60 + closing_time.minute
+    if opening < closing:
+        return [(opening, closing)]
+    if opening == closing:
+        return [(0, MINUTES_PER_DAY)]
+    return [(opening, MINUTES_PER_DAY)] + ([(0, closing)] if closing > 0 else [])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    windows = op.create_table(
+        'restaurant_open_windows',
+        sa.Column('restaurant_id', sa.Integer(), nullable=False),
+        sa.Column('open_minute', sa.Integer(), nullable=False),
+        sa.Column('close_minute', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('restaurant_id', 'open_minute'),
+    )
+    op.create_index(
+        'ix_restaurant_open_windows_open', 'restaurant_open_windows',
+        ['open_minute', 'close_minute', 'restaurant_id'], unique=False
+    )
+    op.create_index(
+        'ix_restaurant_open_windows_close', 'restaurant_open_windows',
+        ['close_minute', 'open_minute', 'restaurant_id'], unique=False
+    )
+
+    restaurants = sa.table(
+        'restaurants', sa.column('id', sa.Integer), sa.column('opening_time', sa.Time), sa.column('closing_time', sa.Time)
+    )
+    rows = op.get_bind().execute(sa.select(restaurants.c.id, restaurants.c.opening_time, restaurants.c.closing_time)).all()
+    backfill = [
+        {'restaurant_id': restaurant_id, 'open_minute': open_minute, 'close_minute': close_minute}
+        for restaurant_id, opening_time, closing_time in rows
+        for open_minute, close_minute in open_windows(opening_time, closing_time)
+    ]
+    if backfill:
+        op.bulk_insert(windows, backfill)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_restaurant_open_windows_close', table_name='restaurant_open_windows')
+    op.drop_index('ix_restaurant_open_windows_open', table_name='restaurant_open_windows')
+    op.drop_table('restaurant_open_windows')
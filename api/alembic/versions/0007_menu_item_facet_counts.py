@@ -0,0 +1,47 @@
+"""Menu item counts per facet combination
+
+Backfilled from menu_items; kept up to date by the menu item CRUD functions
+(see api.crud.analytics.record_menu_facet_changes).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FACETS = ['category', 'is_vegetarian', 'is_vegan', 'is_available']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    counts = op.create_table(
+        'menu_item_facet_counts',
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('is_vegetarian', sa.Boolean(), nullable=False),
+        sa.Column('is_vegan', sa.Boolean(), nullable=False),
+        sa.Column('is_available', sa.Boolean(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(*FACETS),
+    )
+
+    menu_items = sa.table('menu_items', sa.column('id', sa.Integer), *[sa.column(name) for name in FACETS])
+    facets = [menu_items.c[name] for name in FACETS]
+    op.execute(counts.insert().from_select(
+        [*FACETS, 'item_count'], sa.select(*facets, sa.func.count(menu_items.c.id)).group_by(*facets)
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('menu_item_facet_counts')
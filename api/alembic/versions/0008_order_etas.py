@@ -0,0 +1,37 @@
+"""Estimated ready and delivery times on orders
+
+Orders placed before this revision have no estimates until their
+restaurant's kitchen queue next changes (see api.utils.eta).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.add_column(sa.Column('estimated_ready_time', sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('estimated_delivery_time', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_orders_restaurant_status', 'orders', ['restaurant_id', 'order_status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_restaurant_status', table_name='orders')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('estimated_delivery_time')
+        batch_op.drop_column('estimated_ready_time')
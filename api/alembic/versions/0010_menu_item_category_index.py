@@ -0,0 +1,31 @@
+"""Index for menu searches filtered by category
+
+Lets a category-filtered search walk its category in (name, id) keyset order
+instead of the whole ix_menu_items_name index.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_menu_items_category_name', 'menu_items', ['category', 'name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_menu_items_category_name', table_name='menu_items')
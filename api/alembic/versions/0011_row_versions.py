@@ -0,0 +1,41 @@
+"""Row version counters for HTTP validators
+
+restaurants, menu_items and customers get a version bumped by every UPDATE of
+the row, and restaurants a menu_version bumped by the menu item writers, so
+conditional GETs can be answered from one indexed row (see api.utils.http_cache).
+Existing rows start at 1; new ones at a random value (see initial_version).
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('restaurants', 'menu_items', 'customers'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    with op.batch_alter_table('restaurants') as batch_op:
+        batch_op.add_column(sa.Column('menu_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('restaurants') as batch_op:
+        batch_op.drop_column('menu_version')
+    for table in ('customers', 'menu_items', 'restaurants'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
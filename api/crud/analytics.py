@@ -1,75 +1,322 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, delete, func, desc, case, literal
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
+from collections import Counter
+from collections.abc import Mapping
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional, List, Sequence
 
-from api.models import Customer, Restaurant, Order, OrderItem, MenuItem
+from api.models.analytics import RestaurantStats, CustomerStats, CustomerRestaurantStats, MenuItemSales, MenuItemFacetCounts
+from api.models.customer import Customer
+from api.models.restaurant import Restaurant
+from api.models.order import Order, OrderStatus
+from api.models.order_item import OrderItem
+from api.models.menu_item import MenuItem
+from api.models.job import Job
+from api.external_services import jobs
 
-async def get_restaurant_performance(db: AsyncSession, restaurant_id: int) -> Dict[str, Any]:
-    # Total Revenue
-    revenue_result = await db.execute(
-        select(func.sum(Order.total_amount))
-        .where(Order.restaurant_id == restaurant_id)
-        .where(Order.order_status == 'delivered')
+# Background jobs keeping the order rollups current (see api.external_services.jobs)
+ORDER_ROLLUP_JOB = "order_rollups"
+ORDER_STATUS_ROLLUP_JOB = "order_status_rollups"
+
+async def _increment(db: AsyncSession, model, rows: List[Dict[str, Any]], keys: List[str], counters: List[str]):
+    # Upsert that adds the counter values onto an existing rollup row
+    if not rows:
+        return
+    insert = postgresql_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: model.__table__.c[column] + stmt.excluded[column] for column in counters}
+    )
+    await db.execute(stmt)
+
+def _status_deltas(order: Order, status: OrderStatus, sign: int, amount_field: str) -> Dict[str, Any]:
+    deltas = {"delivered_orders": 0, "cancelled_orders": 0, amount_field: Decimal("0")}
+    if status == OrderStatus.delivered:
+        deltas["delivered_orders"] = sign
+        deltas[amount_field] = order.total_amount * sign
+    elif status == OrderStatus.cancelled:
+        deltas["cancelled_orders"] = sign
+    return deltas
+
+async def record_order_placed(db: AsyncSession, order: Order):
+    """Add a newly placed order to the rollups. Runs in the caller's transaction."""
+    await _increment(db, RestaurantStats, [{"restaurant_id": order.restaurant_id, "total_orders": 1}], ["restaurant_id"], ["total_orders"])
+    await _increment(db, CustomerStats, [{"customer_id": order.customer_id, "total_orders": 1}], ["customer_id"], ["total_orders"])
+    await _increment(
+        db, CustomerRestaurantStats,
+        [{"customer_id": order.customer_id, "restaurant_id": order.restaurant_id, "order_count": 1}],
+        ["customer_id", "restaurant_id"],
+        ["order_count"]
+    )
+
+    quantities = Counter()
+    for item in order.items:
+        quantities[item.menu_item_id] += item.quantity
+    await _increment(
+        db, MenuItemSales,
+        [
+            {"menu_item_id": menu_item_id, "restaurant_id": order.restaurant_id, "quantity_sold": quantity}
+            for menu_item_id, quantity in quantities.items()
+        ],
+        ["menu_item_id"],
+        ["quantity_sold"]
+    )
+
+def schedule_order_placed(db: AsyncSession, order: Order):
+    """Enqueue `record_order_placed` for a new order in the caller's transaction."""
+    jobs.enqueue(db, ORDER_ROLLUP_JOB, {"order_id": order.id})
+
+def schedule_order_status_changes(db: AsyncSession, orders: Sequence[Order], new_status: OrderStatus):
+    """Enqueue `record_order_status_changes` for orders that moved to `new_status`, if it moves any totals."""
+    if orders and new_status in (OrderStatus.delivered, OrderStatus.cancelled):
+        jobs.enqueue(db, ORDER_STATUS_ROLLUP_JOB, {"order_ids": [order.id for order in orders], "status": new_status.value})
+
+@jobs.handler(ORDER_ROLLUP_JOB)
+async def _order_placed_job(db: AsyncSession, payload: Dict[str, Any]):
+    # Inner joins: nothing to count once the customer or the restaurant is gone
+    result = await db.execute(
+        select(Order).join(Order.customer).join(Order.restaurant)
+        .options(selectinload(Order.items))
+        .where(Order.id == payload["order_id"])
     )
-    total_revenue = revenue_result.scalar_one_or_none() or Decimal('0.0')
+    order = result.scalar_one_or_none()
+    if order is not None:
+        await record_order_placed(db, order)
 
-    # Total Orders
-    orders_count_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.restaurant_id == restaurant_id)
+@jobs.handler(ORDER_STATUS_ROLLUP_JOB)
+async def _order_status_job(db: AsyncSession, payload: Dict[str, Any]):
+    result = await db.execute(
+        select(Order.id, Order.restaurant_id, Order.customer_id, Order.total_amount)
+        .join(Order.customer).join(Order.restaurant)
+        .where(Order.id.in_(payload["order_ids"]))
     )
-    total_orders = orders_count_result.scalar_one()
+    await record_order_status_changes(db, result.all(), None, OrderStatus(payload["status"]))
+
+async def record_order_status_change(
+    db: AsyncSession, order: Order, old_status: Optional[OrderStatus], new_status: OrderStatus
+):
+    """Move an order's revenue and delivered/cancelled counts between buckets. Runs in the caller's transaction."""
+    await record_order_status_changes(db, [order], old_status, new_status)
+
+async def record_order_status_changes(
+    db: AsyncSession, orders: Sequence[Order], old_status: Optional[OrderStatus], new_status: OrderStatus
+):
+    """
+    Batch form of `record_order_status_change` for orders that all made the same move;
+    one upsert per rollup table. `orders` only needs restaurant_id, customer_id and total_amount.
+    """
+    for model, key, amount_field in (
+        (RestaurantStats, "restaurant_id", "total_revenue"),
+        (CustomerStats, "customer_id", "total_spending"),
+    ):
+        # Summed per key: one upsert statement may not touch the same row twice
+        totals: Dict[int, Dict[str, Any]] = {}
+        for order in orders:
+            removed = _status_deltas(order, old_status, -1, amount_field)
+            added = _status_deltas(order, new_status, 1, amount_field)
+            current = totals.setdefault(getattr(order, key), dict.fromkeys(added, 0))
+            for field in added:
+                current[field] += removed[field] + added[field]
+        rows = [{key: key_value, **deltas} for key_value, deltas in totals.items() if any(deltas.values())]
+        if rows:
+            await _increment(db, model, rows, [key], list(rows[0])[1:])
+
+FACET_COLUMNS = ("category", "is_vegetarian", "is_vegan", "is_available")
+
+def facet_key(item) -> tuple:
+    """A menu item's facet values, from a model instance, result row or dict."""
+    if isinstance(item, Mapping):
+        return tuple(item[column] for column in FACET_COLUMNS)
+    return tuple(getattr(item, column) for column in FACET_COLUMNS)
+
+async def record_menu_facet_changes(db: AsyncSession, removed: Iterable = (), added: Iterable = ()):
+    """Move menu items between facet buckets. Runs in the caller's transaction."""
+    deltas = Counter()
+    for item in removed:
+        deltas[facet_key(item)] -= 1
+    for item in added:
+        deltas[facet_key(item)] += 1
+    rows = [{**dict(zip(FACET_COLUMNS, key)), "item_count": delta} for key, delta in deltas.items() if delta]
+    if rows:
+        await _increment(db, MenuItemFacetCounts, rows, list(FACET_COLUMNS), ["item_count"])
+
+async def forget_restaurant(db: AsyncSession, restaurant_id: int):
+    # Ids can be reused by SQLite, so rollups must not outlive their restaurant
+    await db.execute(delete(RestaurantStats).where(RestaurantStats.restaurant_id == restaurant_id))
+    await db.execute(delete(MenuItemSales).where(MenuItemSales.restaurant_id == restaurant_id))
+    await db.execute(delete(CustomerRestaurantStats).where(CustomerRestaurantStats.restaurant_id == restaurant_id))
+
+async def forget_customer(db: AsyncSession, customer_id: int):
+    await db.execute(delete(CustomerStats).where(CustomerStats.customer_id == customer_id))
+    await db.execute(delete(CustomerRestaurantStats).where(CustomerRestaurantStats.customer_id == customer_id))
+
+async def forget_customer_orders(db: AsyncSession, orders: Sequence[Order]):
+    """
+    Take orders that are about to be deleted with their customer out of the
+    restaurant and menu item rollups, in the caller's transaction; `orders` need
+    their items loaded. A rollup job that has not run for an order never counted
+    it, and would skip the deleted order: only what the finished jobs added is
+    subtracted. The jobs only about these orders are cancelled, so they cannot
+    pick up a later order that reuses an id.
+    """
+    if not orders:
+        return
+    order_ids = {order.id for order in orders}
+    # Finished jobs are deleted: this reads the backlog, and the failed jobs kept for inspection
+    result = await db.execute(
+        select(Job.id, Job.kind, Job.payload).where(Job.kind.in_([ORDER_ROLLUP_JOB, ORDER_STATUS_ROLLUP_JOB]))
+    )
+    unplaced, unmoved, cancelled_jobs = set(), set(), []
+    for job_id, kind, payload in result.all():
+        ids = {payload["order_id"]} if kind == ORDER_ROLLUP_JOB else set(payload["order_ids"])
+        if ids & order_ids:
+            (unplaced if kind == ORDER_ROLLUP_JOB else unmoved).update(ids & order_ids)
+            if ids <= order_ids:
+                cancelled_jobs.append(job_id)
+    if cancelled_jobs:
+        await jobs.cancel(db, [ORDER_ROLLUP_JOB, ORDER_STATUS_ROLLUP_JOB], Job.id.in_(cancelled_jobs))
+
+    totals: Dict[int, Dict[str, Any]] = {}
+    quantities = Counter()
+    for order in orders:
+        current = totals.setdefault(order.restaurant_id, {
+            "restaurant_id": order.restaurant_id, "total_orders": 0,
+            "delivered_orders": 0, "cancelled_orders": 0, "total_revenue": Decimal("0"),
+        })
+        if order.id not in unplaced:
+            current["total_orders"] -= 1
+            for item in order.items:
+                quantities[item.menu_item_id, order.restaurant_id] -= item.quantity
+        if order.id not in unmoved:
+            for field, delta in _status_deltas(order, order.order_status, -1, "total_revenue").items():
+                current[field] += delta
+    counters = ["total_orders", "delivered_orders", "cancelled_orders", "total_revenue"]
+    rows = [row for row in totals.values() if any(row[counter] for counter in counters)]
+    sales = [
+        {"menu_item_id": menu_item_id, "restaurant_id": restaurant_id, "quantity_sold": quantity}
+        for (menu_item_id, restaurant_id), quantity in quantities.items() if quantity
+    ]
+    await _increment(db, RestaurantStats, rows, ["restaurant_id"], counters)
+    await _increment(db, MenuItemSales, sales, ["menu_item_id"], ["quantity_sold"])
+    # Like the rebuild, no rows for what has no orders left
+    if rows:
+        await db.execute(
+            delete(RestaurantStats)
+            .where(RestaurantStats.restaurant_id.in_([row["restaurant_id"] for row in rows]))
+            .where(*[getattr(RestaurantStats, counter) == 0 for counter in counters])
+        )
+    if sales:
+        await db.execute(
+            delete(MenuItemSales)
+            .where(MenuItemSales.menu_item_id.in_([row["menu_item_id"] for row in sales]))
+            .where(MenuItemSales.quantity_sold == 0)
+        )
+
+async def get_restaurant_performance(db: AsyncSession, restaurant_id: int) -> Optional[Dict[str, Any]]:
+    # Summary row (outer joined so a restaurant without orders still resolves)
+    summary_result = await db.execute(
+        select(Restaurant.rating, RestaurantStats.total_revenue, RestaurantStats.total_orders)
+        .outerjoin(RestaurantStats, RestaurantStats.restaurant_id == Restaurant.id)
+        .where(Restaurant.id == restaurant_id)
+    )
+    summary = summary_result.first()
+    if summary is None:
+        return None
 
     # Popular Menu Items (Top 5)
     popular_items_result = await db.execute(
-        select(MenuItem.name, func.sum(OrderItem.quantity).label('total_quantity'))
-        .join(OrderItem, MenuItem.id == OrderItem.menu_item_id)
-        .join(Order, OrderItem.order_id == Order.id)
-        .where(Order.restaurant_id == restaurant_id)
-        .group_by(MenuItem.name)
-        .order_by(desc('total_quantity'))
+        select(MenuItem.name, MenuItemSales.quantity_sold)
+        .join(MenuItem, MenuItem.id == MenuItemSales.menu_item_id)
+        .where(MenuItemSales.restaurant_id == restaurant_id)
+        .order_by(desc(MenuItemSales.quantity_sold))
         .limit(5)
     )
     popular_items = [{"item_name": name, "quantity_sold": qty} for name, qty in popular_items_result.all()]
 
     return {
-        "total_revenue": total_revenue,
-        "total_orders": total_orders,
-        "average_rating": (await db.get(Restaurant, restaurant_id)).rating,
+        "total_revenue": summary.total_revenue or Decimal('0.0'),
+        "total_orders": summary.total_orders or 0,
+        "average_rating": summary.rating,
         "popular_items": popular_items
     }
 
-async def get_customer_analytics(db: AsyncSession, customer_id: int) -> Dict[str, Any]:
-    # Total Spending
-    spending_result = await db.execute(
-        select(func.sum(Order.total_amount))
-        .where(Order.customer_id == customer_id)
-        .where(Order.order_status == 'delivered')
-    )
-    total_spending = spending_result.scalar_one_or_none() or Decimal('0.0')
-
-    # Total Orders
-    orders_count_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.customer_id == customer_id)
-    )
-    total_orders = orders_count_result.scalar_one()
-
-    # Favorite Restaurant (by order count)
-    fav_restaurant_result = await db.execute(
-        select(Restaurant.name, func.count(Order.id).label('order_count'))
-        .join(Order, Restaurant.id == Order.restaurant_id)
-        .where(Order.customer_id == customer_id)
-        .group_by(Restaurant.name)
-        .order_by(desc('order_count'))
+async def get_customer_analytics(db: AsyncSession, customer_id: int) -> Optional[Dict[str, Any]]:
+    favorite_restaurant = (
+        select(Restaurant.name)
+        .join(CustomerRestaurantStats, CustomerRestaurantStats.restaurant_id == Restaurant.id)
+        .where(CustomerRestaurantStats.customer_id == Customer.id)
+        .order_by(desc(CustomerRestaurantStats.order_count))
         .limit(1)
+        .scalar_subquery()
     )
-    favorite_restaurant = fav_restaurant_result.first()
+    result = await db.execute(
+        select(
+            CustomerStats.total_spending,
+            CustomerStats.total_orders,
+            favorite_restaurant.label("favorite_restaurant")
+        )
+        .select_from(Customer)
+        .outerjoin(CustomerStats, CustomerStats.customer_id == Customer.id)
+        .where(Customer.id == customer_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
 
     return {
-        "total_spending": total_spending,
-        "total_orders": total_orders,
-        "favorite_restaurant": favorite_restaurant.name if favorite_restaurant else None
-    }
\ No newline at end of file
+        "total_spending": row.total_spending or Decimal('0.0'),
+        "total_orders": row.total_orders or 0,
+        "favorite_restaurant": row.favorite_restaurant
+    }
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute every rollup table from the raw orders/order_items/menu_items tables."""
+    # Pending rollup jobs are counted by the rebuild already
+    await jobs.cancel(db, [ORDER_ROLLUP_JOB, ORDER_STATUS_ROLLUP_JOB])
+    for model in (RestaurantStats, CustomerStats, CustomerRestaurantStats, MenuItemSales, MenuItemFacetCounts):
+        await db.execute(delete(model))
+
+    delivered = case((Order.order_status == OrderStatus.delivered, 1), else_=0)
+    cancelled = case((Order.order_status == OrderStatus.cancelled, 1), else_=0)
+    revenue = func.coalesce(
+        func.sum(case((Order.order_status == OrderStatus.delivered, Order.total_amount), else_=literal(0))), 0
+    )
+
+    for model, key, amount_field in (
+        (RestaurantStats, Order.restaurant_id, "total_revenue"),
+        (CustomerStats, Order.customer_id, "total_spending"),
+    ):
+        await db.execute(
+            model.__table__.insert().from_select(
+                [key.key, "total_orders", "delivered_orders", "cancelled_orders", amount_field],
+                select(key, func.count(Order.id), func.sum(delivered), func.sum(cancelled), revenue)
+                .group_by(key)
+            )
+        )
+
+    await db.execute(
+        CustomerRestaurantStats.__table__.insert().from_select(
+            ["customer_id", "restaurant_id", "order_count"],
+            select(Order.customer_id, Order.restaurant_id, func.count(Order.id))
+            .group_by(Order.customer_id, Order.restaurant_id)
+        )
+    )
+    await db.execute(
+        MenuItemSales.__table__.insert().from_select(
+            ["menu_item_id", "restaurant_id", "quantity_sold"],
+            select(OrderItem.menu_item_id, Order.restaurant_id, func.sum(OrderItem.quantity))
+            .join(Order, OrderItem.order_id == Order.id)
+            .group_by(OrderItem.menu_item_id, Order.restaurant_id)
+        )
+    )
+    facets = [getattr(MenuItem, column) for column in FACET_COLUMNS]
+    await db.execute(
+        MenuItemFacetCounts.__table__.insert().from_select(
+            [*FACET_COLUMNS, "item_count"], select(*facets, func.count(MenuItem.id)).group_by(*facets)
+        )
+    )
+    await db.commit()
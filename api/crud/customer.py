@@ -1,35 +1,98 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import select, insert, update, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from typing import Any, Dict, Optional
 from api.models.customer import Customer
+from api.models.order import Order, OrderStatus
 from api.schemas.customer import CustomerCreate, CustomerUpdate
+from api.crud import analytics as analytics_crud
+from api.crud import review as review_crud
+from api.utils.cache import menu_cache
+from api.utils.eta import OPEN_STATUSES, eta_engine
+from api.utils.pagination import DEFAULT_PAGE_SIZE, paginate, build_page
+
+def _duplicate_error(e: IntegrityError) -> ValueError:
+    message = str(e.orig).lower()
+    if "email" in message:
+        return ValueError("Email already registered")
+    if "phone_number" in message:
+        return ValueError("Phone number already registered")
+    raise e
 
 async def create_customer(db: AsyncSession, data: CustomerCreate) -> Customer:
-    customer = Customer(**data.model_dump())
-    db.add(customer)
-    await db.commit()
-    await db.refresh(customer)
+    """Insert a customer. Raises ValueError if the email or phone number is taken (enforced by the unique indexes)."""
+    try:
+        result = await db.execute(insert(Customer).values(**data.model_dump()).returning(Customer))
+        customer = result.scalar_one()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise _duplicate_error(e)
     return customer
 
-async def get_customers(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Customer]:
-    result = await db.execute(select(Customer).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_customers(db: AsyncSession, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    keys = [Customer.id]
+    result = await db.execute(paginate(select(Customer), keys, cursor, limit))
+    return build_page(result.all(), keys, limit)
 
 async def get_customer(db: AsyncSession, customer_id: int) -> Optional[Customer]:
     result = await db.execute(select(Customer).where(Customer.id == customer_id))
     return result.scalar_one_or_none()
     
+async def get_customer_version(db: AsyncSession, customer_id: int):
+    """(id, version, updated_at) of the customer, for its HTTP validators; None if it does not exist."""
+    result = await db.execute(
+        select(Customer.id, Customer.version, Customer.updated_at)
+        .where(Customer.id == customer_id)
+    )
+    return result.first()
+
+async def customer_exists(db: AsyncSession, customer_id: int) -> bool:
+    return await db.scalar(select(exists().where(Customer.id == customer_id)))
+
+async def get_customer_location(db: AsyncSession, customer_id: int):
+    """(latitude, longitude) row, either of which may be None; None if the customer does not exist."""
+    result = await db.execute(select(Customer.latitude, Customer.longitude).where(Customer.id == customer_id))
+    return result.first()
+
 async def get_customer_by_email(db: AsyncSession, email: str) -> Optional[Customer]:
     result = await db.execute(select(Customer).where(Customer.email == email))
     return result.scalar_one_or_none()
 
-async def update_customer(db: AsyncSession, customer: Customer, data: CustomerUpdate) -> Customer:
-    for field, value in data.model_dump(exclude_unset=True).items():
-        setattr(customer, field, value)
-    await db.commit()
-    await db.refresh(customer)
+async def update_customer(db: AsyncSession, customer_id: int, data: CustomerUpdate) -> Optional[Customer]:
+    """Update in a single UPDATE ... RETURNING; None if the customer does not exist."""
+    values = data.model_dump(exclude_unset=True)
+    if not values:
+        return await get_customer(db, customer_id)
+    try:
+        result = await db.execute(
+            update(Customer).where(Customer.id == customer_id).values(**values).returning(Customer)
+        )
+        customer = result.scalar_one_or_none()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise _duplicate_error(e)
     return customer
 
 async def delete_customer(db: AsyncSession, customer: Customer):
+    await analytics_crud.forget_customer(db, customer.id)
+    # Load what the delete cascade visits up front, rather than lazily per order
+    await db.execute(
+        select(Customer).where(Customer.id == customer.id)
+        .options(
+            selectinload(Customer.orders).options(selectinload(Order.items), selectinload(Order.review)),
+            selectinload(Customer.reviews),
+        )
+    )
+    rated = await review_crud.forget_reviews(db, customer.reviews)
+    await analytics_crud.forget_customer_orders(db, customer.orders)
+    # Their open orders leave the kitchen queues, as if cancelled
+    open_orders = [order for order in customer.orders if order.order_status in OPEN_STATUSES]
+    await eta_engine.record_status_changes(db, open_orders, OrderStatus.cancelled)
     await db.delete(customer)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+    # Their ratings are part of the cached with-menu payloads
+    for restaurant_id in rated:
+        menu_cache.invalidate(restaurant_id)
\ No newline at end of file
@@ -0,0 +1,2 @@
+class NotFoundError(LookupError):
+    """A row the operation depends on does not exist. The message is the 404 detail."""
@@ -1,23 +1,112 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
-from typing import Optional, List
+from sqlalchemy import select, func, insert, update, delete
+from sqlalchemy.orm import joinedload, selectinload
+from collections import Counter
+from typing import Optional, List, Dict, Any, Tuple
+from api.crud import analytics as analytics_crud
+from api.crud.analytics import FACET_COLUMNS
+from api.models.analytics import MenuItemFacetCounts
 from api.models.menu_item import MenuItem
+from api.models.order_item import OrderItem
 from api.models.restaurant import Restaurant
-from api.schemas.menu_item import MenuItemCreate, MenuItemUpdate
+from api.schemas.menu_item import MenuItemCreate, MenuItemRead, MenuItemUpdate
+from api.utils.pagination import DEFAULT_PAGE_SIZE, paginate, build_page
+from api.utils.cache import menu_cache
+from api.utils.serialization import schema_columns
+from api.utils import recommender, search
 
-async def create_menu_item(db: AsyncSession, restaurant_id: int, data: MenuItemCreate) -> MenuItem:
-    menu_item = MenuItem(**data.model_dump(), restaurant_id=restaurant_id)
-    db.add(menu_item)
+FACETS = [getattr(MenuItem, column) for column in FACET_COLUMNS]
+
+# Ranked candidates loaded per recommendation requested, to make up for unavailable items
+RECOMMENDATION_CANDIDATES = 3
+
+class MenuItemOrdered(ValueError):
+    def __init__(self, item_id: int):
+        super().__init__(f"Menu item {item_id} has been ordered; mark it unavailable instead")
+        self.item_id = item_id
+
+async def _bump_menu_version(db: AsyncSession, restaurant_id: int) -> bool:
+    """
+    Move the restaurant's menu_version on, leaving its own version and
+    updated_at alone. False if the restaurant does not exist.
+    """
+    table = Restaurant.__table__
+    result = await db.execute(
+        update(table)
+        .where(table.c.id == restaurant_id)
+        .values(menu_version=table.c.menu_version + 1, version=table.c.version, updated_at=table.c.updated_at)
+    )
+    return result.rowcount > 0
+
+async def create_menu_item(db: AsyncSession, restaurant_id: int, data: MenuItemCreate) -> Optional[MenuItem]:
+    """
+    Insert a menu item; None if the restaurant does not exist. The menu_version
+    bump doubles as the existence check, so it costs no extra round trip.
+    """
+    if not await _bump_menu_version(db, restaurant_id):
+        return None
+    result = await db.execute(
+        insert(MenuItem).values(**data.model_dump(), restaurant_id=restaurant_id).returning(MenuItem)
+    )
+    menu_item = result.scalar_one()
+    await search.index(db, "menu_items", [menu_item.id], replace=False)
+    await analytics_crud.record_menu_facet_changes(db, added=[menu_item])
     await db.commit()
-    await db.refresh(menu_item)
+    menu_cache.invalidate(restaurant_id)
     return menu_item
 
-async def get_menu_items(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[MenuItem]:
+async def bulk_upsert_menu_items(
+    db: AsyncSession, restaurant_id: int, items: List[MenuItemCreate]
+) -> Optional[Tuple[int, int]]:
+    """
+    Insert or update `items` in one transaction, matching existing rows on
+    (restaurant_id, name). Updates only touch the fields that were provided.
+    Names must be unique within `items`. Returns (created, updated), or None if
+    the restaurant does not exist: as in create_menu_item, the menu_version bump
+    is the existence check.
+    """
+    if not await _bump_menu_version(db, restaurant_id):
+        return None
+    names = [item.name for item in items]
     result = await db.execute(
-        select(MenuItem).offset(skip).limit(limit).order_by(MenuItem.created_at.desc())
+        select(MenuItem.name, MenuItem.id, *FACETS)
+        .where(MenuItem.restaurant_id == restaurant_id)
+        .where(MenuItem.name.in_(names))
     )
-    return result.scalars().all()
+    existing = {row.name: row for row in result.all()}
+
+    inserts, updates, removed, added = [], [], [], []
+    for item in items:
+        if item.name in existing:
+            current = existing[item.name]
+            values = item.model_dump(exclude_unset=True)
+            updates.append({"id": current.id, **values})
+            if values.keys() & set(FACET_COLUMNS):
+                removed.append(current)
+                added.append({**current._mapping, **values})
+        else:
+            inserts.append({**item.model_dump(), "restaurant_id": restaurant_id})
+    added.extend(inserts)
+
+    # executemany-style bulk statements rather than one flush per object
+    if inserts:
+        result = await db.execute(insert(MenuItem).returning(MenuItem.id), inserts)
+        await search.index(db, "menu_items", result.scalars().all(), replace=False)
+    if updates:
+        await db.execute(update(MenuItem), updates)
+        await search.index(db, "menu_items", [row["id"] for row in updates if {"name", "description"} & row.keys()])
+    await analytics_crud.record_menu_facet_changes(db, removed=removed, added=added)
+    await db.commit()
+    menu_cache.invalidate(restaurant_id)
+    return len(inserts), len(updates)
+
+async def get_menu_items(
+    db: AsyncSession, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, as_dicts: bool = False
+) -> Dict[str, Any]:
+    keys = [MenuItem.created_at, MenuItem.id]
+    query = select(*schema_columns(MenuItemRead, MenuItem)) if as_dicts else select(MenuItem)
+    result = await db.execute(paginate(query, keys, cursor, limit, descending=True))
+    return build_page(result.all(), keys, limit, as_dicts=as_dicts)
 
 async def get_menu_item(db: AsyncSession, item_id: int) -> Optional[MenuItem]:
     result = await db.execute(select(MenuItem).where(MenuItem.id == item_id))
@@ -25,10 +114,38 @@ async def get_menu_item(db: AsyncSession, item_id: int) -> Optional[MenuItem]:
 
 async def get_menu_item_with_restaurant(db: AsyncSession, item_id: int) -> Optional[MenuItem]:
     result = await db.execute(
-        select(MenuItem).options(selectinload(MenuItem.restaurant)).where(MenuItem.id == item_id)
+        select(MenuItem).options(joinedload(MenuItem.restaurant)).where(MenuItem.id == item_id)
     )
     return result.scalar_one_or_none()
 
+async def get_menu_item_version(db: AsyncSession, item_id: int, with_restaurant: bool = False):
+    """
+    (id, version, updated_at) of the menu item, for its HTTP
+    validators, plus the restaurant's version and updated_at as
+    restaurant_version and restaurant_updated_at if `with_restaurant`;
+    None if the item does not exist.
+    """
+    columns = [MenuItem.id, MenuItem.version, MenuItem.updated_at]
+    query = select(*columns).where(MenuItem.id == item_id)
+    if with_restaurant:
+        query = query.add_columns(
+            Restaurant.version.label("restaurant_version"), Restaurant.updated_at.label("restaurant_updated_at")
+        ).join(Restaurant, Restaurant.id == MenuItem.restaurant_id)
+    result = await db.execute(query)
+    return result.first()
+
+async def get_restaurant_menu_version(db: AsyncSession, restaurant_id: int):
+    """
+    (id, version, menu_version) of the restaurant, for the HTTP
+    validators of its menu, or None if it does not exist. menu_version is bumped
+    by every menu item write, deletes included (see _bump_menu_version).
+    """
+    result = await db.execute(
+        select(Restaurant.id, Restaurant.version, Restaurant.menu_version)
+        .where(Restaurant.id == restaurant_id)
+    )
+    return result.first()
+
 async def get_restaurant_menu_items(db: AsyncSession, restaurant_id: int) -> List[MenuItem]:
     result = await db.execute(
         select(MenuItem)
@@ -45,27 +162,74 @@ async def get_restaurant_with_menu(db: AsyncSession, restaurant_id: int) -> Opti
     )
     return result.scalar_one_or_none()
 
-async def update_menu_item(db: AsyncSession, menu_item: MenuItem, data: MenuItemUpdate) -> MenuItem:
-    for field, value in data.model_dump(exclude_unset=True).items():
-        setattr(menu_item, field, value)
+async def update_menu_item(db: AsyncSession, item_id: int, data: MenuItemUpdate) -> Optional[MenuItem]:
+    """Update in a single UPDATE ... RETURNING; None if the menu item does not exist."""
+    values = data.model_dump(exclude_unset=True)
+    if not values:
+        return await get_menu_item(db, item_id)
+    # The old facet values are only needed to move the item between facet buckets
+    previous = None
+    if values.keys() & set(FACET_COLUMNS):
+        previous = (await db.execute(select(*FACETS).where(MenuItem.id == item_id))).first()
+    result = await db.execute(update(MenuItem).where(MenuItem.id == item_id).values(**values).returning(MenuItem))
+    menu_item = result.scalar_one_or_none()
+    if menu_item and {"name", "description"} & values.keys():
+        await search.index(db, "menu_items", [item_id])
+    if menu_item and previous:
+        await analytics_crud.record_menu_facet_changes(db, removed=[previous], added=[menu_item])
+    if menu_item:
+        await _bump_menu_version(db, menu_item.restaurant_id)
     await db.commit()
-    await db.refresh(menu_item)
+    if menu_item:
+        menu_cache.invalidate(menu_item.restaurant_id)
     return menu_item
 
-async def delete_menu_item(db: AsyncSession, menu_item: MenuItem):
-    await db.delete(menu_item)
+async def delete_menu_item(db: AsyncSession, item_id: int) -> bool:
+    """
+    Delete with a single DELETE ... RETURNING, guarded on the item never having
+    been ordered: order lines keep pointing at their menu item. Returns False if
+    it does not exist, or raises MenuItemOrdered.
+    """
+    ordered = select(OrderItem.id).where(OrderItem.menu_item_id == item_id).exists()
+    result = await db.execute(
+        delete(MenuItem)
+        .where(MenuItem.id == item_id, ~ordered)
+        .returning(MenuItem.restaurant_id, *FACETS)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        # Nothing matched: find out whether the item is missing or has been ordered
+        found = (await db.execute(select(MenuItem.id).where(MenuItem.id == item_id))).first()
+        await db.rollback()
+        if found is None:
+            return False
+        raise MenuItemOrdered(item_id)
+
+    await search.remove(db, "menu_items", [item_id])
+    await analytics_crud.record_menu_facet_changes(db, removed=[row])
+    await _bump_menu_version(db, row.restaurant_id)
     await db.commit()
+    menu_cache.invalidate(row.restaurant_id)
+    return True
 
 async def search_menu_items(
     db: AsyncSession, 
+    q: Optional[str] = None,
     category: Optional[str] = None, 
     vegetarian: Optional[bool] = None,
     vegan: Optional[bool] = None,
     available_only: bool = True,
-    skip: int = 0,
-    limit: int = 100
-) -> List[MenuItem]:
-    query = select(MenuItem)
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    as_dicts: bool = False,
+    facets: bool = False
+) -> Dict[str, Any]:
+    """
+    One page of matching menu items. With `facets`, the page also carries item
+    counts per category, is_vegetarian, is_vegan and is_available value.
+    """
+    query = select(*schema_columns(MenuItemRead, MenuItem)) if as_dicts else select(MenuItem)
     
     if available_only:
         query = query.where(MenuItem.is_available == True)
@@ -79,10 +243,72 @@ async def search_menu_items(
     if vegan is not None:
         query = query.where(MenuItem.is_vegan == vegan)
     
-    query = query.offset(skip).limit(limit).order_by(MenuItem.name)
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+    if q is not None:
+        # Ranked full-text search, paginated on (score, id)
+        page = await search.search(db, "menu_items", q, query, cursor, limit, as_dicts=as_dicts)
+    else:
+        keys = [MenuItem.name, MenuItem.id]
+        result = await db.execute(paginate(query, keys, cursor, limit))
+        page = build_page(result.all(), keys, limit, as_dicts=as_dicts)
+
+    if facets:
+        filters = {
+            "category": category or None, "is_vegetarian": vegetarian, "is_vegan": vegan,
+            "is_available": True if available_only else None,
+        }
+        page["facets"] = await _facet_counts(db, q, filters)
+    return page
+
+async def _facet_counts(db: AsyncSession, q: Optional[str], filters: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """
+    Facet counts from a single grouped query: item counts per combination of all
+    four facet values (at most categories x 8 rows), read from the rollup table
+    when there is no text query, folded in Python. Each facet honours every
+    active filter except its own, so the counts show what picking another
+    value would return.
+    """
+    if q is None:
+        cube = select(*[getattr(MenuItemFacetCounts, column) for column in FACET_COLUMNS], MenuItemFacetCounts.item_count)
+        cube = cube.where(MenuItemFacetCounts.item_count > 0)
+    else:
+        cube = select(*FACETS, func.count(MenuItem.id)).where(await search.matching(db, "menu_items", q)).group_by(*FACETS)
+    rows = (await db.execute(cube)).all()
+
+    counts = {column: Counter() for column in FACET_COLUMNS}
+    for *values, item_count in rows:
+        key = dict(zip(FACET_COLUMNS, values))
+        mismatched = [column for column, value in filters.items() if value is not None and key[column] != value]
+        for column in FACET_COLUMNS:
+            if not mismatched or mismatched == [column]:
+                counts[column][key[column]] += item_count
+    return {
+        column: {value if isinstance(value, str) else str(value).lower(): count for value, count in sorted(values.items())}
+        for column, values in counts.items()
+    }
+
+async def recommended_menu_items(
+    db: AsyncSession, ranked: List[Tuple[int, float]], limit: int, item_id: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    The available items among `ranked` ((menu item id, score), best first) as
+    MenuItemRead dicts with their score, in one query. Also loads `item_id`, so
+    the caller learns whether it exists without another round trip.
+    """
+    scores = dict(ranked)
+    ids = list(scores) if item_id is None else [item_id, *scores]
+    result = await db.execute(select(*schema_columns(MenuItemRead, MenuItem)).where(MenuItem.id.in_(ids)))
+    rows = {row.id: row._asdict() for row in result.all()}
+    found = item_id is not None and item_id in rows
+    items = [{**rows[i], "score": scores[i]} for i in scores if i in rows and rows[i]["is_available"]]
+    return items[:limit], found
+
+async def get_menu_item_recommendations(
+    db: AsyncSession, item_id: int, limit: int = DEFAULT_PAGE_SIZE
+) -> Optional[List[Dict[str, Any]]]:
+    """Items most often ordered together with `item_id`, best first; None if the item does not exist."""
+    ranked = await recommender.similar(db, item_id, limit * RECOMMENDATION_CANDIDATES)
+    items, found = await recommended_menu_items(db, ranked, limit, item_id=item_id)
+    return items if found else None
 
 async def get_restaurant_average_price(db: AsyncSession, restaurant_id: int) -> Optional[float]:
     result = await db.execute(
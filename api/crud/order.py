@@ -1,47 +1,117 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, exists, and_, distinct
 from sqlalchemy.orm import selectinload
+from collections import defaultdict
+from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
-from api.models.order import Order, OrderStatus
+from api.models.order import Order, OrderStatus, status_predecessors
 from api.models.order_item import OrderItem
 from api.models.menu_item import MenuItem
-from api.schemas.order import OrderCreate
+from api.models.customer import Customer
+from api.models.restaurant import Restaurant
+from api.schemas.order import OrderCreate, OrderRead
+from api.crud import analytics as analytics_crud
+from api.crud.errors import NotFoundError
+from api.crud.menu_item import RECOMMENDATION_CANDIDATES, recommended_menu_items
+from api.utils import recommender
+from api.utils.pubsub import broker, order_topic, restaurant_topic
+from api.utils.eta import OPEN_STATUSES, basket_minutes, eta_engine, status_estimates
+from api.utils.pagination import DEFAULT_PAGE_SIZE, paginate, build_page
+from api.utils.serialization import schema_columns
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Most recent orders a customer's recommendations are based on
+RECOMMENDATION_HISTORY_ORDERS = 50
+
+# Order line columns included in exports
+EXPORT_ITEM_COLUMNS = [
+    OrderItem.id, OrderItem.menu_item_id, OrderItem.quantity, OrderItem.item_price, OrderItem.special_requests
+]
+
+def _publish(event: str, orders: Sequence[Dict[str, Any]], estimates: Optional[Dict[int, Dict[str, Any]]] = None):
+    """Push committed changes to the order and restaurant event streams."""
+    for order in orders:
+        broker.publish(order_topic(order["id"]), event, order)
+        broker.publish(restaurant_topic(order["restaurant_id"]), event, order)
+    # Other orders whose estimates moved with the kitchen queue
+    for order_id, values in (estimates or {}).items():
+        broker.publish(order_topic(order_id), "eta_changed", {"id": order_id, **values})
 
 async def place_order(db: AsyncSession, customer_id: int, data: OrderCreate) -> Order:
+    """
+    Raises NotFoundError for a missing customer or restaurant and ValueError
+    for an invalid or unavailable menu item.
+    """
+    # One query resolves the customer, the restaurant and every requested menu item:
+    # a single row of existence flags, outer joined to the items scoped to the restaurant
+    requested_ids = {item_data.menu_item_id for item_data in data.items}
+    found = select(
+        exists().where(Customer.id == customer_id).label("customer_found"),
+        exists().where(Restaurant.id == data.restaurant_id).label("restaurant_found")
+    ).subquery()
+    result = await db.execute(
+        select(found.c.customer_found, found.c.restaurant_found, MenuItem)
+        .select_from(found)
+        .outerjoin(MenuItem, and_(MenuItem.restaurant_id == data.restaurant_id, MenuItem.id.in_(requested_ids)))
+    )
+    rows = result.all()
+    if not rows[0].customer_found:
+        raise NotFoundError("Customer not found")
+    if not rows[0].restaurant_found:
+        raise NotFoundError("Restaurant not found")
+    menu_items = {row.MenuItem.id: row.MenuItem for row in rows if row.MenuItem is not None}
+
     total_amount = Decimal(0)
-    order_items_to_create = []
+    longest_preparation = total_preparation = 0
+    order_lines = []
 
     for item_data in data.items:
-        menu_item = await db.get(MenuItem, item_data.menu_item_id)
-        if not menu_item or menu_item.restaurant_id != data.restaurant_id:
+        menu_item = menu_items.get(item_data.menu_item_id)
+        if not menu_item:
             raise ValueError(f"Invalid menu item ID: {item_data.menu_item_id}")
         if not menu_item.is_available:
             raise ValueError(f"Menu item '{menu_item.name}' is not available.")
         
         item_price = menu_item.price
         total_amount += item_price * item_data.quantity
+        longest_preparation = max(longest_preparation, menu_item.preparation_time)
+        total_preparation += menu_item.preparation_time * item_data.quantity
         
-        order_items_to_create.append(OrderItem(
-            menu_item_id=item_data.menu_item_id,
-            quantity=item_data.quantity,
-            item_price=item_price,
-            special_requests=item_data.special_requests
-        ))
+        order_lines.append({
+            "menu_item_id": item_data.menu_item_id,
+            "quantity": item_data.quantity,
+            "item_price": item_price,
+            "special_requests": item_data.special_requests,
+        })
 
+    prep_minutes = basket_minutes(longest_preparation, total_preparation)
+    ready, delivery = await eta_engine.estimate(db, data.restaurant_id, prep_minutes)
     new_order = Order(
         customer_id=customer_id,
         restaurant_id=data.restaurant_id,
         total_amount=total_amount,
         delivery_address=data.delivery_address,
         special_instructions=data.special_instructions,
-        items=order_items_to_create
+        estimated_ready_time=ready,
+        estimated_delivery_time=delivery
     )
 
     db.add(new_order)
+    await db.flush()
+    # One executemany for all the lines. Flushed as OrderItem objects, each row is
+    # its own INSERT ... RETURNING for an id nothing reads; the ORM's bulk insert
+    # still splits rows by which columns are None.
+    if order_lines:
+        # An empty parameter list would execute once as INSERT ... DEFAULT VALUES
+        await db.execute(OrderItem.__table__.insert(), [{**line, "order_id": new_order.id} for line in order_lines])
+    eta_engine.record_order_placed(db, new_order.id, data.restaurant_id, prep_minutes, ready, delivery)
+    analytics_crud.schedule_order_placed(db, new_order)
     await db.commit()
-    await db.refresh(new_order, attribute_names=['items'])
+    recommender.record_order(new_order.id, [line["menu_item_id"] for line in order_lines])
+    _publish("order_placed", [{name: getattr(new_order, name) for name in OrderRead.model_fields}])
     return new_order
 
 async def get_order_details(db: AsyncSession, order_id: int) -> Optional[Order]:
@@ -56,24 +126,175 @@ async def get_order_details(db: AsyncSession, order_id: int) -> Optional[Order]:
     )
     return result.scalar_one_or_none()
 
-async def update_order_status(db: AsyncSession, order: Order, status: OrderStatus) -> Order:
-    order.order_status = status
+class InvalidStatusTransition(ValueError):
+    def __init__(self, order_id: int, current: OrderStatus, requested: OrderStatus):
+        super().__init__(f"Order {order_id} cannot move from '{current.value}' to '{requested.value}'")
+        self.order_id = order_id
+        self.current = current
+
+async def get_order_snapshot(db: AsyncSession, order_id: int) -> Optional[Dict[str, Any]]:
+    """The order as OrderRead fields, the first event of its stream."""
+    row = (await db.execute(select(*schema_columns(OrderRead, Order)).where(Order.id == order_id))).first()
+    return row._asdict() if row is not None else None
+
+async def get_open_orders(db: AsyncSession, restaurant_id: int) -> List[Dict[str, Any]]:
+    """The restaurant's orders still in the kitchen, oldest first, as OrderRead fields."""
+    result = await db.execute(
+        select(*schema_columns(OrderRead, Order))
+        .where(Order.restaurant_id == restaurant_id, Order.order_status.in_(OPEN_STATUSES))
+        .order_by(Order.id)
+    )
+    return [row._asdict() for row in result.all()]
+
+def _status_update(status: OrderStatus):
+    values = {"order_status": status, **status_estimates(status)}
+    if status == OrderStatus.delivered:
+        values["delivery_time"] = func.now()
+    # Guarded on the current status, so of two racing updates only a legal one applies
+    return (
+        update(Order)
+        .where(Order.order_status.in_(status_predecessors(status)))
+        .values(**values)
+        .returning(*schema_columns(OrderRead, Order))
+        .execution_options(synchronize_session=False)
+    )
+
+async def update_order_status(db: AsyncSession, order_id: int, status: OrderStatus) -> Optional[Dict[str, Any]]:
+    """
+    Move an order to `status` with a single conditional UPDATE ... RETURNING.
+    Returns the updated order, None if it does not exist, or raises
+    InvalidStatusTransition if the lifecycle does not allow the move from its current status.
+    """
+    result = await db.execute(_status_update(status).where(Order.id == order_id))
+    row = result.first()
+    if row is None:
+        # Nothing matched: find out whether the order is missing or in the wrong state
+        current = (await db.execute(select(Order.order_status).where(Order.id == order_id))).scalar_one_or_none()
+        await db.rollback()
+        if current is None:
+            return None
+        raise InvalidStatusTransition(order_id, current, status)
+
+    # Predecessors are never delivered/cancelled, the only statuses with rollup deltas
+    analytics_crud.schedule_order_status_changes(db, [row], status)
+    estimates = await eta_engine.record_status_changes(db, [row], status)
     await db.commit()
-    await db.refresh(order)
+    order = {**row._asdict(), **estimates.pop(row.id, {})}
+    _publish("status_changed", [order], estimates)
     return order
 
-async def get_customer_orders(db: AsyncSession, customer_id: int) -> List[Order]:
+async def update_order_statuses(db: AsyncSession, order_ids: Sequence[int], status: OrderStatus) -> Dict[str, Any]:
+    """
+    Bulk form of `update_order_status`: one UPDATE for every order that may make the move.
+    Returns {"updated": [orders], "not_found": [ids], "conflicts": [{"id", "order_status"}]}.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    result = await db.execute(_status_update(status).where(Order.id.in_(order_ids)))
+    updated = result.all()
+
+    updated_ids = {row.id for row in updated}
+    skipped = [order_id for order_id in order_ids if order_id not in updated_ids]
+    current = {}
+    if skipped:
+        rows = await db.execute(select(Order.id, Order.order_status).where(Order.id.in_(skipped)))
+        current = dict(rows.all())
+
+    estimates = {}
+    if updated:
+        analytics_crud.schedule_order_status_changes(db, updated, status)
+        estimates = await eta_engine.record_status_changes(db, updated, status)
+    await db.commit()
+    orders = [{**row._asdict(), **estimates.pop(row.id, {})} for row in updated]
+    _publish("status_changed", orders, estimates)
+    return {
+        "updated": orders,
+        "not_found": [order_id for order_id in skipped if order_id not in current],
+        "conflicts": [{"id": order_id, "order_status": current[order_id]} for order_id in skipped if order_id in current],
+    }
+
+async def get_customer_orders(
+    db: AsyncSession, customer_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+    as_dicts: bool = False
+) -> Dict[str, Any]:
+    keys = [Order.order_date, Order.id]
+    query = select(*schema_columns(OrderRead, Order)) if as_dicts else select(Order)
     result = await db.execute(
-        select(Order)
+        paginate(query.where(Order.customer_id == customer_id), keys, cursor, limit, descending=True)
+    )
+    return build_page(result.all(), keys, limit, as_dicts=as_dicts)
+
+async def get_customer_recommendations(
+    db: AsyncSession, customer_id: int, limit: int = DEFAULT_PAGE_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    Items the customer has not ordered yet, scored by how often they are ordered
+    together with the items in the customer's recent orders. Empty for a customer
+    without orders (or one that does not exist).
+    """
+    recent = (
+        select(Order.id)
         .where(Order.customer_id == customer_id)
-        .order_by(Order.order_date.desc())
+        .order_by(Order.order_date.desc(), Order.id.desc())
+        .limit(RECOMMENDATION_HISTORY_ORDERS)
+    )
+    result = await db.execute(
+        select(OrderItem.menu_item_id, func.count(distinct(OrderItem.order_id)))
+        .where(OrderItem.order_id.in_(recent))
+        .group_by(OrderItem.menu_item_id)
     )
-    return result.scalars().all()
+    history = dict(result.all())
+    if not history:
+        return []
+    ranked = await recommender.suggest(db, history, limit * RECOMMENDATION_CANDIDATES)
+    if not ranked:
+        return []
+    items, _ = await recommended_menu_items(db, ranked, limit)
+    return items
 
-async def get_restaurant_orders(db: AsyncSession, restaurant_id: int) -> List[Order]:
+async def get_restaurant_orders(
+    db: AsyncSession, restaurant_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+    as_dicts: bool = False
+) -> Dict[str, Any]:
+    keys = [Order.order_date, Order.id]
+    query = select(*schema_columns(OrderRead, Order)) if as_dicts else select(Order)
     result = await db.execute(
-        select(Order)
-        .where(Order.restaurant_id == restaurant_id)
-        .order_by(Order.order_date.desc())
+        paginate(query.where(Order.restaurant_id == restaurant_id), keys, cursor, limit, descending=True)
     )
-    return result.scalars().all()
\ No newline at end of file
+    return build_page(result.all(), keys, limit, as_dicts=as_dicts)
+
+async def stream_restaurant_orders(
+    db: AsyncSession,
+    restaurant_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_items: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield a restaurant's orders in [start, end), oldest first, as chunks of dicts.
+    Rows come from a server-side cursor, so only one chunk is held in memory at a time.
+    With `include_items` each order gets an "items" list, loaded with one IN query per chunk.
+    """
+    query = select(*schema_columns(OrderRead, Order)).where(Order.restaurant_id == restaurant_id)
+    if start is not None:
+        query = query.where(Order.order_date >= start)
+    if end is not None:
+        query = query.where(Order.order_date < end)
+    query = query.order_by(Order.order_date, Order.id).execution_options(yield_per=chunk_size)
+
+    result = await db.stream(query)
+    async for partition in result.mappings().partitions():
+        orders = [dict(row) for row in partition]
+        if include_items:
+            items_result = await db.execute(
+                select(OrderItem.order_id, *EXPORT_ITEM_COLUMNS)
+                .where(OrderItem.order_id.in_([order["id"] for order in orders]))
+                .order_by(OrderItem.order_id, OrderItem.id)
+            )
+            items_by_order = defaultdict(list)
+            for item in items_result.mappings():
+                item = dict(item)
+                items_by_order[item.pop("order_id")].append(item)
+            for order in orders:
+                order["items"] = items_by_order.get(order["id"], [])
+        yield orders
@@ -1,25 +1,65 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, delete, insert, exists, and_, or_
 from sqlalchemy.orm import selectinload
-from api.models.restaurant import Restaurant
+from api.models.restaurant import Restaurant, RestaurantOpenWindow
 from api.models.menu_item import MenuItem
-from api.schemas.restaurant import RestaurantCreate, RestaurantUpdate
+from api.schemas.restaurant import RestaurantCreate, RestaurantRead, RestaurantUpdate
+from api.crud import analytics as analytics_crud
+from api.crud import review as review_crud
+from api.utils.pagination import DEFAULT_PAGE_SIZE, paginate, build_page
+from api.utils.cache import menu_cache
+from api.utils.serialization import schema_columns
+from api.utils import geo, schedule, search
+from api.utils.eta import eta_engine
+from datetime import time
+from typing import Any, Dict, List, Optional
+
+# Radius the nearby search tries first; when fewer than k restaurants are that
+# close it searches the whole max_distance_km in a second and last query
+NEARBY_INITIAL_RADIUS_KM = 1.0
+
+# Open-now result sets up to this size are read from the windows index and sorted;
+# larger ones are paged by walking restaurants in name order instead
+OPEN_NOW_SORT_LIMIT = 2000
+
+async def _set_open_windows(db: AsyncSession, restaurant_id: int, opening_time: time, closing_time: time, replace: bool = True):
+    if replace:
+        await db.execute(delete(RestaurantOpenWindow).where(RestaurantOpenWindow.restaurant_id == restaurant_id))
+    await db.execute(insert(RestaurantOpenWindow), [
+        {"restaurant_id": restaurant_id, "open_minute": open_minute, "close_minute": close_minute}
+        for open_minute, close_minute in schedule.open_windows(opening_time, closing_time)
+    ])
 
 async def create_restaurant(db: AsyncSession, data: RestaurantCreate) -> Restaurant:
     restaurant = Restaurant(**data.model_dump())
     db.add(restaurant)
+    # Server defaults come back through INSERT ... RETURNING, no refresh needed
+    await db.flush()
+    await search.index(db, "restaurants", [restaurant.id], replace=False)
+    await _set_open_windows(db, restaurant.id, restaurant.opening_time, restaurant.closing_time, replace=False)
     await db.commit()
-    await db.refresh(restaurant)
     return restaurant
 
-async def get_restaurants(db: AsyncSession):
-    result = await db.execute(select(Restaurant))
-    return result.scalars().all()
+async def get_restaurants(db: AsyncSession, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    keys = [Restaurant.name, Restaurant.id]
+    result = await db.execute(paginate(select(Restaurant), keys, cursor, limit))
+    return build_page(result.all(), keys, limit)
 
 async def get_restaurant(db: AsyncSession, restaurant_id: int):
     result = await db.execute(select(Restaurant).where(Restaurant.id == restaurant_id))
     return result.scalar_one_or_none()
 
+async def get_restaurant_version(db: AsyncSession, restaurant_id: int):
+    """(id, version, updated_at) of the restaurant, for its HTTP validators; None if it does not exist."""
+    result = await db.execute(
+        select(Restaurant.id, Restaurant.version, Restaurant.updated_at)
+        .where(Restaurant.id == restaurant_id)
+    )
+    return result.first()
+
+async def restaurant_exists(db: AsyncSession, restaurant_id: int) -> bool:
+    return await db.scalar(select(exists().where(Restaurant.id == restaurant_id)))
+
 async def get_restaurant_with_menu(db: AsyncSession, restaurant_id: int):
     result = await db.execute(
         select(Restaurant)
@@ -41,13 +81,165 @@ async def get_restaurant_with_menu(db: AsyncSession, restaurant_id: int):
     
     return restaurant
 
-async def update_restaurant(db: AsyncSession, restaurant: Restaurant, data: RestaurantUpdate):
-    for field, value in data.model_dump(exclude_unset=True).items():
-        setattr(restaurant, field, value)
+async def update_restaurant(db: AsyncSession, restaurant_id: int, data: RestaurantUpdate) -> Optional[Restaurant]:
+    """Update in a single UPDATE ... RETURNING; None if the restaurant does not exist."""
+    values = data.model_dump(exclude_unset=True)
+    if not values:
+        return await get_restaurant(db, restaurant_id)
+    result = await db.execute(
+        update(Restaurant).where(Restaurant.id == restaurant_id).values(**values).returning(Restaurant)
+    )
+    restaurant = result.scalar_one_or_none()
+    if restaurant and {"name", "cuisine_type"} & values.keys():
+        await search.index(db, "restaurants", [restaurant_id])
+    if restaurant and {"opening_time", "closing_time"} & values.keys():
+        await _set_open_windows(db, restaurant_id, restaurant.opening_time, restaurant.closing_time)
     await db.commit()
-    await db.refresh(restaurant)
+    if restaurant:
+        menu_cache.invalidate(restaurant_id)
     return restaurant
 
+async def search_restaurants(
+    db: AsyncSession,
+    q: str,
+    cuisine_type: Optional[str] = None,
+    active_only: bool = True,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    as_dicts: bool = False
+):
+    """Full-text search over name and cuisine type, best match first."""
+    query = select(*schema_columns(RestaurantRead, Restaurant)) if as_dicts else select(Restaurant)
+    if cuisine_type:
+        query = query.where(Restaurant.cuisine_type == cuisine_type)
+    if active_only:
+        query = query.where(Restaurant.is_active == True)
+    return await search.search(db, "restaurants", q, query, cursor, limit, as_dicts=as_dicts)
+
+async def get_nearby_restaurants(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    k: int = 10,
+    max_distance_km: float = 5.0,
+    cuisine_type: Optional[str] = None,
+    min_rating: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    The k nearest active restaurants within `max_distance_km`, nearest first, as
+    RestaurantRead dicts plus distance_km. Searches the neighbourhood first, so
+    where restaurants are dense only those nearby are read, in at most two queries.
+    """
+    query = select(*schema_columns(RestaurantRead, Restaurant)).where(Restaurant.is_active == True)
+    if cuisine_type:
+        query = query.where(Restaurant.cuisine_type == cuisine_type)
+    if min_rating is not None:
+        query = query.where(Restaurant.rating >= min_rating)
+
+    if await geo.has_rtree(db):
+        box = geo.restaurants_rtree.c
+        query = query.join(geo.restaurants_rtree, box.id == Restaurant.id)
+        lat_range, lon_range = (box.min_lat, box.max_lat), (box.min_lon, box.max_lon)
+    else:
+        # Without the R*Tree this is a scan of the coordinate columns
+        lat_range, lon_range = (Restaurant.latitude, Restaurant.latitude), (Restaurant.longitude, Restaurant.longitude)
+
+    radius = min(NEARBY_INITIAL_RADIUS_KM, max_distance_km)
+    while True:
+        in_boxes = or_(*[
+            and_(lat_range[1] >= min_lat, lat_range[0] <= max_lat, lon_range[1] >= min_lon, lon_range[0] <= max_lon)
+            for min_lat, max_lat, min_lon, max_lon in geo.bounding_boxes(latitude, longitude, radius)
+        ])
+        hits = []
+        for row in (await db.execute(query.where(in_boxes))).all():
+            distance = geo.haversine_km(latitude, longitude, row.latitude, row.longitude)
+            if distance <= radius:
+                hits.append((distance, row))
+        # Anything outside the radius is further away than every hit inside it
+        if len(hits) >= k or radius >= max_distance_km:
+            break
+        radius = max_distance_km
+
+    hits.sort(key=lambda hit: (hit[0], hit[1].id))
+    return [{**row._asdict(), "distance_km": round(distance, 3)} for distance, row in hits[:k]]
+
+async def get_open_restaurants(
+    db: AsyncSession,
+    at: time,
+    cuisine_type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    active_only: bool = True,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    as_dicts: bool = False
+) -> Dict[str, Any]:
+    """Restaurants open at time of day `at`, by name, with keyset pagination."""
+    minute = schedule.minute_of_day(at)
+    window = RestaurantOpenWindow
+    # Each bound has its own index. Before noon the opening bound rules out the most
+    # windows, after noon the closing bound does; "+ 0" keeps SQLite off the other index.
+    if minute < schedule.MINUTES_PER_DAY // 2:
+        open_at = and_(window.open_minute <= minute, window.close_minute + 0 > minute)
+    else:
+        open_at = and_(window.open_minute + 0 <= minute, window.close_minute > minute)
+    open_ids = (await db.execute(
+        select(window.restaurant_id).where(open_at).limit(OPEN_NOW_SORT_LIMIT + 1)
+    )).scalars().all()
+
+    query = select(*schema_columns(RestaurantRead, Restaurant)) if as_dicts else select(Restaurant)
+    if len(open_ids) <= OPEN_NOW_SORT_LIMIT:
+        query = query.where(Restaurant.id.in_(open_ids))
+    else:
+        query = query.where(exists().where(
+            window.restaurant_id == Restaurant.id, window.open_minute <= minute, window.close_minute > minute
+        ))
+    if active_only:
+        query = query.where(Restaurant.is_active == True)
+    if cuisine_type:
+        query = query.where(Restaurant.cuisine_type == cuisine_type)
+    if min_rating is not None:
+        query = query.where(Restaurant.rating >= min_rating)
+
+    keys = [Restaurant.name, Restaurant.id]
+    result = await db.execute(paginate(query, keys, cursor, limit))
+    return build_page(result.all(), keys, limit, as_dicts=as_dicts)
+
+async def rebuild_open_windows(db: AsyncSession) -> int:
+    """Recompute every restaurant's open windows from its opening/closing times."""
+    await db.execute(delete(RestaurantOpenWindow))
+    count = 0
+    result = await db.stream(select(Restaurant.id, Restaurant.opening_time, Restaurant.closing_time).execution_options(yield_per=1000))
+    async for rows in result.partitions():
+        windows = [
+            {"restaurant_id": restaurant_id, "open_minute": open_minute, "close_minute": close_minute}
+            for restaurant_id, opening_time, closing_time in rows
+            for open_minute, close_minute in schedule.open_windows(opening_time, closing_time)
+        ]
+        await db.execute(insert(RestaurantOpenWindow), windows)
+        count += len(rows)
+    await db.commit()
+    return count
+
 async def delete_restaurant(db: AsyncSession, restaurant: Restaurant):
+    # The menu items go with the restaurant (ORM cascade), so their search entries and facet counts do too.
+    # Load what the cascade visits up front, rather than one lazy load per menu item.
+    await db.execute(
+        select(Restaurant).where(Restaurant.id == restaurant.id)
+        .options(
+            selectinload(Restaurant.menu_items).selectinload(MenuItem.order_items),
+            selectinload(Restaurant.orders),
+            selectinload(Restaurant.reviews),
+        )
+    )
+    menu_items = restaurant.menu_items
+    # Only to cancel their pending rating jobs; the aggregates go with the restaurant
+    await review_crud.forget_reviews(db, restaurant.reviews)
+    await search.remove(db, "menu_items", [item.id for item in menu_items])
+    await analytics_crud.record_menu_facet_changes(db, removed=menu_items)
+    await search.remove(db, "restaurants", [restaurant.id])
+    await analytics_crud.forget_restaurant(db, restaurant.id)
+    await db.execute(delete(RestaurantOpenWindow).where(RestaurantOpenWindow.restaurant_id == restaurant.id))
     await db.delete(restaurant)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+    menu_cache.invalidate(restaurant.id)
+    eta_engine.forget(restaurant.id)
\ No newline at end of file
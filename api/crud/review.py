@@ -1,51 +1,174 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, case, select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from api.models.review import Review
 from api.models.restaurant import Restaurant
-from api.models.order import Order
+from api.models.order import Order, OrderStatus
+from api.models.job import Job
 from api.schemas.review import ReviewCreate
-from typing import List
+from typing import Any, Dict, Iterable, Optional, Set
+from api.utils.pagination import DEFAULT_PAGE_SIZE, paginate, build_page
+from api.utils.cache import menu_cache
+from api.crud.errors import NotFoundError
+from api.external_services import jobs
+
+# Background job folding a new review into its restaurant's rating
+RATING_JOB = "restaurant_rating"
+
+async def add_review(db: AsyncSession, order_id: int, data: ReviewCreate) -> Review:
+    """
+    Review a delivered order. Raises NotFoundError if the order does not exist and
+    ValueError if it is not delivered or already reviewed.
+    """
+    result = await db.execute(
+        select(Order.customer_id, Order.restaurant_id, Order.order_status, Review.id.label("review_id"))
+        .outerjoin(Review, Review.order_id == Order.id)
+        .where(Order.id == order_id)
+    )
+    order = result.first()
+    if order is None:
+        raise NotFoundError("Order not found")
+    if order.order_status != OrderStatus.delivered:
+        raise ValueError("Review can only be added for delivered orders.")
+    if order.review_id is not None:
+        raise ValueError("A review for this order already exists.")
 
-async def add_review(db: AsyncSession, order: Order, data: ReviewCreate) -> Review:
     review = Review(
         customer_id=order.customer_id,
         restaurant_id=order.restaurant_id,
-        order_id=order.id,
+        order_id=order_id,
         rating=data.rating,
         comment=data.comment
     )
     db.add(review)
-    
-    # Update restaurant's average rating
-    restaurant = await db.get(Restaurant, order.restaurant_id)
-    if restaurant:
-        # Get all ratings for the restaurant
-        result = await db.execute(
-            select(func.avg(Review.rating)).where(Review.restaurant_id == order.restaurant_id)
-        )
-        avg_rating = result.scalar()
-        restaurant.rating = round(avg_rating, 2) if avg_rating else 0.0
+    # The restaurant's rating catches up in the background, committed with the review
+    jobs.enqueue(db, RATING_JOB, {"order_id": order_id})
 
-    await db.commit()
-    await db.refresh(review)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent review of the same order (unique order_id)
+        await db.rollback()
+        raise ValueError("A review for this order already exists.")
     return review
 
-async def get_restaurant_reviews(db: AsyncSession, restaurant_id: int) -> List[Review]:
-    result = await db.execute(
+@jobs.handler(RATING_JOB)
+async def _rating_job(db: AsyncSession, payload: Dict[str, Any]):
+    review = (
+        await db.execute(select(Review.restaurant_id, Review.rating).where(Review.order_id == payload["order_id"]))
+    ).first()
+    if review is None:
+        return  # deleted along with its customer or restaurant
+    # Fold the rating into the restaurant's running aggregates. The increments are
+    # evaluated by the database, so concurrent reviews cannot lose updates.
+    await db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == review.restaurant_id)
+        .values(
+            rating_sum=Restaurant.rating_sum + review.rating,
+            rating_count=Restaurant.rating_count + 1,
+            rating=func.round((Restaurant.rating_sum + review.rating) * 1.0 / (Restaurant.rating_count + 1), 2)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # The restaurant's rating is part of the cached with-menu payload
+    jobs.after_commit(db, lambda: menu_cache.invalidate(review.restaurant_id))
+
+async def forget_reviews(db: AsyncSession, reviews: Iterable[Review]) -> Set[int]:
+    """
+    Take reviews that are about to be deleted out of their restaurants' ratings, in
+    the caller's transaction; returns the ids of the restaurants whose rating changed.
+    A review whose rating job has not run yet was never counted: the job is cancelled
+    instead, so it cannot pick up a later review of an order that reuses the id.
+    """
+    reviews = list(reviews)
+    if not reviews:
+        return set()
+    pending = await jobs.cancel(
+        db, [RATING_JOB], Job.payload["order_id"].as_integer().in_([review.order_id for review in reviews])
+    )
+    uncounted = {payload["order_id"] for payload in pending}
+
+    removed: Dict[int, Dict[str, int]] = {}
+    for review in reviews:
+        if review.order_id not in uncounted:
+            totals = removed.setdefault(review.restaurant_id, {"restaurant_id_": review.restaurant_id, "removed_sum": 0, "removed_count": 0})
+            totals["removed_sum"] += review.rating
+            totals["removed_count"] += 1
+    if removed:
+        rating_sum = Restaurant.rating_sum - bindparam("removed_sum")
+        rating_count = Restaurant.rating_count - bindparam("removed_count")
+        # One executemany over the table; like the rebuild, a restaurant left without reviews keeps its rating
+        await db.execute(
+            update(Restaurant.__table__)
+            .where(Restaurant.id == bindparam("restaurant_id_"))
+            .values(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                rating=case((rating_count > 0, func.round(rating_sum * 1.0 / rating_count, 2)), else_=Restaurant.rating)
+            ),
+            list(removed.values())
+        )
+    return set(removed)
+
+async def get_restaurant_reviews(
+    db: AsyncSession, restaurant_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    keys = [Review.created_at, Review.id]
+    query = (
         select(Review)
         .options(selectinload(Review.customer))
         .where(Review.restaurant_id == restaurant_id)
-        .order_by(Review.created_at.desc())
     )
-    return result.scalars().all()
+    result = await db.execute(paginate(query, keys, cursor, limit, descending=True))
+    return build_page(result.all(), keys, limit)
 
-async def get_customer_reviews(db: AsyncSession, customer_id: int) -> List[Review]:
-    result = await db.execute(
+async def get_customer_reviews(
+    db: AsyncSession, customer_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    keys = [Review.created_at, Review.id]
+    query = (
         select(Review)
         .options(selectinload(Review.restaurant))
         .where(Review.customer_id == customer_id)
-        .order_by(Review.created_at.desc())
     )
-    return result.scalars().all()
\ No newline at end of file
+    result = await db.execute(paginate(query, keys, cursor, limit, descending=True))
+    return build_page(result.all(), keys, limit)
+
+async def recompute_restaurant_ratings(db: AsyncSession) -> int:
+    """
+    Rebuild rating_sum/rating_count/rating for every restaurant from the reviews table.
+    Used to backfill the aggregates or repair them after manual data fixes.
+    """
+    rating_sum = (
+        select(func.coalesce(func.sum(Review.rating), 0))
+        .where(Review.restaurant_id == Restaurant.id)
+        .scalar_subquery()
+    )
+    rating_count = (
+        select(func.count(Review.id))
+        .where(Review.restaurant_id == Restaurant.id)
+        .scalar_subquery()
+    )
+    average = (
+        select(func.round(func.avg(Review.rating), 2))
+        .where(Review.restaurant_id == Restaurant.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Restaurant)
+        .values(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            # Restaurants without reviews keep their current rating
+            rating=func.coalesce(average, Restaurant.rating)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Reviews still waiting for their rating job are counted above already
+    await jobs.cancel(db, [RATING_JOB])
+    await db.commit()
+    menu_cache.clear()
+    return result.rowcount
@@ -1,17 +1,153 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import os
+import secrets
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 
-DATABASE_URL = "sqlite+aiosqlite:///./restaurants.db"
+from api.utils.instrumentation import TimedQueuePool
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """
+    Engine configuration. Every field can be overridden from the environment
+    using its upper-cased name, e.g. DATABASE_POOL_SIZE=20 or SQLITE_SYNCHRONOUS=FULL.
+    SQLite pragmas set to None are left at SQLite's defaults.
+    """
+    database_url: str = "sqlite+aiosqlite:///./restaurants.db"
+    # Replica for GET traffic; SQLite defaults to read-only connections on the same file
+    database_read_url: Optional[str] = None
+    database_echo: bool = False
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0
+    database_pool_pre_ping: bool = False
+    sqlite_journal_mode: Optional[str] = "WAL"
+    sqlite_synchronous: Optional[str] = "NORMAL"
+    sqlite_busy_timeout_ms: Optional[int] = 5000
+    sqlite_mmap_size: Optional[int] = 256 * 1024 * 1024
+    sqlite_cache_size_kib: Optional[int] = 64 * 1024
+    # Take the write lock when a write transaction starts instead of on its first write
+    sqlite_begin_immediate: bool = True
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "DatabaseSettings":
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is None:
+                continue
+            if raw.lower() in ("", "none"):
+                values[field.name] = None
+            elif field.type in (bool, "bool"):
+                values[field.name] = raw.lower() in ("1", "true", "yes", "on")
+            elif field.default is not None and not isinstance(field.default, str):
+                values[field.name] = type(field.default)(raw)
+            else:
+                values[field.name] = raw
+        return cls(**values)
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.database_url).get_backend_name() == "sqlite"
+
+    @property
+    def read_url(self) -> str:
+        if self.database_read_url:
+            return self.database_read_url
+        url = make_url(self.database_url)
+        if self.is_sqlite and url.database not in (None, "", ":memory:"):
+            # Separate read-only connections; under WAL they never block on writers
+            return url.set(
+                database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"}
+            ).render_as_string(hide_password=False)
+        return self.database_url
+
+    def sqlite_pragmas(self, read_only: bool = False) -> dict:
+        pragmas = {
+            "journal_mode": self.sqlite_journal_mode,
+            "synchronous": self.sqlite_synchronous,
+            "busy_timeout": self.sqlite_busy_timeout_ms,
+            "mmap_size": self.sqlite_mmap_size,
+            # Negative cache_size is in KiB rather than pages
+            "cache_size": -self.sqlite_cache_size_kib if self.sqlite_cache_size_kib is not None else None,
+        }
+        if read_only:
+            # The journal mode is a property of the file and is set by the writer
+            pragmas = {name: value for name, value in pragmas.items() if name not in ("journal_mode", "synchronous")}
+            pragmas["query_only"] = 1
+        return {name: value for name, value in pragmas.items() if value is not None}
+
+def create_engine_from_settings(settings: DatabaseSettings, read_only: bool = False) -> AsyncEngine:
+    url = make_url(settings.read_url if read_only else settings.database_url)
+    options = {"echo": settings.database_echo, "pool_pre_ping": settings.database_pool_pre_ping}
+    # In-memory SQLite uses a single static connection, so pool sizing does not apply
+    if not (settings.is_sqlite and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+        )
+    engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == "sqlite":
+        pragmas = settings.sqlite_pragmas(read_only)
+        begin_immediate = settings.sqlite_begin_immediate and not read_only
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+            if begin_immediate:
+                # Let SQLAlchemy emit BEGIN itself (see the "begin" listener below)
+                dbapi_connection.isolation_level = None
+
+        if begin_immediate:
+            @event.listens_for(engine.sync_engine, "begin")
+            def begin_immediate_transaction(connection):
+                # A deferred transaction that reads first cannot always upgrade to a
+                # write lock and fails with "database is locked" under contention
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+settings = DatabaseSettings.from_env()
+DATABASE_URL = settings.database_url
 
 # SQLAlchemy base class
 class Base(DeclarativeBase):
     pass
 
-# Engine & session factory
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+def initial_version() -> int:
+    """
+    Starting value of the row version columns: random, so a row that reuses
+    the id of a deleted one does not repeat its ETags.
+    """
+    return secrets.randbits(31)
+
+# Engines & session factories. Writes go through `engine`; GET routes use the
+# read-only pool so they keep running while writers hold the database.
+engine = create_engine_from_settings(settings)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
-# Dependency for FastAPI
+if settings.is_sqlite and settings.read_url == settings.database_url:
+    # In-memory SQLite cannot be shared between pools
+    read_engine = engine
+else:
+    read_engine = create_engine_from_settings(settings, read_only=True)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+
+# Dependencies for FastAPI
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db() -> AsyncSession:
+    async with ReadSessionLocal() as session:
+        yield session
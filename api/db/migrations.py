@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Revision matching the schema that Base.metadata.create_all used to produce
+BASELINE_REVISION = "0001"
+
+def alembic_config(connection: Connection = None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def upgrade_database(connection: Connection, revision: str = "head") -> None:
+    """Bring the schema up to `revision`. Meant for `AsyncConnection.run_sync`."""
+    config = alembic_config(connection)
+    tables = inspect(connection).get_table_names()
+    # Databases created by create_all before migrations existed have tables but no version
+    if "restaurants" in tables and "alembic_version" not in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+async def has_table(db: AsyncSession, name: str) -> bool:
+    """Whether an optional table (e.g. a SQLite virtual table) was created by the migrations."""
+    return await db.run_sync(lambda session: inspect(session.connection()).has_table(name))
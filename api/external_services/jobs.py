@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from api.models.job import CLAIMABLE, Job, JobStatus
+
+# Background jobs for side effects that do not need to hold up the response.
+#
+# Writers enqueue a job in the same transaction as their own changes (an outbox):
+# it exists exactly when the write does. A pool of JOB_WORKERS asyncio tasks claims
+# due jobs CLAIM_BATCH at a time, leasing them for LEASE_SECONDS, and runs each
+# handler in a fresh transaction that also deletes the job; so a handler's database changes
+# commit exactly once, even when a lease runs out and another worker reruns it.
+# A job whose handler raises is retried with exponential backoff and marked
+# failed after MAX_ATTEMPTS.
+#
+# Workers wake up when a transaction that enqueued jobs commits in this process,
+# and poll every POLL_SECONDS for jobs enqueued elsewhere or due for a retry.
+# JOB_WORKERS=0 leaves the jobs to a pool in another process. A worker that cannot
+# reach the database logs the error and backs off; any other error stops it.
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 5))
+LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+# Jobs claimed per transaction; a claim costs about as much as running a short job
+CLAIM_BATCH = 10
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[None]]
+
+_handlers: Dict[str, Handler] = {}
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def handler(kind: str):
+    """Register the coroutine running jobs of `kind`. It must not commit; the worker does."""
+    def register(function: Handler) -> Handler:
+        _handlers[kind] = function
+        return function
+    return register
+
+def enqueue(db: AsyncSession, kind: str, payload: Dict[str, Any]):
+    """Add a job to the caller's transaction; it runs once that commits."""
+    db.add(Job(kind=kind, payload=payload, run_at=utc_now()))
+    db.sync_session.info["jobs_enqueued"] = True
+
+def after_commit(db: AsyncSession, callback: Callable[[], None]):
+    """From a handler: run `callback` once the job's transaction has committed."""
+    db.sync_session.info.setdefault("job_callbacks", []).append(callback)
+
+async def cancel(db: AsyncSession, kinds: Iterable[str], *where) -> List[Dict[str, Any]]:
+    """
+    Drop the unfinished jobs of `kinds`, optionally narrowed by `where` clauses
+    (e.g. on Job.payload), in the caller's transaction; returns their payloads.
+    For rebuilds that recompute what those jobs would have changed, and for
+    deletes of the rows they refer to. A worker already running one of them rolls it back.
+    """
+    result = await db.execute(
+        delete(Job)
+        .where(Job.kind.in_(list(kinds)), CLAIMABLE, *where)
+        .returning(Job.payload)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before retrying a job that failed its `attempts`-th run, with jitter."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+@dataclass
+class ClaimedJob:
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    # The lease expiry written by the claim; a worker only finishes the job while it still matches
+    lease: datetime
+
+class JobPool:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.session_factory: Optional[async_sessionmaker] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.completed = 0
+        self.retried = 0
+        self.exhausted = 0
+        self.abandoned = 0
+
+    def start(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _sleep(self):
+        # A timer rather than wait_for, so stop()'s cancellation is never swallowed
+        timer = asyncio.get_running_loop().call_later(POLL_SECONDS, self._wakeup.set)
+        try:
+            await self._wakeup.wait()
+        finally:
+            timer.cancel()
+
+    async def _work(self):
+        failures = 0
+        while True:
+            # Cleared before claiming: a job committed after this point sets it again
+            self._wakeup.clear()
+            try:
+                claimed = await self._claim()
+                for job in claimed:
+                    await self._run(job)
+            except DBAPIError:
+                # The leases of the jobs claimed run out and they are claimed again
+                failures += 1
+                logger.exception("Job worker could not reach the database (%d failures in a row)", failures)
+                await asyncio.sleep(retry_delay(failures))
+                continue
+            except Exception:
+                logger.exception("Job worker stopped")
+                raise
+            failures = 0
+            if not claimed:
+                await self._sleep()
+
+    async def _claim(self, limit: int = CLAIM_BATCH) -> List[ClaimedJob]:
+        now = utc_now()
+        lease = now + timedelta(seconds=LEASE_SECONDS)
+        # Due pending jobs, and running ones whose worker let the lease run out
+        due = (
+            select(Job.id)
+            .where(CLAIMABLE, Job.run_at <= now)
+            .order_by(Job.run_at)
+            .limit(limit)
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id.in_(due))
+                .values(status=JobStatus.running, attempts=Job.attempts + 1, run_at=lease)
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            await db.commit()
+        return [ClaimedJob(*row, lease=lease) for row in rows]
+
+    def _leased(self, job: ClaimedJob):
+        return (Job.id == job.id) & (Job.status == JobStatus.running) & (Job.run_at == job.lease)
+
+    async def _run(self, job: ClaimedJob):
+        try:
+            async with self.session_factory() as db:
+                run = _handlers.get(job.kind)
+                if run is None:
+                    raise LookupError(f"No handler for job kind {job.kind!r}")
+                await run(db, job.payload)
+                result = await db.execute(delete(Job).where(self._leased(job)).execution_options(synchronize_session=False))
+                if result.rowcount == 0:
+                    # Cancelled, or taken over by another worker after the lease ran out
+                    await db.rollback()
+                    self.abandoned += 1
+                    return
+                await db.commit()
+                for callback in db.sync_session.info.pop("job_callbacks", ()):
+                    callback()
+            self.completed += 1
+        except Exception as error:
+            await self._retry(job, error)
+
+    async def _retry(self, job: ClaimedJob, error: Exception):
+        values: Dict[str, Any] = {"last_error": f"{type(error).__name__}: {error}"[:2000]}
+        if job.attempts >= MAX_ATTEMPTS:
+            values["status"] = JobStatus.failed
+            self.exhausted += 1
+        else:
+            values["status"] = JobStatus.pending
+            values["run_at"] = utc_now() + timedelta(seconds=retry_delay(job.attempts))
+            self.retried += 1
+        async with self.session_factory() as db:
+            await db.execute(update(Job).where(self._leased(job)).values(**values).execution_options(synchronize_session=False))
+            await db.commit()
+
+    async def run_due(self, session_factory: Optional[async_sessionmaker] = None) -> int:
+        """Run every job that is due now in the calling task (maintenance, benchmarks); the number run."""
+        self.session_factory = session_factory or self.session_factory
+        count = 0
+        while claimed := await self._claim():
+            for job in claimed:
+                await self._run(job)
+            count += len(claimed)
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": sum(not task.done() for task in self._tasks),
+            "completed": self.completed,
+            "retried": self.retried,
+            "exhausted": self.exhausted,
+            "abandoned": self.abandoned,
+        }
+
+async def queue_depth(db: AsyncSession) -> Dict[str, Any]:
+    """Jobs per status, and how long the oldest due pending job has been waiting."""
+    result = await db.execute(select(Job.status, func.count(), func.min(Job.run_at)).group_by(Job.status))
+    depth: Dict[str, Any] = {status.value: 0 for status in JobStatus}
+    lag = 0.0
+    for status, count, oldest in result.all():
+        depth[status.value] = count
+        if status == JobStatus.pending:
+            # SQLite hands back naive datetimes; they are stored in UTC
+            oldest = oldest.replace(tzinfo=timezone.utc) if oldest.tzinfo is None else oldest
+            lag = max(0.0, (utc_now() - oldest).total_seconds())
+    return {**depth, "lag_seconds": round(lag, 3)}
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        pool.notify()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
+    session.info.pop("job_callbacks", None)
+
+pool = JobPool()
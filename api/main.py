@@ -1,10 +1,15 @@
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import RedirectResponse, JSONResponse
 from contextlib import asynccontextmanager
 
 # Import all models to ensure they are registered with Base
-from api.models import customer, restaurant, menu_item, order, order_item, review
-from api.db.database import Base, engine
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics, job
+from api.db.database import AsyncSessionLocal, engine
+from api.db.migrations import upgrade_database
+from api.external_services import jobs
+from api.utils import pubsub
+from api.utils.instrumentation import SQLInstrumentationMiddleware
+from api.utils.pagination import InvalidCursor
 
 # Import all routers
 from api.routers import (
@@ -13,15 +18,21 @@ from api.routers import (
     customer as customer_router,
     order as order_router,
     review as review_router,
-    analytics as analytics_router
+    analytics as analytics_router,
+    jobs as jobs_router,
+    metrics as metrics_router
 )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create all tables
+    # Apply pending schema migrations
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_database)
+    pubsub.start()
+    jobs.pool.start(AsyncSessionLocal)
     yield
+    await jobs.pool.stop()
+    pubsub.stop()
 
 app = FastAPI(
     title="Complete Food Delivery System API",
@@ -29,6 +40,11 @@ app = FastAPI(
     version="3.0.0",
     lifespan=lifespan
 )
+app.add_middleware(SQLInstrumentationMiddleware)
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 @app.get("/")
 def home_page():
@@ -40,4 +56,6 @@ app.include_router(menu_item_router.router)
 app.include_router(customer_router.router)
 app.include_router(order_router.router)
 app.include_router(review_router.router)
-app.include_router(analytics_router.router)
\ No newline at end of file
+app.include_router(analytics_router.router)
+app.include_router(jobs_router.router)
+app.include_router(metrics_router.router)
\ No newline at end of file
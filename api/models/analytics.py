@@ -0,0 +1,55 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Boolean, ForeignKey, Integer, DECIMAL, Index, String
+from decimal import Decimal
+from api.db.database import Base
+
+# Rollup tables maintained incrementally by the order and menu item CRUD functions.
+# They can always be rebuilt from orders/order_items/menu_items with `rebuild_rollups`.
+
+class RestaurantStats(Base):
+    __tablename__ = "restaurant_stats"
+
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    total_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    delivered_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cancelled_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_revenue: Mapped[Decimal] = mapped_column(DECIMAL(12, 2), nullable=False, default=Decimal("0"))
+
+class CustomerStats(Base):
+    __tablename__ = "customer_stats"
+
+    customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    total_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    delivered_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cancelled_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_spending: Mapped[Decimal] = mapped_column(DECIMAL(12, 2), nullable=False, default=Decimal("0"))
+
+class CustomerRestaurantStats(Base):
+    __tablename__ = "customer_restaurant_stats"
+    __table_args__ = (
+        Index("ix_customer_restaurant_stats_customer_orders", "customer_id", "order_count"),
+    )
+
+    customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class MenuItemSales(Base):
+    __tablename__ = "menu_item_sales"
+    __table_args__ = (
+        Index("ix_menu_item_sales_restaurant_quantity", "restaurant_id", "quantity_sold"),
+    )
+
+    menu_item_id: Mapped[int] = mapped_column(ForeignKey("menu_items.id", ondelete="CASCADE"), primary_key=True)
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    quantity_sold: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class MenuItemFacetCounts(Base):
+    """Menu item counts per facet combination, for facet counts on unfiltered searches."""
+    __tablename__ = "menu_item_facet_counts"
+
+    category: Mapped[str] = mapped_column(String(50), primary_key=True)
+    is_vegetarian: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    is_vegan: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    is_available: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
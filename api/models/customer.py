@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, DateTime, func
-from typing import List, TYPE_CHECKING
+from sqlalchemy import String, Boolean, DateTime, Float, Integer, func, literal_column
+from typing import List, Optional, TYPE_CHECKING
 from datetime import datetime
-from api.db.database import Base
+from api.db.database import Base, initial_version
 
 if TYPE_CHECKING:
     from .order import Order
@@ -16,11 +16,17 @@ class Customer(Base):
     email: Mapped[str] = mapped_column(String(100), unique=True, index=True, nullable=False)
     phone_number: Mapped[str] = mapped_column(String(20), unique=True, nullable=False)
     address: Mapped[str] = mapped_column(String(255), nullable=False)
+    latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    # Bumped by every UPDATE of the row; the ETag validator (see api.utils.http_cache)
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=initial_version, server_default="1", onupdate=literal_column("version") + 1
+    )
 
     # Relationships
     orders: Mapped[List["Order"]] = relationship("Order", back_populates="customer", cascade="all, delete-orphan")
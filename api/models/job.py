@@ -0,0 +1,36 @@
+import enum
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, func, Integer, Enum, Index, JSON, Text, text
+from typing import Any, Dict, Optional
+from datetime import datetime
+from api.db.database import Base
+
+class JobStatus(enum.Enum):
+    pending = "pending"
+    running = "running"
+    failed = "failed"
+
+# Jobs a worker may claim once due; matched literally so the partial index applies
+CLAIMABLE = text("status != 'failed'")
+
+class Job(Base):
+    """
+    Side effect enqueued in the same transaction as the write that caused it and
+    run by the worker pool in api.external_services.jobs. Finished jobs are deleted;
+    failed ones are kept for inspection.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Due-job lookup in run_at order, without the failed jobs kept for inspection
+        Index("ix_jobs_claimable_run_at", "run_at", sqlite_where=CLAIMABLE, postgresql_where=CLAIMABLE),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), nullable=False, default=JobStatus.pending)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # When the job is next due; for a running job, when its worker's lease runs out
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
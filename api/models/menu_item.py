@@ -1,9 +1,9 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, Float, Boolean, Integer, DateTime, func, ForeignKey, DECIMAL
+from sqlalchemy import String, Text, Float, Boolean, Integer, DateTime, func, ForeignKey, DECIMAL, Index, literal_column
 from typing import Optional, TYPE_CHECKING, List
 from datetime import datetime
 from decimal import Decimal
-from api.db.database import Base
+from api.db.database import Base, initial_version
 
 if TYPE_CHECKING:
     from .restaurant import Restaurant
@@ -11,6 +11,12 @@ if TYPE_CHECKING:
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
+    __table_args__ = (
+        Index("ix_menu_items_restaurant_available_category", "restaurant_id", "is_available", "category"),
+        Index("ix_menu_items_name", "name", "id"),
+        Index("ix_menu_items_category_name", "category", "name", "id"),
+        Index("ix_menu_items_created", "created_at", "id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -28,6 +34,10 @@ class MenuItem(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    # Bumped by every UPDATE of the row; the ETag validator (see api.utils.http_cache)
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=initial_version, server_default="1", onupdate=literal_column("version") + 1
+    )
     
     # Relationships
     restaurant: Mapped["Restaurant"] = relationship("Restaurant", back_populates="menu_items")
@@ -1,7 +1,7 @@
 import enum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, DateTime, func, ForeignKey, DECIMAL, Enum
-from typing import List, Optional, TYPE_CHECKING
+from sqlalchemy import String, DateTime, func, ForeignKey, DECIMAL, Enum, Index
+from typing import Dict, FrozenSet, List, Optional, TYPE_CHECKING
 from datetime import datetime
 from decimal import Decimal
 from api.db.database import Base
@@ -20,8 +20,27 @@ class OrderStatus(enum.Enum):
     delivered = "delivered"
     cancelled = "cancelled"
 
+# Order lifecycle: the statuses each status may move to. delivered and cancelled are final.
+ORDER_STATUS_TRANSITIONS: Dict[OrderStatus, FrozenSet[OrderStatus]] = {
+    OrderStatus.placed: frozenset({OrderStatus.confirmed, OrderStatus.cancelled}),
+    OrderStatus.confirmed: frozenset({OrderStatus.preparing, OrderStatus.cancelled}),
+    OrderStatus.preparing: frozenset({OrderStatus.out_for_delivery, OrderStatus.cancelled}),
+    OrderStatus.out_for_delivery: frozenset({OrderStatus.delivered}),
+    OrderStatus.delivered: frozenset(),
+    OrderStatus.cancelled: frozenset(),
+}
+
+def status_predecessors(status: OrderStatus) -> List[OrderStatus]:
+    """The statuses an order may move to `status` from."""
+    return [source for source, targets in ORDER_STATUS_TRANSITIONS.items() if status in targets]
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_restaurant_date", "restaurant_id", "order_date", "id"),
+        Index("ix_orders_customer_date", "customer_id", "order_date", "id"),
+        Index("ix_orders_restaurant_status", "restaurant_id", "order_status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id"))
@@ -32,6 +51,9 @@ class Order(Base):
     special_instructions: Mapped[Optional[str]] = mapped_column(String(500))
     order_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     delivery_time: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Kept current by api.utils.eta while the order is in the kitchen queue
+    estimated_ready_time: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    estimated_delivery_time: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     # Relationships
     customer: Mapped["Customer"] = relationship("Customer", back_populates="orders")
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, DECIMAL, Integer, String
+from sqlalchemy import ForeignKey, DECIMAL, Integer, String, Index
 from typing import Optional, TYPE_CHECKING
 from decimal import Decimal
 from api.db.database import Base
@@ -10,6 +10,9 @@ if TYPE_CHECKING:
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order", "order_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
@@ -1,8 +1,8 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, Float, Boolean, Time, DateTime, func
+from sqlalchemy import String, Text, Float, Boolean, Integer, Time, DateTime, ForeignKey, Index, func, literal_column
 from typing import Optional, List, TYPE_CHECKING
 from datetime import time, datetime
-from api.db.database import Base
+from api.db.database import Base, initial_version
 
 if TYPE_CHECKING:
     from .menu_item import MenuItem
@@ -11,14 +11,23 @@ if TYPE_CHECKING:
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
+    __table_args__ = (
+        Index("ix_restaurants_name", "name", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     cuisine_type: Mapped[str] = mapped_column(String(50), nullable=False)
     address: Mapped[str] = mapped_column(String(255), nullable=False)
+    # WGS84 coordinates, mirrored into the restaurants_rtree spatial index (see api.utils.geo)
+    latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     phone_number: Mapped[str] = mapped_column(String(20), nullable=False, unique=True)
     rating: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # Running review aggregates; rating is derived from them on every new review
+    rating_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
     opening_time: Mapped[time] = mapped_column(Time, nullable=False)
     closing_time: Mapped[time] = mapped_column(Time, nullable=False)
@@ -28,6 +37,12 @@ class Restaurant(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    # Bumped by every UPDATE of the row; the ETag validator (see api.utils.http_cache)
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=initial_version, server_default="1", onupdate=literal_column("version") + 1
+    )
+    # Bumped by the menu item writers instead, which leave version alone
+    menu_version: Mapped[int] = mapped_column(Integer, nullable=False, default=initial_version, server_default="1")
     
     # Relationships
     menu_items: Mapped[List["MenuItem"]] = relationship(
@@ -36,4 +51,20 @@ class Restaurant(Base):
         cascade="all, delete-orphan"
     )
     orders: Mapped[List["Order"]] = relationship("Order", back_populates="restaurant")
-    reviews: Mapped[List["Review"]] = relationship("Review", back_populates="restaurant", cascade="all, delete-orphan")
\ No newline at end of file
+    reviews: Mapped[List["Review"]] = relationship("Review", back_populates="restaurant", cascade="all, delete-orphan")
+
+class RestaurantOpenWindow(Base):
+    """
+    Opening hours as minute-of-day intervals [open_minute, close_minute), derived from
+    opening_time/closing_time by the restaurant CRUD functions. Hours that run past
+    midnight are stored as two windows, so "open at m" is a single range check.
+    """
+    __tablename__ = "restaurant_open_windows"
+    __table_args__ = (
+        Index("ix_restaurant_open_windows_open", "open_minute", "close_minute", "restaurant_id"),
+        Index("ix_restaurant_open_windows_close", "close_minute", "open_minute", "restaurant_id"),
+    )
+
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    open_minute: Mapped[int] = mapped_column(Integer, primary_key=True)
+    close_minute: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, DateTime, func, ForeignKey, Integer
+from sqlalchemy import String, DateTime, func, ForeignKey, Integer, Index
 from typing import TYPE_CHECKING
 from datetime import datetime
 from api.db.database import Base
@@ -11,6 +11,10 @@ if TYPE_CHECKING:
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_restaurant_created", "restaurant_id", "created_at", "id"),
+        Index("ix_reviews_customer_created", "customer_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id"))
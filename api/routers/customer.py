@@ -1,51 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Optional
 
-from api.db.database import get_db
+from api.db.database import get_db, get_read_db
 from api.schemas.customer import CustomerCreate, CustomerRead, CustomerUpdate
+from api.schemas.pagination import Page
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.utils.http_cache import conditional_response, entity_tag, validator_headers
 from api.crud import customer as crud
 
 # Initialize the router with a prefix and tags for documentation
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
+def _validators(customer) -> dict:
+    """Validator headers from a customer or its get_customer_version row."""
+    return validator_headers(entity_tag("customer", customer.id, customer.version), customer.updated_at)
+
 @router.post("/", response_model=CustomerRead, status_code=201)
 async def create_customer(data: CustomerCreate, db: AsyncSession = Depends(get_db)):
     """
     Create a new customer.
-    Checks if the email is already in use before creating.
+    Rejects an email or phone number that is already in use.
     """
-    db_customer = await crud.get_customer_by_email(db, email=data.email)
-    if db_customer:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return await crud.create_customer(db, data)
+    try:
+        return await crud.create_customer(db, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/", response_model=List[CustomerRead])
-async def list_customers(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=Page[CustomerRead])
+async def list_customers(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Retrieve a list of all customers with pagination.
+    Retrieve a list of all customers with cursor pagination.
     """
-    return await crud.get_customers(db, skip=skip, limit=limit)
+    return await crud.get_customers(db, cursor=cursor, limit=limit)
 
 @router.get("/{customer_id}", response_model=CustomerRead)
-async def get_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
+async def get_customer(customer_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     """
     Get a single customer by their ID.
+    Supports conditional requests via ETag / Last-Modified; a client with a
+    current copy gets its 304 without the customer being loaded.
     """
-    db_customer = await crud.get_customer(db, customer_id)
-    if not db_customer:
+    async def validators():
+        version = await crud.get_customer_version(db, customer_id)
+        return _validators(version) if version else None
+
+    async def load():
+        db_customer = await crud.get_customer(db, customer_id)
+        if db_customer:
+            return CustomerRead.model_validate(db_customer).model_dump_json().encode(), _validators(db_customer)
+
+    response = await conditional_response(request, validators, load)
+    if response is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return db_customer
+    return response
 
 @router.put("/{customer_id}", response_model=CustomerRead)
 async def update_customer(customer_id: int, data: CustomerUpdate, db: AsyncSession = Depends(get_db)):
     """
     Update a customer's details by their ID.
     """
-    db_customer = await crud.get_customer(db, customer_id)
+    try:
+        db_customer = await crud.update_customer(db, customer_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not db_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return await crud.update_customer(db, db_customer, data)
+    return db_customer
 
 @router.delete("/{customer_id}", status_code=204)
 async def delete_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.db.database import get_read_db
+from api.external_services import jobs
+from api.schemas.job import JobQueueStats
+
+router = APIRouter(tags=["Jobs"])
+
+@router.get("/jobs/stats", response_model=JobQueueStats)
+async def get_job_queue_stats(db: AsyncSession = Depends(get_read_db)):
+    """Background job queue depth and lag, with this worker's pool counters."""
+    return {**await jobs.queue_depth(db), **jobs.pool.stats()}
@@ -3,7 +3,7 @@ from fastapi.responses import RedirectResponse
 from contextlib import asynccontextmanager
 
 # Import all models to ensure they are registered with Base
-from api.models import customer, restaurant, menu_item, order, order_item, review
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics
 from api.db.database import Base, engine
 
 # Import all routers
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
@@ -7,13 +7,21 @@ from api.crud.menu_item import (
     get_menu_items, 
     get_menu_item, 
     get_menu_item_with_restaurant,
+    get_menu_item_version,
     update_menu_item, 
     delete_menu_item,
-    search_menu_items
+    MenuItemOrdered,
+    search_menu_items,
+    get_menu_item_recommendations
 )
-from api.crud.restaurant import get_restaurant
-from api.db.database import get_db
-from api.schemas.menu_item import MenuItemCreate, MenuItemRead, MenuItemUpdate, MenuItemWithRestaurant
+from api.db.database import get_db, get_read_db
+from api.schemas.menu_item import (
+    MenuItemCreate, MenuItemRead, MenuItemRecommendation, MenuItemSearchPage, MenuItemUpdate, MenuItemWithRestaurant
+)
+from api.schemas.pagination import Page
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.utils.serialization import fast_response
+from api.utils.http_cache import conditional_response, entity_tag, validator_headers
 
 router = APIRouter(prefix="/menu-items", tags=["Menu Items"])
 
@@ -24,54 +32,102 @@ async def create_item(
     data: MenuItemCreate = ...,
     db: AsyncSession = Depends(get_db)
 ):
-    # Check if restaurant exists
-    restaurant = await get_restaurant(db, restaurant_id)
-    if not restaurant:
+    menu_item = await create_menu_item(db, restaurant_id, data)
+    if not menu_item:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    return await create_menu_item(db, restaurant_id, data)
+    return menu_item
 
-@router.get("/", response_model=List[MenuItemRead])
+@router.get("/", response_model=Page[MenuItemRead])
 async def list_all_items(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return await get_menu_items(db, skip=skip, limit=limit)
+    return fast_response(await get_menu_items(db, cursor=cursor, limit=limit, as_dicts=True))
 
-@router.get("/search", response_model=List[MenuItemRead])
+@router.get("/search", response_model=MenuItemSearchPage)
 async def search_items(
+    q: Optional[str] = Query(None, max_length=200, description="Full-text query over name and description; results are ranked by relevance"),
     category: Optional[str] = Query(None, description="Filter by category"),
     vegetarian: Optional[bool] = Query(None, description="Filter vegetarian items"),
     vegan: Optional[bool] = Query(None, description="Filter vegan items"),
     available_only: bool = Query(True, description="Show only available items"),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db)
+    facets: bool = Query(False, description="Also return item counts per category, vegetarian, vegan and availability"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return await search_menu_items(
+    return fast_response(await search_menu_items(
         db, 
+        q=q,
         category=category, 
         vegetarian=vegetarian, 
         vegan=vegan,
         available_only=available_only,
-        skip=skip, 
-        limit=limit
-    )
+        cursor=cursor,
+        limit=limit,
+        as_dicts=True,
+        facets=facets
+    ))
+
+def _validators(menu_item, restaurant_version=None, restaurant_updated_at=None) -> dict:
+    """Validator headers from a menu item or its get_menu_item_version row, and its restaurant's if embedded."""
+    tag = entity_tag("menu-item", menu_item.id, menu_item.version, restaurant_version)
+    last_modified = menu_item.updated_at
+    if restaurant_updated_at is not None:
+        last_modified = max(last_modified, restaurant_updated_at)
+    return validator_headers(tag, last_modified)
 
 @router.get("/{item_id}", response_model=MenuItemRead)
-async def get_item(item_id: int, db: AsyncSession = Depends(get_db)):
-    menu_item = await get_menu_item(db, item_id)
-    if not menu_item:
+async def get_item(item_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def validators():
+        version = await get_menu_item_version(db, item_id)
+        return _validators(version) if version else None
+
+    async def load():
+        menu_item = await get_menu_item(db, item_id)
+        if menu_item:
+            return MenuItemRead.model_validate(menu_item).model_dump_json().encode(), _validators(menu_item)
+
+    response = await conditional_response(request, validators, load)
+    if response is None:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    return menu_item
+    return response
 
 @router.get("/{item_id}/with-restaurant", response_model=MenuItemWithRestaurant)
-async def get_item_with_restaurant(item_id: int, db: AsyncSession = Depends(get_db)):
-    menu_item = await get_menu_item_with_restaurant(db, item_id)
-    if not menu_item:
+async def get_item_with_restaurant(
+    item_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def validators():
+        version = await get_menu_item_version(db, item_id, with_restaurant=True)
+        return _validators(version, version.restaurant_version, version.restaurant_updated_at) if version else None
+
+    async def load():
+        # Item and restaurant arrive in one joined query
+        menu_item = await get_menu_item_with_restaurant(db, item_id)
+        if menu_item:
+            restaurant = menu_item.restaurant
+            payload = MenuItemWithRestaurant.model_validate(menu_item).model_dump_json().encode()
+            return payload, _validators(menu_item, restaurant.version, restaurant.updated_at)
+
+    response = await conditional_response(request, validators, load)
+    if response is None:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    return menu_item
+    return response
+
+@router.get("/{item_id}/recommendations", response_model=List[MenuItemRecommendation],
+            summary="Items frequently ordered together with this one")
+async def get_item_recommendations(
+    item_id: int,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    items = await get_menu_item_recommendations(db, item_id, limit=limit)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    return fast_response(items)
 
 @router.put("/{item_id}", response_model=MenuItemRead)
 async def update_item(
@@ -79,15 +135,17 @@ async def update_item(
     data: MenuItemUpdate, 
     db: AsyncSession = Depends(get_db)
 ):
-    menu_item = await get_menu_item(db, item_id)
+    menu_item = await update_menu_item(db, item_id, data)
     if not menu_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    return await update_menu_item(db, menu_item, data)
+    return menu_item
 
 @router.delete("/{item_id}")
 async def delete_item(item_id: int, db: AsyncSession = Depends(get_db)):
-    menu_item = await get_menu_item(db, item_id)
-    if not menu_item:
+    try:
+        deleted = await delete_menu_item(db, item_id)
+    except MenuItemOrdered as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    await delete_menu_item(db, menu_item)
     return {"detail": "Menu item deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.db.database import get_read_db
+from api.external_services import jobs
+from api.utils import pubsub
+from api.utils.cache import menu_cache
+from api.utils.eta import eta_engine
+from api.utils.instrumentation import metrics, render_stats
+
+router = APIRouter(tags=["Metrics"])
+
+class PrometheusResponse(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+@router.get("/metrics", response_class=PrometheusResponse)
+async def get_metrics(db: AsyncSession = Depends(get_read_db)):
+    """Per-route request and SQL metrics, with this worker's component counters, in the Prometheus text format."""
+    lines = metrics.render()
+    lines += render_stats("menu_cache", menu_cache.stats(), gauges={"entries"})
+    lines += render_stats("eta_engine", eta_engine.stats(), gauges={"restaurants", "queued_orders"})
+    lines += render_stats("pubsub", pubsub.broker.stats(), gauges={"topics", "subscribers"})
+    lines += render_stats("job_pool", jobs.pool.stats(), gauges={"workers"})
+    depth = await jobs.queue_depth(db)
+    lines += render_stats("job_queue", depth, gauges=depth.keys())
+    return "\n".join(lines) + "\n"
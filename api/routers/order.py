@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from api.db.database import get_db
+from datetime import datetime
+from typing import List, Literal, Optional
+from api.db.database import ReadSessionLocal, get_db, get_read_db
 from api.crud import order as crud
+from api.crud.errors import NotFoundError
 from api.crud import customer as customer_crud
 from api.crud import restaurant as restaurant_crud
-from api.schemas.order import OrderCreate, OrderRead, OrderDetails, OrderUpdateStatus
+from api.schemas.order import (
+    OrderCreate, OrderRead, OrderDetails, OrderUpdateStatus, OrderBulkUpdateStatus, OrderBulkStatusResult
+)
 from api.models.order import OrderStatus
+from api.schemas.menu_item import MenuItemRecommendation
+from api.schemas.pagination import Page
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.utils.serialization import fast_response
+from api.utils.pubsub import broker, order_topic, restaurant_topic, sse_frame
+from api.utils.export import csv_stream, ndjson_stream
 
 router = APIRouter(tags=["Orders"])
 
@@ -16,48 +27,146 @@ async def place_new_order(
     data: OrderCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    # Validate customer and restaurant exist
-    customer = await customer_crud.get_customer(db, customer_id)
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
-    restaurant = await restaurant_crud.get_restaurant(db, data.restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
     try:
         return await crud.place_order(db, customer_id, data)
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/orders/{order_id}", response_model=OrderDetails)
-async def get_order_with_details(order_id: int, db: AsyncSession = Depends(get_db)):
+async def get_order_with_details(order_id: int, db: AsyncSession = Depends(get_read_db)):
     order = await crud.get_order_details(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
+@router.put("/orders/status", response_model=OrderBulkStatusResult)
+async def update_order_statuses(data: OrderBulkUpdateStatus, db: AsyncSession = Depends(get_db)):
+    """
+    Move many orders to the same status at once. Orders that do not exist or whose
+    current status does not allow the move are reported and left unchanged.
+    """
+    return await crud.update_order_statuses(db, data.order_ids, data.status)
+
 @router.put("/orders/{order_id}/status", response_model=OrderRead)
 async def update_order_status(
     order_id: int, 
     data: OrderUpdateStatus, 
     db: AsyncSession = Depends(get_db)
 ):
-    order = await crud.get_order_details(db, order_id)
-    if not order:
+    try:
+        order = await crud.update_order_status(db, order_id, data.status)
+    except crud.InvalidStatusTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    return await crud.update_order_status(db, order, data.status)
+    return order
+
+@router.get("/customers/{customer_id}/orders", response_model=Page[OrderRead])
+async def get_customer_order_history(
+    customer_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    page = await crud.get_customer_orders(db, customer_id, cursor=cursor, limit=limit, as_dicts=True)
+    # Only an empty page can mean the customer does not exist
+    if not page["items"] and not await customer_crud.customer_exists(db, customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return fast_response(page)
 
-@router.get("/customers/{customer_id}/orders", response_model=List[OrderRead])
-async def get_customer_order_history(customer_id: int, db: AsyncSession = Depends(get_db)):
-    customer = await customer_crud.get_customer(db, customer_id)
-    if not customer:
+@router.get("/customers/{customer_id}/recommendations", response_model=List[MenuItemRecommendation],
+            summary="Suggestions based on the customer's recent orders")
+async def get_customer_recommendations(
+    customer_id: int,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    items = await crud.get_customer_recommendations(db, customer_id, limit=limit)
+    if not items and not await customer_crud.customer_exists(db, customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
-    return await crud.get_customer_orders(db, customer_id)
+    return fast_response(items)
+
+@router.get("/restaurants/{restaurant_id}/orders", response_model=Page[OrderRead])
+async def get_restaurant_orders(
+    restaurant_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    page = await crud.get_restaurant_orders(db, restaurant_id, cursor=cursor, limit=limit, as_dicts=True)
+    if not page["items"] and not await restaurant_crud.restaurant_exists(db, restaurant_id):
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return fast_response(page)
+
+@router.get("/restaurants/{restaurant_id}/orders/export", response_class=StreamingResponse)
+async def export_restaurant_orders(
+    restaurant_id: int,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson: one order per line; csv: one line per order item"),
+    start: Optional[datetime] = Query(None, description="Only orders placed at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only orders placed before this time"),
+    include_items: bool = Query(False, description="Include the order item lines"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Stream a restaurant's full order history, oldest first.
+    Memory use is bounded by the fetch chunk size, not by the size of the history.
+    """
+    if not await restaurant_crud.restaurant_exists(db, restaurant_id):
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+
+    async def chunks():
+        # The request's session is closed once the endpoint returns, so the
+        # stream runs in a session of its own
+        async with ReadSessionLocal() as export_db:
+            async for rows in crud.stream_restaurant_orders(export_db, restaurant_id, start, end, include_items):
+                yield rows
+
+    if format == "csv":
+        item_columns = [column.key for column in crud.EXPORT_ITEM_COLUMNS] if include_items else ()
+        body, media_type = csv_stream(chunks(), list(OrderRead.model_fields), item_columns), "text/csv"
+    else:
+        body, media_type = ndjson_stream(chunks()), "application/x-ndjson"
+    filename = f"restaurant-{restaurant_id}-orders.{format}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+async def _event_stream(subscription, snapshot_event: str, snapshot):
+    with subscription:
+        yield sse_frame(snapshot_event, snapshot)
+        async for frame in subscription.frames():
+            yield frame
+
+@router.get("/orders/{order_id}/events", response_class=StreamingResponse)
+async def order_events(order_id: int):
+    """
+    Server-Sent Events stream of an order: a "snapshot" event with the order, then
+    "status_changed" and "eta_changed" events as they happen. A client too slow to
+    keep up gets a "dropped" event and should reconnect.
+    """
+    # Subscribe before reading so no change falls between the snapshot and the stream
+    subscription = broker.subscribe(order_topic(order_id))
+    # A session only for the snapshot: the stream can stay open for hours
+    async with ReadSessionLocal() as db:
+        order = await crud.get_order_snapshot(db, order_id)
+    if order is None:
+        broker.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Order not found")
+    return StreamingResponse(_event_stream(subscription, "snapshot", order), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
-@router.get("/restaurants/{restaurant_id}/orders", response_model=List[OrderRead])
-async def get_restaurant_orders(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    restaurant = await restaurant_crud.get_restaurant(db, restaurant_id)
-    if not restaurant:
+@router.get("/restaurants/{restaurant_id}/orders/events", response_class=StreamingResponse)
+async def restaurant_order_events(restaurant_id: int):
+    """
+    Server-Sent Events stream of a restaurant's orders: a "snapshot" event with its
+    open orders, then "order_placed" and "status_changed" events as they happen.
+    """
+    subscription = broker.subscribe(restaurant_topic(restaurant_id))
+    async with ReadSessionLocal() as db:
+        orders = await crud.get_open_orders(db, restaurant_id)
+        missing = not orders and not await restaurant_crud.restaurant_exists(db, restaurant_id)
+    if missing:
+        broker.unsubscribe(subscription)
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return await crud.get_restaurant_orders(db, restaurant_id)
\ No newline at end of file
+    return StreamingResponse(_event_stream(subscription, "snapshot", orders), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
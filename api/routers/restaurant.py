@@ -1,56 +1,176 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+from datetime import datetime, time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from api.crud.restaurant import (
     create_restaurant, 
     delete_restaurant, 
     get_restaurant, 
+    get_restaurant_version,
     get_restaurants, 
+    restaurant_exists,
+    get_nearby_restaurants,
+    get_open_restaurants,
+    search_restaurants,
     update_restaurant,
     get_restaurant_with_menu
 )
 from api.crud.menu_item import (
     create_menu_item,
-    get_restaurant_menu_items
+    bulk_upsert_menu_items,
+    get_restaurant_menu_items,
+    get_restaurant_menu_version
 )
-from api.db.database import get_db
-from api.schemas.restaurant import RestaurantCreate, RestaurantRead, RestaurantUpdate, RestaurantWithMenu
-from api.schemas.menu_item import MenuItemCreate, MenuItemRead
+from api.crud.customer import get_customer_location
+from api.db.database import get_db, get_read_db
+from api.schemas.restaurant import RestaurantCreate, RestaurantNearby, RestaurantRead, RestaurantUpdate, RestaurantWithMenu
+from api.schemas.menu_item import MenuItemCreate, MenuItemRead, MenuItemBulkError, MenuItemBulkResult
 from api.models.restaurant import Restaurant
+from api.schemas.pagination import Page
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.utils.cache import menu_cache
+from api.utils.serialization import fast_response
+from api.utils.http_cache import (
+    conditional_response, entity_tag, is_not_modified, json_response, not_modified, validator_headers
+)
 
 router = APIRouter(prefix="/restaurants", tags=["Restaurants"])
 
+menu_items_adapter = TypeAdapter(List[MenuItemRead])
+
+MAX_BULK_MENU_ITEMS = 10_000
+
 @router.post("/", response_model=RestaurantRead)
 async def create(data: RestaurantCreate, db: AsyncSession = Depends(get_db)):
     return await create_restaurant(db, data)
 
-@router.get("/", response_model=List[RestaurantRead])
-async def list_all(db: AsyncSession = Depends(get_db)):
-    return await get_restaurants(db)
+@router.get("/", response_model=Page[RestaurantRead])
+async def list_all(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await get_restaurants(db, cursor=cursor, limit=limit)
+
+@router.get("/search", response_model=Page[RestaurantRead])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Full-text query over name and cuisine type"),
+    cuisine_type: Optional[str] = Query(None, description="Filter by cuisine type"),
+    active_only: bool = Query(True, description="Show only active restaurants"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return fast_response(await search_restaurants(
+        db, q, cuisine_type=cuisine_type, active_only=active_only, cursor=cursor, limit=limit, as_dicts=True
+    ))
+
+@router.get("/nearby", response_model=List[RestaurantNearby])
+async def nearby(
+    latitude: Optional[float] = Query(None, ge=-90.0, le=90.0),
+    longitude: Optional[float] = Query(None, ge=-180.0, le=180.0),
+    customer_id: Optional[int] = Query(None, description="Search around this customer's location instead"),
+    k: int = Query(10, ge=1, le=100, description="Number of restaurants to return"),
+    max_distance_km: float = Query(5.0, gt=0, le=100.0),
+    cuisine_type: Optional[str] = Query(None, description="Filter by cuisine type"),
+    min_rating: Optional[float] = Query(None, ge=0.0, le=5.0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if customer_id is not None:
+        location = await get_customer_location(db, customer_id)
+        if location is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        latitude, longitude = location
+        if latitude is None or longitude is None:
+            raise HTTPException(status_code=400, detail="Customer has no coordinates")
+    elif latitude is None or longitude is None:
+        raise HTTPException(status_code=400, detail="Provide latitude and longitude, or customer_id")
+    return fast_response(await get_nearby_restaurants(
+        db, latitude, longitude, k=k, max_distance_km=max_distance_km, cuisine_type=cuisine_type, min_rating=min_rating
+    ))
+
+@router.get("/open", response_model=Page[RestaurantRead])
+async def open_now(
+    at: Optional[time] = Query(None, description="Time of day to check, e.g. 23:30; defaults to the server's local time"),
+    cuisine_type: Optional[str] = Query(None, description="Filter by cuisine type"),
+    min_rating: Optional[float] = Query(None, ge=0.0, le=5.0),
+    active_only: bool = Query(True, description="Show only active restaurants"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return fast_response(await get_open_restaurants(
+        db, at or datetime.now().time(), cuisine_type=cuisine_type, min_rating=min_rating,
+        active_only=active_only, cursor=cursor, limit=limit, as_dicts=True
+    ))
+
+def _validators(restaurant) -> dict:
+    """Validator headers from a restaurant or its get_restaurant_version row."""
+    return validator_headers(
+        entity_tag("restaurant", restaurant.id, restaurant.version), restaurant.updated_at
+    )
 
 @router.get("/{restaurant_id}", response_model=RestaurantRead)
-async def get(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    restaurant = await get_restaurant(db, restaurant_id)
-    if not restaurant:
+async def get(restaurant_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def validators():
+        version = await get_restaurant_version(db, restaurant_id)
+        return _validators(version) if version else None
+
+    async def load():
+        restaurant = await get_restaurant(db, restaurant_id)
+        if restaurant:
+            return RestaurantRead.model_validate(restaurant).model_dump_json().encode(), _validators(restaurant)
+
+    response = await conditional_response(request, validators, load)
+    if response is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return restaurant
+    return response
+
+async def _menu_response(request: Request, kind: str, restaurant_id: int, db: AsyncSession, serialize) -> Response:
+    # Menu payloads are cached pre-serialized together with their validators; the
+    # CRUD writers invalidate both. On a miss the validators come from the
+    # restaurant row, so a client with a current copy gets its 304 without the
+    # menu being loaded. No Last-Modified: deleting an item changes the menu
+    # without moving any updated_at, only menu_version.
+    cached = menu_cache.get(kind, restaurant_id)
+    if cached is None:
+        generation = menu_cache.generation(restaurant_id)
+        version = await get_restaurant_menu_version(db, restaurant_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        # The with-menu payload also carries the restaurant's own fields
+        restaurant_version = version.version if kind == "with-menu" else None
+        headers = validator_headers(
+            entity_tag(kind, version.id, version.menu_version, restaurant_version)
+        )
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+        cached = (headers, await serialize())
+        menu_cache.set(kind, restaurant_id, cached, generation)
+
+    return json_response(request, cached[1], cached[0])
 
 @router.get("/{restaurant_id}/with-menu", response_model=RestaurantWithMenu)
-async def get_with_menu(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    restaurant = await get_restaurant_with_menu(db, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    return restaurant
+async def get_with_menu(restaurant_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def serialize():
+        restaurant = await get_restaurant_with_menu(db, restaurant_id)
+        return RestaurantWithMenu.model_validate(restaurant).model_dump_json().encode()
+
+    return await _menu_response(request, "with-menu", restaurant_id, db, serialize)
 
 @router.get("/{restaurant_id}/menu", response_model=List[MenuItemRead])
-async def get_menu(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    # Check if restaurant exists
-    restaurant = await get_restaurant(db, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    return await get_restaurant_menu_items(db, restaurant_id)
+async def get_menu(restaurant_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def serialize():
+        menu_items = await get_restaurant_menu_items(db, restaurant_id)
+        return menu_items_adapter.dump_json(menu_items_adapter.validate_python(menu_items))
+
+    return await _menu_response(request, "menu", restaurant_id, db, serialize)
 
 @router.post("/{restaurant_id}/menu-items/", response_model=MenuItemRead)
 async def add_menu_item(
@@ -58,19 +178,87 @@ async def add_menu_item(
     data: MenuItemCreate, 
     db: AsyncSession = Depends(get_db)
 ):
-    # Check if restaurant exists
-    restaurant = await get_restaurant(db, restaurant_id)
-    if not restaurant:
+    menu_item = await create_menu_item(db, restaurant_id, data)
+    if not menu_item:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return menu_item
+
+async def _read_bulk_rows(request: Request) -> List[dict]:
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            # Empty cells fall back to the schema defaults
+            return [{key: value for key, value in row.items() if key and value not in ("", None)} for row in reader]
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    try:
+        rows = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of menu items")
+    return rows
+
+_BULK_ITEM_SCHEMA = {"type": "array", "items": {"$ref": "#/components/schemas/MenuItemCreate"}}
+
+@router.post(
+    "/{restaurant_id}/menu-items/bulk",
+    response_model=MenuItemBulkResult,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": _BULK_ITEM_SCHEMA},
+        "text/csv": {"schema": {"type": "string", "description": "Header row with MenuItemCreate field names"}},
+    }}}
+)
+async def bulk_upsert_menu(
+    restaurant_id: int,
+    request: Request,
+    partial: bool = Query(False, description="Write the valid rows and report the invalid ones instead of rejecting the upload"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create or update many menu items at once from a JSON array or a CSV upload.
+    Rows are matched to existing items by name; everything is written in one transaction.
+    """
+    rows = await _read_bulk_rows(request)
+    if len(rows) > MAX_BULK_MENU_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_MENU_ITEMS} items per upload")
+
+    items, errors, seen_names = [], [], set()
+    for index, row in enumerate(rows):
+        name = row.get("name") if isinstance(row, dict) else None
+        try:
+            item = MenuItemCreate.model_validate(row)
+        except ValidationError as e:
+            messages = [f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in e.errors()]
+            errors.append(MenuItemBulkError(index=index, name=name, errors=messages))
+            continue
+        if item.name in seen_names:
+            errors.append(MenuItemBulkError(index=index, name=item.name, errors=["name: duplicated in this upload"]))
+            continue
+        seen_names.add(item.name)
+        items.append(item)
+
+    if errors and not partial:
+        raise HTTPException(status_code=422, detail=[error.model_dump() for error in errors])
+
+    if not items:
+        if not await restaurant_exists(db, restaurant_id):
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        return MenuItemBulkResult(created=0, updated=0, errors=errors)
+    # The write finds out whether the restaurant exists
+    counts = await bulk_upsert_menu_items(db, restaurant_id, items)
+    if counts is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    return await create_menu_item(db, restaurant_id, data)
+    created, updated = counts
+    return MenuItemBulkResult(created=created, updated=updated, errors=errors)
 
 @router.put("/{restaurant_id}", response_model=RestaurantRead)
 async def update(restaurant_id: int, data: RestaurantUpdate, db: AsyncSession = Depends(get_db)):
-    restaurant = await get_restaurant(db, restaurant_id)
+    restaurant = await update_restaurant(db, restaurant_id, data)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return await update_restaurant(db, restaurant, data)
+    return restaurant
 
 @router.delete("/{restaurant_id}")
 async def delete(restaurant_id: int, db: AsyncSession = Depends(get_db)):
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from api.db.database import get_db
+from typing import Optional
+from api.db.database import get_db, get_read_db
 from api.crud import review as crud
-from api.crud import order as order_crud
+from api.crud.errors import NotFoundError
 from api.crud import restaurant as restaurant_crud
 from api.crud import customer as customer_crud
 from api.schemas.review import ReviewCreate, ReviewRead, ReviewWithCustomer, ReviewWithRestaurant
-from api.models.order import OrderStatus
+from api.schemas.pagination import Page
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(tags=["Reviews"])
 
@@ -17,28 +18,34 @@ async def add_review_for_order(
     data: ReviewCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    order = await order_crud.get_order_details(db, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order.order_status != OrderStatus.delivered:
-        raise HTTPException(status_code=400, detail="Review can only be added for delivered orders.")
-        
-    if order.review:
-        raise HTTPException(status_code=400, detail="A review for this order already exists.")
+    try:
+        return await crud.add_review(db, order_id, data)
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return await crud.add_review(db, order, data)
-
-@router.get("/restaurants/{restaurant_id}/reviews", response_model=List[ReviewWithCustomer])
-async def get_all_restaurant_reviews(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    restaurant = await restaurant_crud.get_restaurant(db, restaurant_id)
-    if not restaurant:
+@router.get("/restaurants/{restaurant_id}/reviews", response_model=Page[ReviewWithCustomer])
+async def get_all_restaurant_reviews(
+    restaurant_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    page = await crud.get_restaurant_reviews(db, restaurant_id, cursor=cursor, limit=limit)
+    # Only an empty page can mean the restaurant does not exist
+    if not page["items"] and not await restaurant_crud.restaurant_exists(db, restaurant_id):
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return await crud.get_restaurant_reviews(db, restaurant_id)
+    return page
 
-@router.get("/customers/{customer_id}/reviews", response_model=List[ReviewWithRestaurant])
-async def get_all_customer_reviews(customer_id: int, db: AsyncSession = Depends(get_db)):
-    customer = await customer_crud.get_customer(db, customer_id)
-    if not customer:
+@router.get("/customers/{customer_id}/reviews", response_model=Page[ReviewWithRestaurant])
+async def get_all_customer_reviews(
+    customer_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    page = await crud.get_customer_reviews(db, customer_id, cursor=cursor, limit=limit)
+    if not page["items"] and not await customer_crud.customer_exists(db, customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
-    return await crud.get_customer_reviews(db, customer_id)
\ No newline at end of file
+    return page
\ No newline at end of file
@@ -7,6 +7,8 @@ class CustomerBase(BaseModel):
     email: EmailStr
     phone_number: str = Field(..., max_length=20)
     address: str = Field(..., min_length=10)
+    latitude: Optional[float] = Field(None, ge=-90.0, le=90.0)
+    longitude: Optional[float] = Field(None, ge=-180.0, le=180.0)
 
 class CustomerCreate(CustomerBase):
     pass
@@ -16,6 +18,8 @@ class CustomerUpdate(BaseModel):
     email: Optional[EmailStr] = None
     phone_number: Optional[str] = Field(None, max_length=20)
     address: Optional[str] = Field(None, min_length=10)
+    latitude: Optional[float] = Field(None, ge=-90.0, le=90.0)
+    longitude: Optional[float] = Field(None, ge=-180.0, le=180.0)
     is_active: Optional[bool] = None
 
 class CustomerRead(CustomerBase):
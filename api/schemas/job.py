@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+class JobQueueStats(BaseModel):
+    # Jobs in the table by status
+    pending: int
+    running: int
+    failed: int
+    # How long the oldest due job has been waiting
+    lag_seconds: float
+    # This worker's pool since it started
+    workers: int
+    completed: int
+    retried: int
+    exhausted: int
+    abandoned: int
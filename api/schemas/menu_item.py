@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Optional, ForwardRef
+from typing import Dict, List, Optional, ForwardRef
 from pydantic import BaseModel, Field, field_validator
 from decimal import Decimal
+from api.schemas.pagination import Page
 
 # Forward reference to avoid circular imports
 RestaurantRead = ForwardRef('RestaurantRead')
@@ -61,6 +62,29 @@ class MenuItemRead(MenuItemBase):
         "from_attributes": True
     }
 
+class MenuItemBulkError(BaseModel):
+    index: int = Field(..., description="Position of the row in the upload (0-based, excluding the CSV header)")
+    name: Optional[str] = None
+    errors: List[str]
+
+class MenuItemBulkResult(BaseModel):
+    created: int
+    updated: int
+    errors: List[MenuItemBulkError] = []
+
+class MenuItemRecommendation(MenuItemRead):
+    score: float = Field(..., description="For an item: share of its orders that also had this one. For a customer: that share summed over their recent items")
+
+class MenuItemFacets(BaseModel):
+    """Item counts per facet value; each facet applies every active filter but its own."""
+    category: Dict[str, int]
+    is_vegetarian: Dict[str, int] = Field(..., description="Keyed by 'true'/'false'")
+    is_vegan: Dict[str, int] = Field(..., description="Keyed by 'true'/'false'")
+    is_available: Dict[str, int] = Field(..., description="Keyed by 'true'/'false'")
+
+class MenuItemSearchPage(Page[MenuItemRead]):
+    facets: Optional[MenuItemFacets] = None
+
 class MenuItemWithRestaurant(MenuItemRead):
     restaurant: 'RestaurantRead'
 
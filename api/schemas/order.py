@@ -45,11 +45,26 @@ class OrderRead(OrderBase):
     total_amount: Decimal
     order_date: datetime
     delivery_time: Optional[datetime] = None
+    estimated_ready_time: Optional[datetime] = None
+    estimated_delivery_time: Optional[datetime] = None
 
     model_config = {
         "from_attributes": True
     }
 
+class OrderBulkUpdateStatus(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    status: OrderStatus
+
+class OrderStatusConflict(BaseModel):
+    id: int
+    order_status: OrderStatus
+
+class OrderBulkStatusResult(BaseModel):
+    updated: List[OrderRead]
+    not_found: List[int] = []
+    conflicts: List[OrderStatusConflict] = []
+
 class OrderDetails(OrderRead):
     customer: CustomerRead
     restaurant: RestaurantRead
@@ -11,6 +11,8 @@ class RestaurantBase(BaseModel):
     description: Optional[str] = None
     cuisine_type: str = Field(..., description="E.g., 'Italian', 'Chinese', 'Indian'")
     address: str
+    latitude: Optional[float] = Field(None, ge=-90.0, le=90.0)
+    longitude: Optional[float] = Field(None, ge=-180.0, le=180.0)
     phone_number: str = Field(..., description="Phone number in format +918888654318")
     rating: float = Field(0.0, ge=0.0, le=5.0)
     is_active: bool = True
@@ -25,6 +27,8 @@ class RestaurantUpdate(BaseModel):
     description: Optional[str] = None
     cuisine_type: Optional[str] = None
     address: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90.0, le=90.0)
+    longitude: Optional[float] = Field(None, ge=-180.0, le=180.0)
     phone_number: Optional[str] = None
     rating: Optional[float] = Field(None, ge=0.0, le=5.0)
     is_active: Optional[bool] = None
@@ -40,6 +44,9 @@ class RestaurantRead(RestaurantBase):
         "from_attributes": True
     }
 
+class RestaurantNearby(RestaurantRead):
+    distance_km: float
+
 class RestaurantWithMenu(RestaurantRead):
     menu_items: List['MenuItemRead'] = []
     average_price: Optional[Decimal] = None
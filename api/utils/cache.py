@@ -0,0 +1,91 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class MenuCache:
+    """
+    Bounded LRU cache with a TTL for serialized menu payloads, keyed by (kind, restaurant_id).
+
+    Readers take `generation(restaurant_id)` before loading and pass it to `set`.
+    Writers call `invalidate(restaurant_id)` after committing. Each restaurant has a
+    generation counter, and a payload is only stored if no invalidation happened
+    while it was being loaded. A reader that started before a write can therefore
+    never put the pre-write menu back into the cache.
+
+    The cache is per process; the TTL bounds how long other workers can serve a menu
+    after a write they did not see.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[Hashable, int], Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self._kinds = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, kind: Hashable, restaurant_id: int) -> Optional[Any]:
+        key = (kind, restaurant_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, payload = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def generation(self, restaurant_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(restaurant_id, 0)
+
+    def set(self, kind: Hashable, restaurant_id: int, payload: Any, generation: Tuple[int, int]) -> None:
+        if generation != self.generation(restaurant_id):
+            # Invalidated while the payload was being loaded; it may already be stale
+            return
+        key = (kind, restaurant_id)
+        self._kinds.add(kind)
+        self._entries[key] = (self._clock() + self.ttl_seconds, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, restaurant_id: int) -> None:
+        self._generations[restaurant_id] = self._generations.get(restaurant_id, 0) + 1
+        for kind in self._kinds:
+            self._entries.pop((kind, restaurant_id), None)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        """Invalidate every restaurant, e.g. after a bulk repair of the underlying rows."""
+        self._epoch += 1
+        self._generations.clear()
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+menu_cache = MenuCache(
+    max_entries=int(os.environ.get("MENU_CACHE_MAX_ENTRIES", 1024)),
+    ttl_seconds=float(os.environ.get("MENU_CACHE_TTL_SECONDS", 300)),
+)
@@ -0,0 +1,255 @@
+import heapq
+import os
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.models.menu_item import MenuItem
+from api.models.order import Order, OrderStatus
+from api.models.order_item import OrderItem
+
+# Ready and delivery time estimates for orders.
+#
+# A basket takes as long as its longest dish plus PREP_OVERLAP of the rest of the
+# dishes' time. Each restaurant's kitchen is modelled as KITCHEN_STATIONS stations
+# working through its open orders (placed, confirmed, preparing) first come, first
+# served; an order is ready when a station has finished it, and delivered
+# DELIVERY_MINUTES later.
+#
+# The queues are kept in memory per worker. A restaurant's queue is loaded with one
+# query the first time it is needed, and again once it is QUEUE_TTL_SECONDS old to
+# pick up orders moved by other workers. In between, place_order and the status
+# updates change it in place, like the search index: in the writer's transaction
+# the queue is rescheduled and the estimates that moved are written to the orders;
+# the in-memory change is applied on commit.
+
+KITCHEN_STATIONS = int(os.environ.get("KITCHEN_STATIONS", 3))
+DELIVERY_MINUTES = float(os.environ.get("DELIVERY_MINUTES", 25))
+QUEUE_TTL_SECONDS = float(os.environ.get("KITCHEN_QUEUE_TTL_SECONDS", 60))
+
+# Share of every dish but the longest that adds to a basket's preparation time
+PREP_OVERLAP = 0.2
+
+# Estimates that moved by less are not rewritten
+ETA_WRITE_THRESHOLD = timedelta(minutes=1)
+
+OPEN_STATUSES = (OrderStatus.placed, OrderStatus.confirmed, OrderStatus.preparing)
+
+def basket_minutes(longest: float, total: float) -> float:
+    """Preparation time of a basket from its longest dish and the sum of preparation_time x quantity."""
+    return longest + PREP_OVERLAP * (total - longest)
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def status_estimates(status: OrderStatus) -> Dict[str, Optional[datetime]]:
+    """Estimates set by the status UPDATE itself for orders leaving the kitchen queue."""
+    if status == OrderStatus.out_for_delivery:
+        now = utc_now()
+        return {"estimated_ready_time": now, "estimated_delivery_time": now + timedelta(minutes=DELIVERY_MINUTES)}
+    if status == OrderStatus.cancelled:
+        return {"estimated_ready_time": None, "estimated_delivery_time": None}
+    return {}
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes; they are stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+@dataclass
+class QueuedOrder:
+    prep_minutes: float
+    status: OrderStatus
+    started_at: Optional[datetime] = None
+    # Estimates as last written to the order
+    ready: Optional[datetime] = None
+    delivery: Optional[datetime] = None
+
+    def finish(self, now: datetime) -> datetime:
+        """When a preparing order is expected to be done, never before `now`."""
+        if self.started_at is not None:
+            expected = self.started_at + timedelta(minutes=self.prep_minutes)
+        else:
+            # Started before the queue was loaded: trust the last estimate
+            expected = self.ready or now + timedelta(minutes=self.prep_minutes)
+        return max(now, expected)
+
+class KitchenQueue:
+    def __init__(self, orders: Dict[int, QueuedOrder], loaded_at: float):
+        self.orders = orders
+        self.loaded_at = loaded_at
+
+    def copy(self) -> "KitchenQueue":
+        return KitchenQueue({order_id: replace(order) for order_id, order in self.orders.items()}, self.loaded_at)
+
+    def schedule(self, now: datetime, new_prep_minutes: Optional[float] = None) -> Dict[Optional[int], datetime]:
+        """
+        Ready time of every queued order, and under the key None of a new order
+        with `new_prep_minutes` joining the back of the queue.
+        """
+        ready: Dict[Optional[int], datetime] = {}
+        stations = []
+        for order_id, order in self.orders.items():
+            if order.status == OrderStatus.preparing:
+                ready[order_id] = order.finish(now)
+                stations.append(ready[order_id])
+        stations.sort()
+        # More orders in preparation than stations: new work waits for the latest of them
+        stations = stations[-KITCHEN_STATIONS:] + [now] * max(0, KITCHEN_STATIONS - len(stations))
+        heapq.heapify(stations)
+
+        waiting = sorted(order_id for order_id, order in self.orders.items() if order.status != OrderStatus.preparing)
+        jobs = [(order_id, self.orders[order_id].prep_minutes) for order_id in waiting]
+        if new_prep_minutes is not None:
+            jobs.append((None, new_prep_minutes))
+        for order_id, prep_minutes in jobs:
+            ready[order_id] = heapq.heappop(stations) + timedelta(minutes=prep_minutes)
+            heapq.heappush(stations, ready[order_id])
+        return ready
+
+class EtaEngine:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.queues: Dict[int, KitchenQueue] = {}
+        self.loads = 0
+
+    async def _load(self, db: AsyncSession, restaurant_ids: Sequence[int]):
+        longest = func.max(MenuItem.preparation_time)
+        total = func.sum(MenuItem.preparation_time * OrderItem.quantity)
+        result = await db.execute(
+            select(Order.id, Order.restaurant_id, Order.order_status, Order.estimated_ready_time,
+                   Order.estimated_delivery_time, longest, total)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+            .where(Order.restaurant_id.in_(restaurant_ids))
+            .where(Order.order_status.in_(OPEN_STATUSES))
+            .group_by(Order.id)
+        )
+        loaded_at = self._clock()
+        queues = {restaurant_id: KitchenQueue({}, loaded_at) for restaurant_id in restaurant_ids}
+        for order_id, restaurant_id, status, ready, delivery, longest, total in result.all():
+            queues[restaurant_id].orders[order_id] = QueuedOrder(
+                basket_minutes(longest, total), status, ready=_utc(ready), delivery=_utc(delivery)
+            )
+        self.loads += 1
+        return queues
+
+    async def _queues(self, db: AsyncSession, restaurant_ids: Iterable[int], reload: Iterable[int] = ()) -> Dict[int, KitchenQueue]:
+        restaurant_ids = set(restaurant_ids)
+        expires = self._clock() - QUEUE_TTL_SECONDS
+        stale = {
+            restaurant_id for restaurant_id in restaurant_ids
+            if restaurant_id not in self.queues or self.queues[restaurant_id].loaded_at <= expires
+        } | set(reload)
+        if stale:
+            self.queues.update(await self._load(db, sorted(stale)))
+        return {restaurant_id: self.queues[restaurant_id] for restaurant_id in restaurant_ids}
+
+    def _defer(self, db: AsyncSession, change: Callable[[], None]):
+        # Applied once the writer's transaction commits, dropped if it rolls back
+        db.sync_session.info.setdefault("eta_changes", []).append(change)
+
+    async def estimate(self, db: AsyncSession, restaurant_id: int, prep_minutes: float) -> Tuple[datetime, datetime]:
+        """(ready, delivery) estimate for a new order joining the restaurant's queue now."""
+        queue = (await self._queues(db, [restaurant_id]))[restaurant_id]
+        ready = queue.schedule(utc_now(), new_prep_minutes=prep_minutes)[None]
+        return ready, ready + timedelta(minutes=DELIVERY_MINUTES)
+
+    def record_order_placed(self, db: AsyncSession, order_id: int, restaurant_id: int, prep_minutes: float,
+                            ready: datetime, delivery: datetime):
+        entry = QueuedOrder(prep_minutes, OrderStatus.placed, ready=ready, delivery=delivery)
+
+        def apply():
+            queue = self.queues.get(restaurant_id)
+            if queue is not None:
+                queue.orders[order_id] = entry
+        self._defer(db, apply)
+
+    async def record_status_changes(self, db: AsyncSession, orders: Sequence, status: OrderStatus) -> Dict[int, Dict[str, Optional[datetime]]]:
+        """
+        Reschedule the queues of `orders` (rows with id and restaurant_id) after they
+        moved to `status`, in the caller's transaction. Writes and returns the
+        estimates of the other queued orders that changed, {order id: {column: value}};
+        those of the moved orders come from `status_estimates`.
+        """
+        if status == OrderStatus.delivered or not orders:
+            return {}
+        now = utc_now()
+        by_restaurant: Dict[int, list] = {}
+        for order in orders:
+            by_restaurant.setdefault(order.restaurant_id, []).append(order.id)
+        queues = await self._queues(db, by_restaurant)
+        # An order this worker has not seen yet (placed through another worker):
+        # reload its queue, which then already reflects the new status
+        missing = [
+            restaurant_id for restaurant_id, order_ids in by_restaurant.items()
+            if status in OPEN_STATUSES and any(order_id not in queues[restaurant_id].orders for order_id in order_ids)
+        ]
+        if missing:
+            queues.update(await self._queues(db, missing, reload=missing))
+
+        changes: Dict[int, Dict[str, Optional[datetime]]] = {}
+        for restaurant_id, order_ids in by_restaurant.items():
+            queue = queues[restaurant_id].copy()
+            for order_id in order_ids:
+                self._move(queue, order_id, status, now)
+
+            ready_times = queue.schedule(now)
+            for order_id, order in queue.orders.items():
+                ready = ready_times[order_id]
+                if order.ready is None or abs(ready - order.ready) >= ETA_WRITE_THRESHOLD:
+                    order.ready, order.delivery = ready, ready + timedelta(minutes=DELIVERY_MINUTES)
+                    changes[order_id] = {"estimated_ready_time": order.ready, "estimated_delivery_time": order.delivery}
+
+            def apply(restaurant_id=restaurant_id, order_ids=order_ids, scheduled=queue):
+                live = self.queues.get(restaurant_id)
+                if live is None:
+                    return
+                for order_id in order_ids:
+                    self._move(live, order_id, status, now)
+                for order_id, order in live.orders.items():
+                    if order_id in scheduled.orders:
+                        order.ready, order.delivery = scheduled.orders[order_id].ready, scheduled.orders[order_id].delivery
+            self._defer(db, apply)
+
+        if changes:
+            await db.execute(
+                update(Order).execution_options(synchronize_session=False),
+                [{"id": order_id, **values} for order_id, values in changes.items()]
+            )
+        return changes
+
+    @staticmethod
+    def _move(queue: KitchenQueue, order_id: int, status: OrderStatus, now: datetime):
+        if status not in OPEN_STATUSES:
+            queue.orders.pop(order_id, None)
+        elif order_id in queue.orders:
+            order = queue.orders[order_id]
+            if status == OrderStatus.preparing and order.started_at is None:
+                order.started_at = now
+            order.status = status
+
+    def forget(self, restaurant_id: int):
+        self.queues.pop(restaurant_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "restaurants": len(self.queues),
+            "queued_orders": sum(len(queue.orders) for queue in self.queues.values()),
+            "loads": self.loads,
+        }
+
+@event.listens_for(Session, "after_commit")
+def _apply_eta_changes(session):
+    for change in session.info.pop("eta_changes", ()):
+        change()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_eta_changes(session):
+    session.info.pop("eta_changes", None)
+
+eta_engine = EtaEngine()
@@ -0,0 +1,48 @@
+import csv
+import enum
+import io
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from api.utils.serialization import dumps
+
+# Encoders for streamed exports. Both take the chunks produced by a CRUD stream
+# (lists of row dicts) and yield one bytes block per chunk.
+
+async def ndjson_stream(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+async def csv_stream(
+    chunks: AsyncIterator[List[Dict[str, Any]]], columns: Sequence[str], item_columns: Sequence[str] = ()
+) -> AsyncIterator[bytes]:
+    """
+    CSV with one line per row. When `item_columns` is given each row is expected to
+    carry an "items" list and produces one line per item, with the row's own columns
+    repeated; rows without items still get one line. Item columns whose names clash
+    with a row column are prefixed "item_".
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([*columns, *(f"item_{column}" if column in columns else column for column in item_columns)])
+
+    async for rows in chunks:
+        for row in rows:
+            values = [_csv_value(row[column]) for column in columns]
+            if not item_columns:
+                writer.writerow(values)
+                continue
+            for item in row["items"] or [{}]:
+                writer.writerow(values + [_csv_value(item.get(column)) for column in item_columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
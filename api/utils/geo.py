@@ -0,0 +1,63 @@
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db.migrations import has_table
+
+# Nearest-neighbour helpers. Restaurant coordinates are mirrored into an R*Tree
+# (revision 0005, kept in sync by triggers) on SQLite builds that have it; the
+# nearby query then reads a bounding box from the R*Tree and computes exact
+# great-circle distances for the candidates only.
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+restaurants_rtree = Table(
+    "restaurants_rtree", MetaData(),
+    Column("id", Integer), Column("min_lat", Float), Column("max_lat", Float),
+    Column("min_lon", Float), Column("max_lon", Float),
+)
+
+# (min_lat, max_lat, min_lon, max_lon)
+Box = Tuple[float, float, float, float]
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_boxes(latitude: float, longitude: float, radius_km: float) -> List[Box]:
+    """Boxes covering every point within `radius_km`; split in two where they cross the antimeridian."""
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # Reaches a pole: every longitude is in range
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+
+    # Widest longitude span of the circle (at the latitude of its tangent points)
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+_has_rtree: Optional[bool] = None
+
+async def has_rtree(db: AsyncSession) -> bool:
+    """Whether the R*Tree index exists, checked once per process."""
+    global _has_rtree
+    if _has_rtree is None:
+        _has_rtree = db.bind.dialect.name == "sqlite" and await has_table(db, restaurants_rtree.name)
+    return _has_rtree
+
+def reset():
+    """Forget the R*Tree check, e.g. after switching databases."""
+    global _has_rtree
+    _has_rtree = None
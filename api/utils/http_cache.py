@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+# The ETag is a digest of the entity's id and row version counters, which every
+# UPDATE bumps (see the version columns on the models), so a conditional GET is
+# answered from one indexed row without loading or serializing the entity. The
+# counters start at a random value, as SQLite can reuse the id of a deleted row.
+# Last-Modified comes from updated_at columns, which only have
+# one-second resolution: it is left out until that second has passed, so a
+# client can never hold a Last-Modified that a later write in the same second
+# would repeat.
+
+def entity_tag(*parts) -> str:
+    digest = hashlib.sha1("|".join(map(str, parts)).encode())
+    return f'"{digest.hexdigest()[:20]}"'
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    # no-cache: clients may store the response but must revalidate before reuse
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified).replace(microsecond=0)
+        if datetime.now(timezone.utc) - last_modified >= timedelta(seconds=1):
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+def _opaque(tag: str) -> str:
+    # Weak comparison (RFC 9110 8.8.3.2) ignores the W/ prefix
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        candidates = {_opaque(tag) for tag in if_none_match.split(",")}
+        return "*" in candidates or _opaque(headers["ETag"]) in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return parsedate_to_datetime(headers["Last-Modified"]) <= since
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+def json_response(request: Request, payload: bytes, headers: Dict[str, str]) -> Response:
+    """The JSON `payload` with its validators, or a 304 if the client's copy is current."""
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+async def conditional_response(
+    request: Request,
+    validators: Callable[[], Awaitable[Optional[Dict[str, str]]]],
+    load: Callable[[], Awaitable[Optional[Tuple[bytes, Dict[str, str]]]]],
+) -> Optional[Response]:
+    """
+    The entity as JSON, a 304 if the client's copy is current, or None if it does
+    not exist. `validators` looks up the validator headers alone and is only
+    awaited for conditional requests; `load` fetches and serializes the entity,
+    returning (payload, headers).
+    """
+    if is_conditional(request):
+        headers = await validators()
+        if headers is None:
+            return None
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+    loaded = await load()
+    if loaded is None:
+        return None
+    return json_response(request, *loaded)
@@ -0,0 +1,285 @@
+import bisect
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Per-request SQL instrumentation.
+#
+# SQLInstrumentationMiddleware gives every HTTP request a RequestStats in a
+# ContextVar. The engine and pool hooks below add to it: SQLAlchemy's greenlets and
+# tasks started by the request inherit the context, so statements are attributed to
+# the request that sent them, even with requests running concurrently. Statements
+# outside any request, such as the background job workers, count as background.
+# At the end of the request the totals go into per-route histograms, rendered in
+# the Prometheus text format by the /metrics route.
+#
+# A statement shape is its SQL with IN lists collapsed; a shape run
+# REPEATED_STATEMENT_THRESHOLD or more times in one request is flagged as a likely
+# N+1 (a query issued per row of an earlier result). With QUERY_BUDGET_STRICT=1,
+# a request that goes over its route's QUERY_BUDGETS entry or repeats a shape
+# raises QueryBudgetExceeded once its response has been sent, failing the test
+# that made it.
+
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", "").lower() in ("1", "true", "yes", "on")
+REPEATED_STATEMENT_THRESHOLD = int(os.environ.get("REPEATED_STATEMENT_THRESHOLD", 3))
+
+# Most statements a request to each route may send ("METHOD /path/template");
+# the worst case of tests/test_query_counts.py, including cold caches and error paths
+QUERY_BUDGETS: Dict[str, int] = {
+    "POST /customers/": 1,
+    # Conditional GETs look the row version up first, then load the entity if it
+    # has changed since the client's copy
+    "GET /customers/{customer_id}": 2,
+    "PUT /customers/{customer_id}": 1,
+    "POST /restaurants/": 3,
+    "GET /restaurants/{restaurant_id}": 2,
+    "PUT /restaurants/{restaurant_id}": 3,
+    "GET /restaurants/nearby": 3,
+    "GET /restaurants/open": 2,
+    "GET /restaurants/search": 1,
+    "GET /restaurants/{restaurant_id}/menu": 2,
+    # Menu item writes also bump the restaurant's menu_version
+    "POST /restaurants/{restaurant_id}/menu-items/": 4,
+    "POST /menu-items/": 4,
+    # The bump comes first and doubles as the restaurant's existence check
+    "POST /restaurants/{restaurant_id}/menu-items/bulk": 8,
+    "PUT /menu-items/{item_id}": 4,
+    "GET /menu-items/search": 2,
+    "GET /menu-items/{item_id}": 2,
+    "GET /menu-items/{item_id}/with-restaurant": 2,
+    "GET /menu-items/{item_id}/recommendations": 1,
+    # One more for the first order to a restaurant whose ETA queue is not loaded yet
+    "POST /customers/{customer_id}/orders/": 5,
+    "GET /customers/{customer_id}/orders": 2,
+    "GET /customers/{customer_id}/recommendations": 2,
+    "GET /restaurants/{restaurant_id}/orders": 1,
+    # A cancellation rewrites the estimates of the orders queued behind it, after
+    # loading the kitchen queue if this worker has not yet
+    "PUT /orders/{order_id}/status": 4,
+    "POST /orders/{order_id}/review": 3,
+    "GET /restaurants/{restaurant_id}/reviews": 2,
+    "GET /customers/{customer_id}/reviews": 2,
+    "GET /restaurants/{restaurant_id}/analytics": 2,
+    "DELETE /menu-items/{item_id}": 4,
+    # The delete cascades are loaded a collection at a time, whatever the row counts.
+    # A customer's orders are also taken out of the rollups and the kitchen queues.
+    "DELETE /restaurants/{restaurant_id}": 15,
+    "DELETE /customers/{customer_id}": 20,
+}
+# Routes without an entry
+DEFAULT_QUERY_BUDGET = int(os.environ.get("DEFAULT_QUERY_BUDGET", 10))
+# Routes that read in chunks, one query of the same shape per chunk, so their
+# statement count grows with the data by design; they are measured but never flagged
+UNBUDGETED_ROUTES = {"GET /restaurants/{restaurant_id}/orders/export"}
+
+# Transaction control and connection setup, not counted as statements (their time is)
+_CONTROL_PREFIXES = ("BEGIN", "PRAGMA", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+# A parenthesized list of two or more placeholders or literals
+_IN_LIST = re.compile(r"\((?:\s*[^(),\s]+\s*,)+\s*[^(),\s]+\s*\)")
+
+UNMATCHED_ROUTE = "(unmatched)"
+
+def statement_shape(statement: str) -> str:
+    """The statement with its IN lists collapsed, so one query with different list lengths has one shape."""
+    return _IN_LIST.sub("(...)", statement)
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int = REPEATED_STATEMENT_THRESHOLD) -> Dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_sql_stats", default=None)
+# Statements sent outside any request
+background = RequestStats()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    context._instrumentation_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get() or background
+    stats.db_seconds += time.perf_counter() - context._instrumentation_started
+    if not statement.lstrip().upper().startswith(_CONTROL_PREFIXES):
+        stats.statements += 1
+        stats.shapes[statement_shape(statement)] += 1
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The async queue pool, recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            (_current.get() or background).pool_wait_seconds += time.perf_counter() - start
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Labels) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, sum, count)
+        self.series: Dict[Labels, List] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(labels)} {count}"
+
+class CounterMetric:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.series: Dict[Labels, float] = defaultdict(int)
+
+    def inc(self, labels: Labels, amount: float = 1):
+        self.series[labels] += amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{_labels(labels)} {_number(value)}"
+
+class Metrics:
+    def __init__(self):
+        self.requests = CounterMetric("http_requests_total", "HTTP requests by route and status.")
+        self.duration = Histogram("http_request_duration_seconds", "Time to handle a request, including streaming its body.", LATENCY_BUCKETS)
+        self.statements = Histogram("db_statements_per_request", "SQL statements sent per request.", STATEMENT_BUCKETS)
+        self.db_time = Histogram("db_time_per_request_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS)
+        self.pool_wait = Histogram("db_pool_wait_per_request_seconds", "Time spent waiting for pooled connections per request.", LATENCY_BUCKETS)
+        self.repeated = CounterMetric(
+            "db_repeated_statement_requests_total",
+            f"Requests that ran one statement shape {REPEATED_STATEMENT_THRESHOLD} or more times (likely N+1)."
+        )
+        self.over_budget = CounterMetric("db_query_budget_exceeded_total", "Requests that sent more statements than their route's budget.")
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        labels = (("method", method), ("route", route))
+        self.requests.inc(labels + (("status", str(status)),))
+        self.duration.observe(labels, seconds)
+        self.statements.observe(labels, stats.statements)
+        self.db_time.observe(labels, stats.db_seconds)
+        self.pool_wait.observe(labels, stats.pool_wait_seconds)
+        if f"{method} {route}" in UNBUDGETED_ROUTES:
+            return
+        if stats.repeated():
+            self.repeated.inc(labels)
+        if stats.statements > QUERY_BUDGETS.get(f"{method} {route}", DEFAULT_QUERY_BUDGET):
+            self.over_budget.inc(labels)
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for metric in (self.requests, self.duration, self.statements, self.db_time, self.pool_wait, self.repeated, self.over_budget):
+            lines.extend(metric.render())
+        lines.extend(render_stats("db_background", {
+            "statements": background.statements,
+            "time_seconds": background.db_seconds,
+            "pool_wait_seconds": background.pool_wait_seconds,
+        }))
+        return lines
+
+def render_stats(prefix: str, values: Dict[str, float], gauges: Iterable[str] = ()) -> List[str]:
+    """A component's stats() as unlabelled samples: `gauges` are levels, the rest running totals."""
+    gauges = set(gauges)
+    lines = []
+    for name, value in values.items():
+        if name in gauges:
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {_number(value)}"]
+        else:
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {_number(value)}"]
+    return lines
+
+metrics = Metrics()
+
+def _budget_failures(method: str, route: str, stats: RequestStats) -> List[str]:
+    if f"{method} {route}" in UNBUDGETED_ROUTES:
+        return []
+    failures = []
+    budget = QUERY_BUDGETS.get(f"{method} {route}", DEFAULT_QUERY_BUDGET)
+    if stats.statements > budget:
+        failures.append(f"{stats.statements} statements, over the budget of {budget}")
+    for shape, count in stats.repeated().items():
+        failures.append(f"{count} runs of one statement (likely N+1): {shape[:300]}")
+    return failures
+
+class SQLInstrumentationMiddleware:
+    """Pure ASGI middleware, so the request's context reaches the endpoint and the database hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            metrics.observe(scope["method"], route, status, time.perf_counter() - start, stats)
+        if QUERY_BUDGET_STRICT:
+            failures = _budget_failures(scope["method"], route, stats)
+            if failures:
+                raise QueryBudgetExceeded(f"{scope['method']} {route}: " + "; ".join(failures))
@@ -0,0 +1,64 @@
+"""
+One-shot maintenance commands for derived data.
+
+    python -m api.utils.maintenance rebuild-ratings
+    python -m api.utils.maintenance rebuild-rollups
+    python -m api.utils.maintenance rebuild-search
+    python -m api.utils.maintenance rebuild-open-windows
+"""
+import argparse
+import asyncio
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics, job
+from api.db.database import AsyncSessionLocal
+from api.crud import review as review_crud
+from api.crud import analytics as analytics_crud
+from api.crud import restaurant as restaurant_crud
+from api.utils import search
+
+
+async def rebuild_ratings() -> None:
+    async with AsyncSessionLocal() as db:
+        updated = await review_crud.recompute_restaurant_ratings(db)
+    print(f"Recomputed rating aggregates for {updated} restaurants")
+
+
+async def rebuild_rollups() -> None:
+    async with AsyncSessionLocal() as db:
+        await analytics_crud.rebuild_rollups(db)
+    print("Rebuilt analytics rollup tables")
+
+
+async def rebuild_search() -> None:
+    async with AsyncSessionLocal() as db:
+        for kind in search.SEARCHES:
+            await search.rebuild(db, kind)
+        await db.commit()
+        backend = await search.backend(db)
+    print(f"Rebuilt search indexes ({backend.name})")
+
+
+async def rebuild_open_windows() -> None:
+    async with AsyncSessionLocal() as db:
+        count = await restaurant_crud.rebuild_open_windows(db)
+    print(f"Rebuilt open windows for {count} restaurants")
+
+
+COMMANDS = {
+    "rebuild-ratings": rebuild_ratings,
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-search": rebuild_search,
+    "rebuild-open-windows": rebuild_open_windows,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild derived data from the source tables.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import String, Select, tuple_, type_coerce
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class InvalidCursor(ValueError):
+    pass
+
+# Cursor values are the raw key values as stored by the database. Comparing the
+# stored text (rather than a re-rendered datetime) keeps SQLite's string-typed
+# timestamps exact, whatever format they were written in.
+_TAGGED_TYPES = {
+    "dt": (datetime, datetime.fromisoformat),
+    "d": (date, date.fromisoformat),
+    "t": (time, time.fromisoformat),
+    "dec": (Decimal, Decimal),
+}
+
+def _encode_value(value: Any) -> Any:
+    for tag, (kind, _) in _TAGGED_TYPES.items():
+        if isinstance(value, kind):
+            return {tag: str(value) if kind is Decimal else value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        (tag, raw), = value.items()
+        return _TAGGED_TYPES[tag][1](raw)
+    return value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+def paginate(query: Select, keys: Sequence, cursor: Optional[str], limit: int, descending: bool = False) -> Select:
+    """
+    Apply keyset pagination to `query`.
+    `keys` must end in a unique column (normally the primary key) so the ordering is total.
+    The raw key values are appended to each row for `build_page`.
+    """
+    raw_keys = [type_coerce(key, String).label(f"_cursor_{position}") for position, key in enumerate(keys)]
+    query = query.add_columns(*raw_keys)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise InvalidCursor("Invalid pagination cursor")
+        # Raw strings are compared against the stored text, everything else against the column
+        columns = [type_coerce(key, String) if isinstance(value, str) else key for key, value in zip(keys, values)]
+        row, after = tuple_(*columns), tuple_(*values)
+        query = query.where(row < after if descending else row > after)
+
+    order_by = [key.desc() if descending else key.asc() for key in keys]
+    # Fetch one extra row to learn whether there is a next page
+    return query.order_by(*order_by).limit(limit + 1)
+
+def build_page(rows: Sequence, keys: Sequence, limit: int, as_dicts: bool = False) -> Dict[str, Any]:
+    """
+    Turn the rows of a `paginate`d query into {"items", "next_cursor"}.
+    Items are the first column of each row (an ORM entity), or with `as_dicts`
+    a dict of every selected column.
+    """
+    key_count = len(keys)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][-key_count:]))
+    if as_dicts:
+        # zip stops before the trailing cursor columns
+        fields = rows[0]._fields[:-key_count] if rows else ()
+        items = [dict(zip(fields, row)) for row in rows]
+    else:
+        items = [row[0] for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
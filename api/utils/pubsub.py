@@ -0,0 +1,212 @@
+import asyncio
+import os
+import socket
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from api.utils.serialization import dumps
+
+# In-process publish/subscribe for the order event streams.
+#
+# Writers publish after committing; every event is encoded once, as a Server-Sent
+# Events frame, and fanned out to the subscribers of its topic ("order:<id>",
+# "restaurant:<id>"). Each subscriber has a bounded queue. Publishing never waits:
+# a subscriber whose queue is full is dropped, gets a final "dropped" event and is
+# expected to reconnect and refetch.
+#
+# The backend carries events to the other workers. "memory" (the default) keeps
+# them in this process; "unix" sends each frame as a datagram to every worker's
+# socket in PUBSUB_SOCKET_DIR, a local stand-in for a Redis-style broker.
+
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("PUBSUB_SUBSCRIBER_QUEUE_SIZE", 64))
+HEARTBEAT_SECONDS = float(os.environ.get("PUBSUB_HEARTBEAT_SECONDS", 15))
+
+HEARTBEAT = b": heartbeat\n\n"
+DROPPED = b"event: dropped\ndata: {\"detail\":\"Too far behind; reconnect and refetch\"}\n\n"
+
+def sse_frame(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+class Subscription:
+    def __init__(self, broker: "Broker", topic: str, queue_size: int):
+        self.broker = broker
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def offer(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self._drop()
+
+    def _drop(self):
+        self.dropped = True
+        self.broker.unsubscribe(self)
+        self.broker.dropped += 1
+        # Make room for the notice; the consumer is too far behind for the rest to matter
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(DROPPED)
+
+    def _heartbeat(self):
+        if self.queue.empty():
+            self.queue.put_nowait(HEARTBEAT)
+
+    async def frames(self, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """Published frames, with a heartbeat comment after `heartbeat` idle seconds; ends once dropped."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.queue.empty():
+                # A timer rather than wait_for: no task per wait, and a disconnect's
+                # cancellation cannot be lost to a frame arriving at the same time
+                timer = loop.call_later(heartbeat, self._heartbeat)
+                try:
+                    frame = await self.queue.get()
+                finally:
+                    timer.cancel()
+            else:
+                frame = self.queue.get_nowait()
+            yield frame
+            if self.dropped and self.queue.empty():
+                return
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+class MemoryBackend:
+    name = "memory"
+
+    def start(self, deliver: Callable[[str, bytes], None]):
+        pass
+
+    def publish(self, topic: str, frame: bytes):
+        pass  # single worker: the broker has already delivered locally
+
+    def close(self):
+        pass
+
+class UnixSocketBackend:
+    name = "unix"
+
+    # Largest frame a datagram carries; bigger events are delivered locally only
+    MAX_DATAGRAM = 60_000
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self.sock: Optional[socket.socket] = None
+        self.undelivered = 0
+
+    def start(self, deliver: Callable[[str, bytes], None]):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"worker-{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.bind(self.path)
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), self._receive, deliver)
+
+    def _receive(self, deliver: Callable[[str, bytes], None]):
+        while True:
+            try:
+                message = self.sock.recv(self.MAX_DATAGRAM + 256)
+            except BlockingIOError:
+                return
+            topic, _, frame = message.partition(b"\n")
+            deliver(topic.decode(), frame)
+
+    def publish(self, topic: str, frame: bytes):
+        message = topic.encode() + b"\n" + frame
+        if self.sock is None or len(message) > self.MAX_DATAGRAM:
+            return
+        for name in os.listdir(self.directory):
+            peer = os.path.join(self.directory, name)
+            if peer == self.path:
+                continue
+            try:
+                self.sock.sendto(message, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a worker that exited without cleaning up
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                # Typically a full receive buffer: that worker is not keeping up,
+                # and loses the event like a slow subscriber would
+                self.undelivered += 1
+
+    def close(self):
+        if self.sock is not None:
+            asyncio.get_running_loop().remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+class Broker:
+    def __init__(self, backend=None, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.backend = backend or MemoryBackend()
+        self.queue_size = queue_size
+        self.topics: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.queue_size)
+        self.topics[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.topics.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.topics[subscription.topic]
+
+    def deliver(self, topic: str, frame: bytes):
+        for subscription in list(self.topics.get(topic, ())):
+            subscription.offer(frame)
+            self.delivered += 1
+
+    def publish(self, topic: str, event: str, data) -> None:
+        """Send `data` to the topic's subscribers on every worker. Never blocks."""
+        frame = sse_frame(event, data)
+        self.published += 1
+        self.deliver(topic, frame)
+        self.backend.publish(topic, frame)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "topics": len(self.topics),
+            "subscribers": sum(len(subscribers) for subscribers in self.topics.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+def _backend_from_environment():
+    if os.environ.get("PUBSUB_BACKEND", "memory") == "unix":
+        return UnixSocketBackend(os.environ.get("PUBSUB_SOCKET_DIR", "/tmp/food-delivery-pubsub"))
+    return MemoryBackend()
+
+broker = Broker(_backend_from_environment())
+
+def start():
+    """Start receiving other workers' events; call from the app's lifespan."""
+    broker.backend.start(broker.deliver)
+
+def stop():
+    broker.backend.close()
+
+def order_topic(order_id: int) -> str:
+    return f"order:{order_id}"
+
+def restaurant_topic(restaurant_id: int) -> str:
+    return f"restaurant:{restaurant_id}"
@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import Select, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.models.order_item import OrderItem
+
+# "Frequently ordered together" recommendations from a menu item co-occurrence matrix.
+#
+# C[i, j] is the number of orders containing both item i and item j; the diagonal
+# C[i, i] is the number of orders containing item i. The matrix is built from
+# order_items on first use with one sparse product (B.T @ B over the order x item
+# incidence matrix) and then kept current by `record_order`, which place_order
+# calls after committing. New orders go into a small per-row delta that is folded
+# into the CSR matrix once it grows past MERGE_THRESHOLD entries.
+#
+# Items are scored by confidence, C[i, j] / C[i, i]: the share of orders with i
+# that also had j. The model is per worker, like the in-process search index, and
+# only sees the orders placed through that worker after its build. Orders are
+# deduplicated by id rather than against the highest id built, as orders can
+# commit out of id order.
+
+# Pending delta entries folded into the CSR matrix at once
+MERGE_THRESHOLD = int(os.environ.get("RECOMMENDER_MERGE_THRESHOLD", 200_000))
+
+# order_items rows fetched per round trip during a build
+BUILD_CHUNK_SIZE = 200_000
+
+def _fetch_pairs(connection: Connection, query: Select) -> np.ndarray:
+    # Straight from the DB-API cursor into numpy: building a Row per line
+    # costs about three times as much as the fetch itself
+    compiled = query.compile(connection)
+    parameters = [compiled.params[name] for name in compiled.positiontup or ()]
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(str(compiled), parameters if compiled.positional else compiled.params)
+        chunks = [np.empty(0, dtype=np.int64)]
+        while rows := cursor.fetchmany(BUILD_CHUNK_SIZE):
+            chunks.append(np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)))
+    finally:
+        cursor.close()
+    return np.concatenate(chunks).reshape(-1, 2)
+
+class CoOccurrenceModel:
+    def __init__(self):
+        self.item_ids = np.empty(0, dtype=np.int64)   # row -> menu item id
+        self.rows: Dict[int, int] = {}                # menu item id -> row
+        self.matrix = sparse.csr_array((0, 0), dtype=np.int64)
+        self.pending: Dict[int, Counter] = defaultdict(Counter)
+        self.pending_size = 0
+        self.ready = False
+        self.built_order_ids = np.empty(0, dtype=np.int64)  # sorted, the orders the build read
+        self.recorded = set()                               # orders added since the build
+        self._building = False
+        self._early: List[Tuple[int, Sequence[int]]] = []
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _cooccurrence(order_ids: np.ndarray, menu_item_ids: np.ndarray):
+        item_ids, columns = np.unique(menu_item_ids, return_inverse=True)
+        unique_order_ids, orders = np.unique(order_ids, return_inverse=True)
+        incidence = sparse.csr_array(
+            (np.ones(len(columns), dtype=np.int64), (orders, columns)), shape=(len(unique_order_ids), len(item_ids))
+        )
+        # Repeated lines of the same item within an order count once
+        incidence.data[:] = 1
+        return item_ids, (incidence.T @ incidence).tocsr(), unique_order_ids
+
+    async def build(self, db: AsyncSession):
+        """Recompute the matrix from every order line in the database."""
+        self._building = True
+        try:
+            connection = await db.connection()
+            lines = await connection.run_sync(_fetch_pairs, select(OrderItem.order_id, OrderItem.menu_item_id))
+            # The sparse product is CPU bound; keep the event loop serving requests meanwhile
+            item_ids, matrix, order_ids = await asyncio.to_thread(self._cooccurrence, lines[:, 0], lines[:, 1])
+
+            self.item_ids, self.matrix = item_ids, matrix
+            self.rows = {int(item_id): row for row, item_id in enumerate(item_ids)}
+            self.pending.clear()
+            self.pending_size = 0
+            self.built_order_ids = order_ids
+            self.recorded = set()
+            self.ready = True
+            # Orders committed while the build was reading
+            early, self._early = self._early, []
+            for order_id, menu_item_ids in early:
+                self.record_order(order_id, menu_item_ids)
+        finally:
+            self._building = False
+            self._early = []
+
+    async def ensure_built(self, db: AsyncSession):
+        if not self.ready:
+            async with self._lock:
+                if not self.ready:
+                    await self.build(db)
+
+    def record_order(self, order_id: int, menu_item_ids: Iterable[int]):
+        """Add a committed order to the matrix. Cheap: touches only the order's own item pairs."""
+        if not self.ready:
+            if self._building:
+                self._early.append((order_id, list(menu_item_ids)))
+            return  # the first query builds from the database and will see it
+        if order_id in self.recorded or self._built(order_id):
+            return
+        self.recorded.add(order_id)
+        rows = [self._row(item_id) for item_id in set(menu_item_ids)]
+        for row in rows:
+            pending = self.pending[row]
+            for other in rows:
+                pending[other] += 1
+        self.pending_size += len(rows) ** 2
+        if self.pending_size >= MERGE_THRESHOLD:
+            self._merge()
+
+    def _built(self, order_id: int) -> bool:
+        index = np.searchsorted(self.built_order_ids, order_id)
+        return index < len(self.built_order_ids) and self.built_order_ids[index] == order_id
+
+    def _row(self, item_id: int) -> int:
+        row = self.rows.get(item_id)
+        if row is None:
+            row = self.rows[item_id] = len(self.item_ids)
+            self.item_ids = np.append(self.item_ids, item_id)
+        return row
+
+    def _merge(self):
+        size = len(self.item_ids)
+        rows, columns, counts = [], [], []
+        for row, pending in self.pending.items():
+            rows.extend([row] * len(pending))
+            columns.extend(pending.keys())
+            counts.extend(pending.values())
+        delta = sparse.csr_array((counts, (rows, columns)), shape=(size, size), dtype=np.int64)
+        matrix = self.matrix
+        if matrix.shape != (size, size):
+            matrix = sparse.csr_array((matrix.data, matrix.indices, np.pad(matrix.indptr, (0, size - matrix.shape[0]), mode="edge")),
+                                      shape=(size, size))
+        self.matrix = (matrix + delta).tocsr()
+        self.pending.clear()
+        self.pending_size = 0
+
+    def _counts(self, row: int) -> Dict[int, int]:
+        """Row `row` of the matrix, including the pending delta, as {column: count}."""
+        counts: Dict[int, int] = {}
+        if row < self.matrix.shape[0]:
+            start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+            counts = dict(zip(self.matrix.indices[start:end].tolist(), self.matrix.data[start:end].tolist()))
+        for column, count in self.pending.get(row, {}).items():
+            counts[column] = counts.get(column, 0) + count
+        return counts
+
+    def _top(self, scores: np.ndarray, columns: np.ndarray, exclude: set, limit: int) -> List[Tuple[int, float]]:
+        keep = ~np.isin(columns, list(exclude)) & (scores > 0)
+        scores, columns = scores[keep], columns[keep]
+        # Highest score first, ties broken on item id for stable results
+        ordered = np.lexsort((self.item_ids[columns], -scores))[:limit]
+        return [(int(self.item_ids[columns[i]]), float(scores[i])) for i in ordered]
+
+    def similar(self, item_id: int, limit: int) -> List[Tuple[int, float]]:
+        """(menu item id, confidence) of the items most often ordered with `item_id`, best first."""
+        row = self.rows.get(item_id)
+        if row is None:
+            return []
+        counts = self._counts(row)
+        orders = counts.pop(row, 0)
+        if not orders or not counts:
+            return []
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        scores = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) / orders
+        return self._top(scores, columns, set(), limit)
+
+    def suggest(self, history: Dict[int, int], limit: int) -> List[Tuple[int, float]]:
+        """
+        (menu item id, score) for items not in `history` ({menu item id: orders
+        containing it}): each history item's confidences weighted by how often
+        it was ordered, summed.
+        """
+        known = [(self.rows[item_id], weight) for item_id, weight in history.items() if item_id in self.rows]
+        if not known:
+            return []
+        size = len(self.item_ids)
+        scores = np.zeros(size)
+        for row, weight in known:
+            counts = self._counts(row)
+            orders = counts.get(row, 0)
+            if orders:
+                columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                np.add.at(scores, columns, np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * weight / orders)
+        columns = np.flatnonzero(scores)
+        return self._top(scores[columns], columns, {row for row, _ in known}, limit)
+
+_model = CoOccurrenceModel()
+
+def model() -> CoOccurrenceModel:
+    return _model
+
+def reset():
+    """Drop the model, e.g. after switching databases; the next query rebuilds it."""
+    global _model
+    _model = CoOccurrenceModel()
+
+def record_order(order_id: int, menu_item_ids: Iterable[int]):
+    _model.record_order(order_id, menu_item_ids)
+
+async def similar(db: AsyncSession, item_id: int, limit: int) -> List[Tuple[int, float]]:
+    await _model.ensure_built(db)
+    return _model.similar(item_id, limit)
+
+async def suggest(db: AsyncSession, history: Dict[int, int], limit: int) -> List[Tuple[int, float]]:
+    await _model.ensure_built(db)
+    return _model.suggest(history, limit)
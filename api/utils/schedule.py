@@ -0,0 +1,22 @@
+from datetime import time
+from typing import List, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+def minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+def open_windows(opening_time: time, closing_time: time) -> List[Tuple[int, int]]:
+    """
+    Half-open [open, close) minute intervals within one day. Hours that cross midnight
+    are split in two; equal opening and closing times mean open around the clock.
+    """
+    opening, closing = minute_of_day(opening_time), minute_of_day(closing_time)
+    if opening < closing:
+        return [(opening, closing)]
+    if opening == closing:
+        return [(0, MINUTES_PER_DAY)]
+    windows = [(opening, MINUTES_PER_DAY)]
+    if closing > 0:
+        windows.append((0, closing))
+    return windows
@@ -0,0 +1,353 @@
+import asyncio
+import bisect
+import heapq
+import math
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import (
+    Column, ColumnElement, Integer, MetaData, Select, Table, Text, bindparam, delete, event, false, func, insert,
+    literal_column, select
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.db.migrations import has_table
+from api.models.menu_item import MenuItem
+from api.models.restaurant import Restaurant
+from api.utils.pagination import InvalidCursor, build_page, decode_cursor, encode_cursor, paginate
+
+# Full-text search over menu items and restaurants.
+#
+# SQLite databases migrated with FTS5 support (revision 0004) search through FTS5
+# tables; anything else uses an in-process inverted index that is loaded from the
+# database on first search. Both rank with BM25 (FTS5's formula and column weights),
+# prefix-match every query word of MIN_PREFIX characters or more and AND the words
+# together. Scores are negative, lower is better, as with FTS5's bm25().
+#
+# Scoring is the expensive part (about 1.5 us per match with FTS5, and a common word
+# matches a large share of the menu), so only the SEARCH_CANDIDATES most recently
+# added matches that pass the filters are scored and ranked. Below that many matches
+# the ranking is exact; above it, the pages stay consistent with each other as the
+# cursor keys into the same candidates.
+#
+# The CRUD writers call `index`/`remove` inside their transaction. The FTS5 tables
+# change in that transaction; the in-process index applies the change on commit.
+# The in-process index is per worker and only sees writes made by that worker.
+
+@dataclass(frozen=True)
+class SearchSpec:
+    model: type
+    fts_table: str
+    columns: Tuple[str, ...]
+    weights: Tuple[float, ...]
+
+SEARCHES: Dict[str, SearchSpec] = {
+    "menu_items": SearchSpec(MenuItem, "menu_items_fts", ("name", "description"), (10.0, 1.0)),
+    "restaurants": SearchSpec(Restaurant, "restaurants_fts", ("name", "cuisine_type"), (10.0, 5.0)),
+}
+
+# Matches scored and ranked per search, newest first
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", 1000))
+
+# Shorter query words match whole words only: FTS5 has no prefix index for them
+MIN_PREFIX = 2
+
+# BM25 parameters, FTS5's defaults
+K1 = 1.2
+B = 0.75
+
+# Same folding as FTS5's unicode61 tokenizer with remove_diacritics
+_TOKEN = re.compile(r"[^\W_]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    return _TOKEN.findall("".join(char for char in folded if not unicodedata.combining(char)))
+
+def is_prefix(term: str) -> bool:
+    return len(term) >= MIN_PREFIX
+
+class FTS5Backend:
+    name = "fts5"
+
+    def __init__(self):
+        metadata = MetaData()
+        self.tables = {
+            kind: Table(spec.fts_table, metadata, Column("rowid", Integer), *[Column(c, Text) for c in spec.columns])
+            for kind, spec in SEARCHES.items()
+        }
+
+    async def index(self, db: AsyncSession, kind: str, ids: Sequence[int], replace: bool = True):
+        spec, fts = SEARCHES[kind], self.tables[kind]
+        if replace:
+            await db.execute(delete(fts).where(fts.c.rowid.in_(ids)))
+        source = select(spec.model.id, *[getattr(spec.model, column) for column in spec.columns])
+        await db.execute(insert(fts).from_select(["rowid", *spec.columns], source.where(spec.model.id.in_(ids))))
+
+    async def remove(self, db: AsyncSession, kind: str, ids: Sequence[int]):
+        fts = self.tables[kind]
+        await db.execute(delete(fts).where(fts.c.rowid.in_(ids)))
+
+    async def rebuild(self, db: AsyncSession, kind: str):
+        spec, fts = SEARCHES[kind], self.tables[kind]
+        await db.execute(delete(fts))
+        source = select(spec.model.id, *[getattr(spec.model, column) for column in spec.columns])
+        await db.execute(insert(fts).from_select(["rowid", *spec.columns], source))
+
+    def _match(self, kind: str, terms: List[str]) -> ColumnElement:
+        fts = self.tables[kind]
+        return literal_column(fts.name).op("MATCH")(" ".join(f'"{term}"*' if is_prefix(term) else f'"{term}"' for term in terms))
+
+    async def matching(self, db: AsyncSession, kind: str, terms: List[str]) -> ColumnElement:
+        fts = self.tables[kind]
+        return SEARCHES[kind].model.id.in_(select(fts.c.rowid).where(self._match(kind, terms)))
+
+    async def search(self, db: AsyncSession, kind: str, terms: List[str], query: Select,
+                     cursor: Optional[str], limit: int, as_dicts: bool) -> Dict[str, Any]:
+        spec, fts = SEARCHES[kind], self.tables[kind]
+        model = spec.model
+        # bm25() only runs for the rows the subquery returns: the filtered matches
+        # stream newest first from the FTS5 index and stop at the candidate limit
+        candidates = (
+            query.with_only_columns(model.id.label("id"), func.bm25(literal_column(fts.name), *spec.weights).label("score"))
+            .join(fts, fts.c.rowid == model.id)
+            .where(self._match(kind, terms))
+            .order_by(fts.c.rowid.desc())
+            .limit(SEARCH_CANDIDATES)
+            .subquery()
+        )
+        keys = [candidates.c.score, candidates.c.id]
+        query = query.join(candidates, candidates.c.id == model.id)
+        result = await db.execute(paginate(query, keys, cursor, limit))
+        return build_page(result.all(), keys, limit, as_dicts=as_dicts)
+
+class _InvertedIndex:
+    def __init__(self, weights: Tuple[float, ...]):
+        self.weights = weights
+        # term -> {doc id: occurrences per column}
+        self.postings: Dict[str, Dict[int, Tuple[int, ...]]] = defaultdict(dict)
+        # Sorted vocabulary for prefix lookups; may hold terms that no longer have postings
+        self.terms: List[str] = []
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def add(self, doc_id: int, values: Sequence[Optional[str]]):
+        self.discard(doc_id)
+        counts: Dict[str, List[int]] = defaultdict(lambda: [0] * len(values))
+        length = 0
+        for position, value in enumerate(values):
+            for token in tokenize(value):
+                counts[token][position] += 1
+                length += 1
+        for term, per_column in counts.items():
+            if term not in self.postings:
+                bisect.insort(self.terms, term)
+            self.postings[term][doc_id] = tuple(per_column)
+        self.doc_terms[doc_id] = list(counts)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def discard(self, doc_id: int):
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def _expand(self, prefix: str) -> List[str]:
+        if not is_prefix(prefix):
+            return [prefix] if prefix in self.postings else []
+        start = bisect.bisect_left(self.terms, prefix)
+        expanded = []
+        for term in self.terms[start:]:
+            if not term.startswith(prefix):
+                break
+            if term in self.postings:
+                expanded.append(term)
+        return expanded
+
+    def match(self, terms: List[str]) -> Set[int]:
+        """Ids of the documents matching all prefix terms."""
+        matched: Optional[Set[int]] = None
+        for prefix in terms:
+            ids = set()
+            for term in self._expand(prefix):
+                ids.update(self.postings[term])
+            matched = ids if matched is None else matched & ids
+        return matched or set()
+
+    def score(self, terms: List[str], doc_ids: Sequence[int]) -> Dict[int, float]:
+        """BM25 score of each of `doc_ids`, which must match all prefix terms."""
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count or 1
+        scores = dict.fromkeys(doc_ids, 0.0)
+        for prefix in terms:
+            # A prefix phrase's frequency is the weighted sum over every term it expands to
+            frequencies: Dict[int, float] = defaultdict(float)
+            matched = set()
+            for term in self._expand(prefix):
+                postings = self.postings[term]
+                matched.update(postings)
+                for doc_id in scores:
+                    per_column = postings.get(doc_id)
+                    if per_column:
+                        frequencies[doc_id] += sum(w * n for w, n in zip(self.weights, per_column))
+            idf = max(math.log((doc_count - len(matched) + 0.5) / (len(matched) + 0.5)), 1e-6)
+            for doc_id, f in frequencies.items():
+                scores[doc_id] -= idf * f * (K1 + 1) / (f + K1 * (1 - B + B * self.doc_lengths[doc_id] / average_length))
+        return scores
+
+class InMemoryBackend:
+    name = "memory"
+
+    # Candidates checked against the SQL filters per round trip
+    FILTER_BATCH = 500
+
+    def __init__(self):
+        self.indexes = {kind: _InvertedIndex(spec.weights) for kind, spec in SEARCHES.items()}
+        self.loaded = set()
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self, db: AsyncSession, kind: str, ids: Optional[Sequence[int]] = None):
+        spec = SEARCHES[kind]
+        query = select(spec.model.id, *[getattr(spec.model, column) for column in spec.columns])
+        if ids is not None:
+            query = query.where(spec.model.id.in_(ids))
+        return (await db.execute(query)).all()
+
+    def _defer(self, db: AsyncSession, change):
+        # Applied once the writer's transaction commits, dropped if it rolls back
+        db.sync_session.info.setdefault("search_changes", []).append(change)
+
+    async def index(self, db: AsyncSession, kind: str, ids: Sequence[int], replace: bool = True):
+        if kind not in self.loaded:
+            return  # the first search loads everything
+        rows = await self._fetch(db, kind, ids)
+        index = self.indexes[kind]
+        self._defer(db, lambda: [index.add(row[0], row[1:]) for row in rows])
+
+    async def remove(self, db: AsyncSession, kind: str, ids: Sequence[int]):
+        if kind in self.loaded:
+            index = self.indexes[kind]
+            self._defer(db, lambda: [index.discard(doc_id) for doc_id in ids])
+
+    async def rebuild(self, db: AsyncSession, kind: str):
+        index = _InvertedIndex(SEARCHES[kind].weights)
+        for row in await self._fetch(db, kind):
+            index.add(row[0], row[1:])
+        self.indexes[kind] = index
+        self.loaded.add(kind)
+
+    async def _ensure_loaded(self, db: AsyncSession, kind: str):
+        if kind not in self.loaded:
+            async with self._lock:
+                if kind not in self.loaded:
+                    await self.rebuild(db, kind)
+
+    async def matching(self, db: AsyncSession, kind: str, terms: List[str]) -> ColumnElement:
+        await self._ensure_loaded(db, kind)
+        ids = sorted(self.indexes[kind].match(terms))
+        # Inlined rather than bound: a popular term can match more ids than SQLite allows parameters
+        return SEARCHES[kind].model.id.in_(bindparam("search_ids", ids, expanding=True, literal_execute=True))
+
+    async def search(self, db: AsyncSession, kind: str, terms: List[str], query: Select,
+                     cursor: Optional[str], limit: int, as_dicts: bool) -> Dict[str, Any]:
+        await self._ensure_loaded(db, kind)
+        index = self.indexes[kind]
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 2:
+                raise InvalidCursor("Invalid pagination cursor")
+            after = (float(values[0]), int(values[1]))
+
+        # Walk the matches newest first in batches, keeping the candidates that pass the SQL filters
+        model = SEARCHES[kind].model
+        matched = sorted(index.match(terms), reverse=True)
+        candidates: List[int] = []
+        position = 0
+        while len(candidates) < SEARCH_CANDIDATES and position < len(matched):
+            batch = matched[position:position + self.FILTER_BATCH]
+            position += len(batch)
+            result = await db.execute(query.with_only_columns(model.id).where(model.id.in_(batch)))
+            passed = set(result.scalars())
+            candidates.extend(doc_id for doc_id in batch if doc_id in passed)
+        del candidates[SEARCH_CANDIDATES:]
+
+        # Only the page (and one more key, for the cursor) is sorted
+        scores = index.score(terms, candidates)
+        keys = ((score, doc_id) for doc_id, score in scores.items())
+        page = heapq.nsmallest(limit + 1, (key for key in keys if after is None or key > after))
+        if not page:
+            return {"items": [], "next_cursor": None}
+
+        result = await db.execute(query.add_columns(model.id.label("_search_id")).where(model.id.in_([d for _, d in page[:limit]])))
+        rows = {row[-1]: row for row in result.all()}
+        next_cursor = encode_cursor(list(page[limit - 1])) if len(page) > limit else None
+        items = []
+        for _, doc_id in page[:limit]:
+            row = rows[doc_id]
+            items.append(dict(zip(row._fields[:-1], row)) if as_dicts else row[0])
+        return {"items": items, "next_cursor": next_cursor}
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session):
+    for change in session.info.pop("search_changes", ()):
+        change()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_search_changes(session):
+    session.info.pop("search_changes", None)
+
+_backend = None
+
+async def backend(db: AsyncSession):
+    """The search backend for this process, picked on first use."""
+    global _backend
+    if _backend is None:
+        has_fts = db.bind.dialect.name == "sqlite" and await has_table(db, SEARCHES["menu_items"].fts_table)
+        _backend = FTS5Backend() if has_fts else InMemoryBackend()
+    return _backend
+
+def reset():
+    """Forget the chosen backend, e.g. after switching databases."""
+    global _backend
+    _backend = None
+
+async def index(db: AsyncSession, kind: str, ids: Sequence[int], replace: bool = True):
+    """(Re)index the rows `ids` as currently stored. Pass replace=False for new rows."""
+    if ids:
+        await (await backend(db)).index(db, kind, list(ids), replace)
+
+async def remove(db: AsyncSession, kind: str, ids: Sequence[int]):
+    if ids:
+        await (await backend(db)).remove(db, kind, list(ids))
+
+async def rebuild(db: AsyncSession, kind: str):
+    await (await backend(db)).rebuild(db, kind)
+
+async def matching(db: AsyncSession, kind: str, text: str) -> ColumnElement:
+    """WHERE clause restricting `kind`'s model to the rows matching `text`, unranked."""
+    terms = tokenize(text)
+    if not terms:
+        return false()
+    return await (await backend(db)).matching(db, kind, terms)
+
+async def search(db: AsyncSession, kind: str, text: str, query: Select,
+                 cursor: Optional[str], limit: int, as_dicts: bool = False) -> Dict[str, Any]:
+    """
+    Rank the rows of `query` (already filtered) that match `text`, best first, with keyset
+    pagination on (score, id). `query` must select from the searched model.
+    """
+    terms = tokenize(text)
+    if not terms:
+        return {"items": [], "next_cursor": None}
+    return await (await backend(db)).search(db, kind, terms, query, cursor, limit, as_dicts)
@@ -0,0 +1,488 @@
+"""
+Synthetic data at production volumes, for benchmarking against a realistic database.
+
+    python -m api.utils.seed [--orders 10000000] [--restaurants 5000] [--customers 500000] [--seed 0]
+
+Writes into the (empty) database at DATABASE_URL, after applying the migrations.
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, replace
+from datetime import date, time as dtime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics, job
+from api.db.database import create_engine_from_settings, settings
+from api.db.migrations import upgrade_database
+from api.crud import analytics as analytics_crud
+from api.crud import restaurant as restaurant_crud
+from api.crud import review as review_crud
+from api.models.customer import Customer
+from api.models.menu_item import MenuItem
+from api.models.order import Order, OrderStatus
+from api.models.order_item import OrderItem
+from api.models.restaurant import Restaurant
+from api.models.review import Review
+from api.utils import search
+
+# Everything is drawn with numpy from generators seeded by (seed, stream, day), so a
+# seed always yields the same database whatever the batch size. Restaurants,
+# customers and the dishes on each menu are picked with Zipfian popularity, and
+# customers order from restaurants in their own city. Orders follow a lunch and a
+# dinner peak within each restaurant's opening hours, busier at weekends; ids
+# increase with order_date. Order totals are the sums of their lines, and the
+# ratings, rollups, open windows and search indexes are rebuilt from the generated
+# rows at the end. All orders are delivered or cancelled: the open ones would need
+# ETAs from a live kitchen queue.
+
+CITIES = [
+    ("Bengaluru", 12.9716, 77.5946),
+    ("Mumbai", 19.0760, 72.8777),
+    ("Delhi", 28.7041, 77.1025),
+    ("Chennai", 13.0827, 80.2707),
+    ("Pune", 18.5204, 73.8567),
+]
+CITY_RADIUS_DEGREES = 0.08
+
+# Twelve dishes per cuisine, in the categories of DISH_CATEGORIES
+CUISINES = {
+    "Indian": ["Paneer Tikka", "Samosa", "Butter Chicken", "Dal Makhani", "Chicken Biryani", "Masala Dosa",
+               "Palak Paneer", "Rogan Josh", "Tandoori Roti", "Gulab Jamun", "Rasmalai", "Mango Lassi"],
+    "Italian": ["Bruschetta", "Minestrone", "Margherita Pizza", "Pepperoni Pizza", "Lasagna", "Spaghetti Carbonara",
+                "Penne Arrabbiata", "Risotto", "Garlic Bread", "Tiramisu", "Panna Cotta", "Espresso"],
+    "Chinese": ["Spring Rolls", "Dim Sum", "Kung Pao Chicken", "Hakka Noodles", "Manchurian", "Mapo Tofu",
+                "Sweet and Sour Pork", "Chow Mein", "Fried Rice", "Fortune Cookies", "Sesame Balls", "Jasmine Tea"],
+    "Mexican": ["Nachos", "Guacamole", "Tacos", "Burrito", "Quesadilla", "Enchiladas",
+                "Fajitas", "Tamales", "Elote", "Churros", "Flan", "Horchata"],
+    "Thai": ["Satay", "Tom Yum", "Pad Thai", "Green Curry", "Red Curry", "Massaman Curry",
+             "Pad See Ew", "Khao Pad", "Som Tam", "Mango Sticky Rice", "Coconut Ice Cream", "Thai Iced Tea"],
+    "Japanese": ["Edamame", "Gyoza", "Sushi Platter", "Ramen", "Tempura", "Teriyaki Chicken",
+                 "Udon", "Katsu Curry", "Miso Soup", "Matcha Ice Cream", "Mochi", "Green Tea"],
+}
+DISH_CATEGORIES = ["Appetizer"] * 2 + ["Main Course"] * 6 + ["Side Dish", "Dessert", "Dessert", "Beverage"]
+STYLES = ["Classic", "Spicy", "Smoky", "Crispy", "Homestyle", "Royal", "Garden", "Chef's Special", "Street Style"]
+DESCRIPTIONS = ["slow cooked with fresh herbs", "with a side of salad", "served with house sauce",
+                "made to a family recipe", "finished with toasted spices", "tossed with seasonal greens"]
+RESTAURANT_WORDS = ["Spice", "Garden", "Kitchen", "House", "Table", "Corner", "Palace", "Express", "Bistro", "Den"]
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Sara", "Kabir", "Isha",
+               "Dev", "Nisha", "Rahul", "Tara", "Aditya", "Zoya", "Karan", "Leela", "Nikhil", "Riya"]
+LAST_NAMES = ["Sharma", "Iyer", "Patel", "Reddy", "Khan", "Das", "Menon", "Gupta", "Singh", "Nair",
+              "Rao", "Bose", "Kapoor", "Joshi", "Pillai"]
+STREETS = ["MG Road", "Church Street", "Park Avenue", "Lake View Road", "Station Road", "Temple Street",
+           "Hill Road", "Market Lane", "Residency Road", "Brigade Road"]
+INSTRUCTIONS = ["Ring the bell", "Leave at the door", "Extra spicy please", "No onions", "Call on arrival"]
+COMMENTS = {
+    1: ["Cold and late", "Would not order again"],
+    2: ["Disappointing", "Portions were small"],
+    3: ["It was okay", "Average taste"],
+    4: ["Tasty food", "Good value", "Arrived hot"],
+    5: ["Excellent", "Best in town", "Loved every bite"],
+}
+
+# Zipf exponent for customers; restaurants and dishes use SeedConfig.zipf
+CUSTOMER_ZIPF = 0.8
+MAX_ORDER_LINES = 8
+CANCEL_RATE = 0.06
+INSTRUCTION_RATE = 0.05
+# Orders per day of the week (Monday first), before the growth over the period
+WEEKDAY_WEIGHTS = [0.9, 0.85, 0.9, 0.95, 1.15, 1.3, 1.2]
+
+@dataclass(frozen=True)
+class SeedConfig:
+    restaurants: int = 1_000
+    customers: int = 50_000
+    orders: int = 1_000_000
+    min_menu_size: int = 10
+    max_menu_size: int = 60
+    days: int = 365
+    # Orders are placed on the `days` days before this date (UTC)
+    end: date = date(2026, 1, 1)
+    seed: int = 0
+    zipf: float = 1.1
+    # Share of delivered orders that get a review
+    review_rate: float = 0.25
+    # Orders (with their lines and reviews) inserted per transaction
+    batch_size: int = 50_000
+    # Order volume at the end of the period relative to its start
+    growth: float = 1.5
+
+# Column name -> values, as numpy arrays or lists
+Columns = Dict[str, Any]
+
+@dataclass
+class _Catalog:
+    opening: np.ndarray          # minute of day
+    closing: np.ndarray          # minute of day, past 1440 when open after midnight
+    quality: np.ndarray          # mean review rating
+    city_restaurants: List[Tuple[np.ndarray, np.ndarray]]  # per city: restaurants by popularity, cumulative weights
+    menu_start: np.ndarray       # first menu item index of each restaurant
+    menu_size: np.ndarray
+    item_weights: np.ndarray     # cumulative Zipf weights by position on the menu
+    price_cents: np.ndarray
+    preparation_time: np.ndarray
+    customer_city: np.ndarray
+    customer_by_popularity: np.ndarray
+    customer_weights: np.ndarray
+    customer_address: np.ndarray
+
+def _zipf_cumulative(n: int, s: float) -> np.ndarray:
+    return np.cumsum(np.arange(1, n + 1, dtype=np.float64) ** -s)
+
+def _draw(cumulative: np.ndarray, rng: np.random.Generator, size: int) -> np.ndarray:
+    """Ranks drawn with the probabilities of the cumulative weights."""
+    return np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side="right")
+
+def _pick(choices: List[Any], index: np.ndarray) -> np.ndarray:
+    return np.array(choices, dtype=object)[index]
+
+def _catalog(config: SeedConfig) -> Tuple[_Catalog, Dict[Any, Columns]]:
+    rng = np.random.default_rng([config.seed, 0])
+    created = np.datetime64(config.end - timedelta(days=config.days), "s")
+    cuisines = list(CUISINES)
+    cities = min(len(CITIES), config.restaurants)
+    city_names = [city for city, _, _ in CITIES]
+    centres = np.array([(latitude, longitude) for _, latitude, longitude in CITIES])
+
+    # Restaurants: every city gets some, each with its own popularity ranking
+    n = config.restaurants
+    ids = np.arange(1, n + 1)
+    restaurant_city = rng.permutation(np.arange(n) % cities)
+    cuisine = rng.integers(len(cuisines), size=n)
+    opening = rng.choice([8 * 60, 9 * 60, 10 * 60, 11 * 60], size=n)
+    closing = rng.choice([22 * 60, 23 * 60, 23 * 60 + 30, 24 * 60 + 30], size=n)
+    quality = rng.uniform(2.8, 4.8, size=n)
+    words = np.array([rng.choice(len(RESTAURANT_WORDS), size=2, replace=False) for _ in range(n)]).reshape(n, 2)
+    city_restaurants = []
+    for city in range(cities):
+        members = rng.permutation(np.flatnonzero(restaurant_city == city))
+        city_restaurants.append((members, _zipf_cumulative(len(members), config.zipf)))
+    restaurant_cuisine = _pick(cuisines, cuisine)
+    restaurant_city_name = _pick(city_names, restaurant_city)
+    coordinates = centres[restaurant_city] + rng.normal(0, CITY_RADIUS_DEGREES, size=(n, 2))
+    columns: Dict[Any, Columns] = {}
+    columns[Restaurant] = {
+        "id": ids,
+        "name": restaurant_cuisine + " " + _pick(RESTAURANT_WORDS, words[:, 0]) + " " + _pick(RESTAURANT_WORDS, words[:, 1]) + " " + ids.astype(str).astype(object),
+        "description": restaurant_cuisine + " food in " + restaurant_city_name,
+        "cuisine_type": restaurant_cuisine,
+        "address": rng.integers(1, 400, size=n).astype(str).astype(object) + " " + _pick(STREETS, rng.integers(len(STREETS), size=n)) + ", " + restaurant_city_name,
+        "latitude": coordinates[:, 0],
+        "longitude": coordinates[:, 1],
+        "phone_number": [f"+9180{r:08d}" for r in range(n)],
+        "rating": np.zeros(n),
+        "is_active": rng.random(n) < 0.97,
+        "opening_time": [dtime(minute // 60, minute % 60) for minute in opening.tolist()],
+        "closing_time": [dtime(minute // 60 % 24, minute % 60) for minute in closing.tolist()],
+        "created_at": np.full(n, created),
+        "updated_at": np.full(n, created),
+    }
+
+    # Menus: dishes of the restaurant's cuisine, most popular first
+    menu_size = rng.integers(config.min_menu_size, config.max_menu_size + 1, size=n)
+    menu_start = np.concatenate([[0], np.cumsum(menu_size)[:-1]])
+    items = int(menu_size.sum())
+    item_restaurant = np.repeat(np.arange(n), menu_size)
+    item_cuisine = cuisine[item_restaurant]
+    dish_index = rng.integers(len(DISH_CATEGORIES), size=items)
+    dish = np.array(list(CUISINES.values()), dtype=object)[item_cuisine, dish_index]
+    price_cents = rng.integers(80, 900, size=items) * 5
+    preparation_time = rng.integers(5, 40, size=items)
+    vegetarian = rng.random(items) < 0.35
+    columns[MenuItem] = {
+        "id": np.arange(1, items + 1),
+        "name": _pick(STYLES, rng.integers(len(STYLES), size=items)) + " " + dish,
+        "description": dish + " " + _pick(DESCRIPTIONS, rng.integers(len(DESCRIPTIONS), size=items)),
+        "price": price_cents / 100,
+        "category": _pick(DISH_CATEGORIES, dish_index),
+        "is_vegetarian": vegetarian,
+        "is_vegan": vegetarian & (rng.random(items) < 0.3),
+        "is_available": rng.random(items) < 0.95,
+        "preparation_time": preparation_time,
+        "restaurant_id": item_restaurant + 1,
+        "created_at": np.full(items, created),
+        "updated_at": np.full(items, created),
+    }
+
+    # Customers: a Zipfian few order most of the time
+    m = config.customers
+    customer_city = rng.integers(cities, size=m)
+    first = rng.integers(len(FIRST_NAMES), size=m)
+    last = rng.integers(len(LAST_NAMES), size=m)
+    customer_address = (
+        rng.integers(1, 999, size=m).astype(str).astype(object) + " "
+        + _pick(STREETS, rng.integers(len(STREETS), size=m)) + ", " + _pick(city_names, customer_city)
+    )
+    coordinates = centres[customer_city] + rng.normal(0, CITY_RADIUS_DEGREES, size=(m, 2))
+    columns[Customer] = {
+        "id": np.arange(1, m + 1),
+        "name": _pick(FIRST_NAMES, first) + " " + _pick(LAST_NAMES, last),
+        "email": [
+            f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{c + 1}@example.com"
+            for c, (f, l) in enumerate(zip(first.tolist(), last.tolist()))
+        ],
+        "phone_number": [f"+9190{c:08d}" for c in range(m)],
+        "address": customer_address,
+        "latitude": coordinates[:, 0],
+        "longitude": coordinates[:, 1],
+        "is_active": np.ones(m, dtype=bool),
+        "created_at": np.full(m, created),
+        "updated_at": np.full(m, created),
+    }
+
+    catalog = _Catalog(
+        opening=opening, closing=closing, quality=quality,
+        city_restaurants=city_restaurants, menu_start=menu_start, menu_size=menu_size,
+        item_weights=_zipf_cumulative(config.max_menu_size, config.zipf),
+        price_cents=price_cents, preparation_time=preparation_time,
+        customer_city=customer_city, customer_by_popularity=rng.permutation(m),
+        customer_weights=_zipf_cumulative(m, CUSTOMER_ZIPF), customer_address=customer_address,
+    )
+    return catalog, columns
+
+def _orders_per_day(config: SeedConfig) -> np.ndarray:
+    rng = np.random.default_rng([config.seed, 1])
+    start = config.end - timedelta(days=config.days)
+    weights = np.array([
+        WEEKDAY_WEIGHTS[(start + timedelta(days=day)).weekday()] * (1 + (config.growth - 1) * day / max(config.days - 1, 1))
+        for day in range(config.days)
+    ])
+    return rng.multinomial(config.orders, weights / weights.sum())
+
+def _day(catalog: _Catalog, config: SeedConfig, day: int, count: int, ids: Dict[Any, int]) -> Dict[Any, Columns]:
+    """Orders, order lines and reviews of one day; `ids` holds the next id per model and is advanced."""
+    rng = np.random.default_rng([config.seed, 2, day])
+    midnight = np.datetime64(config.end - timedelta(days=config.days - day), "s")
+
+    customers = catalog.customer_by_popularity[_draw(catalog.customer_weights, rng, count)]
+    cities = catalog.customer_city[customers]
+    restaurants = np.empty(count, dtype=np.int64)
+    for city, (members, weights) in enumerate(catalog.city_restaurants):
+        mask = cities == city
+        restaurants[mask] = members[_draw(weights, rng, int(mask.sum()))]
+
+    # Lunch and dinner peaks, the rest spread over the opening hours
+    opens, closes = catalog.opening[restaurants], np.minimum(catalog.closing[restaurants], 24 * 60)
+    peak = rng.random(count)
+    minute = np.where(
+        peak < 0.45, rng.normal(12.75 * 60, 55, count),
+        np.where(peak < 0.9, rng.normal(20 * 60, 80, count), rng.uniform(opens, closes))
+    )
+    seconds = np.clip(minute, opens, closes - 1).astype(np.int64) * 60 + rng.integers(60, size=count)
+    chronological = np.argsort(seconds, kind="stable")
+    customers, restaurants, seconds = customers[chronological], restaurants[chronological], seconds[chronological]
+
+    # Lines: dishes drawn from the restaurant's menu by popularity, repeats merged into the quantity
+    lines = np.minimum(1 + rng.poisson(1.2, count), MAX_ORDER_LINES)
+    line_order = np.repeat(np.arange(count), lines)
+    line_restaurant = restaurants[line_order]
+    limits = catalog.item_weights[catalog.menu_size[line_restaurant] - 1]
+    positions = np.searchsorted(catalog.item_weights, rng.random(len(line_order)) * limits, side="right")
+    items = catalog.menu_start[line_restaurant] + positions
+    quantity = 1 + (rng.random(len(items)) < 0.2) + (rng.random(len(items)) < 0.05)
+    total_items = len(catalog.price_cents)
+    keys, inverse = np.unique(line_order * total_items + items, return_inverse=True)
+    quantity = np.bincount(inverse, weights=quantity).astype(np.int64)
+    line_order, items = keys // total_items, keys % total_items
+
+    total_cents = np.bincount(line_order, weights=quantity * catalog.price_cents[items], minlength=count).astype(np.int64)
+    first_line = np.searchsorted(line_order, np.arange(count))
+    kitchen_seconds = np.maximum.reduceat(catalog.preparation_time[items], first_line) * 60
+    delivered = rng.random(count) >= CANCEL_RATE
+    delivery_seconds = seconds + kitchen_seconds + rng.integers(10 * 60, 45 * 60, size=count)
+    instructions = np.where(rng.random(count) < INSTRUCTION_RATE, rng.integers(len(INSTRUCTIONS), size=count), -1)
+
+    reviewed = np.flatnonzero(delivered & (rng.random(count) < config.review_rate))
+    ratings = np.clip(np.rint(rng.normal(catalog.quality[restaurants[reviewed]], 0.9)), 1, 5).astype(np.int64)
+    review_seconds = delivery_seconds[reviewed] + rng.exponential(3 * 3600, size=len(reviewed)).astype(np.int64)
+    comment_lists = [COMMENTS[rating] for rating in sorted(COMMENTS)]
+    comment_table = np.array([[comments[k % len(comments)] for k in range(6)] for comments in comment_lists], dtype=object)
+    comment_choice = (rng.random(len(reviewed)) * np.array([len(c) for c in comment_lists])[ratings - 1]).astype(np.int64)
+
+    order_ids = np.arange(ids[Order], ids[Order] + count)
+    columns = {
+        Order: {
+            "id": order_ids,
+            "customer_id": customers + 1,
+            "restaurant_id": restaurants + 1,
+            "order_status": _pick([OrderStatus.cancelled, OrderStatus.delivered], delivered.astype(np.int64)),
+            "total_amount": total_cents / 100,
+            "delivery_address": catalog.customer_address[customers],
+            "special_instructions": _pick(INSTRUCTIONS + [None], instructions),
+            "order_date": midnight + seconds.astype("timedelta64[s]"),
+            "delivery_time": np.where(delivered, midnight + delivery_seconds.astype("timedelta64[s]"), np.datetime64("NaT")),
+        },
+        OrderItem: {
+            "id": np.arange(ids[OrderItem], ids[OrderItem] + len(items)),
+            "order_id": order_ids[line_order],
+            "menu_item_id": items + 1,
+            "quantity": quantity,
+            "item_price": catalog.price_cents[items] / 100,
+        },
+        Review: {
+            "id": np.arange(ids[Review], ids[Review] + len(reviewed)),
+            "customer_id": customers[reviewed] + 1,
+            "restaurant_id": restaurants[reviewed] + 1,
+            "order_id": order_ids[reviewed],
+            "rating": ratings,
+            "comment": comment_table[ratings - 1, comment_choice],
+            "created_at": midnight + review_seconds.astype("timedelta64[s]"),
+        },
+    }
+    ids[Order] += count
+    ids[OrderItem] += len(items)
+    ids[Review] += len(reviewed)
+    return columns
+
+def _bind_values(dialect, column, values) -> List[Any]:
+    """A column's values as the DB-API driver takes them."""
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M" and dialect.name == "sqlite":
+        # Formatted by numpy in SQLAlchemy's SQLite storage format, rather than one datetime at a time
+        text_values = np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").astype(object)
+        text_values[np.isnat(values)] = None
+        return text_values.tolist()
+    if isinstance(values, np.ndarray):
+        # Python scalars; timestamps become datetimes and NaT None
+        values = values.astype(object).tolist() if values.dtype.kind == "M" else values.tolist()
+    process = column.type.dialect_impl(dialect).bind_processor(dialect)
+    return values if process is None else [process(value) for value in values]
+
+def _statement(dialect, model, columns: Columns) -> Tuple[str, List[Any]]:
+    """
+    A Core INSERT of `model` and its executemany parameters, converted a column at
+    a time instead of per row by the statement's own parameter processing.
+    """
+    table = model.__table__
+    compiled = insert(table).compile(dialect=dialect, column_keys=list(columns))
+    values = {name: _bind_values(dialect, table.c[name], column) for name, column in columns.items()}
+    size = len(next(iter(values.values())))
+    for name in compiled.binds:
+        if name not in values:
+            # A column left to its Python-side default, which the compiled statement still binds
+            values[name] = _bind_values(dialect, table.c[name], [table.c[name].default.arg] * size)
+    if compiled.positional:
+        return compiled.string, list(zip(*(values[name] for name in compiled.positiontup)))
+    return compiled.string, [dict(zip(values, row)) for row in zip(*values.values())]
+
+async def _write(engine: AsyncEngine, statements: List[Tuple[str, List[Any]]], batch_size: int):
+    for statement, rows in statements:
+        for start in range(0, len(rows), batch_size):
+            # One transaction per batch keeps the SQLite WAL small
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(statement, rows[start:start + batch_size])
+
+def _order_statements(dialect, catalog: _Catalog, config: SeedConfig, days: List[Tuple[int, int]], ids: Dict[Any, int]):
+    parts = [_day(catalog, config, day, count, ids) for day, count in days]
+    return [
+        _statement(dialect, model, {name: np.concatenate([part[model][name] for part in parts]) for name in parts[0][model]})
+        for model in parts[0]
+    ]
+
+def _batches(config: SeedConfig) -> List[List[Tuple[int, int]]]:
+    """Consecutive (day, orders) runs of at least batch_size orders."""
+    batches, batch, size = [], [], 0
+    for day, count in enumerate(_orders_per_day(config).tolist()):
+        if count:
+            batch.append((day, count))
+            size += count
+        if size >= config.batch_size:
+            batches.append(batch)
+            batch, size = [], 0
+    return batches + [batch] if batch else batches
+
+async def seed_database(engine: AsyncEngine, config: SeedConfig, progress: Callable[[str], None] = print) -> Dict[str, int]:
+    """Fill an empty, migrated database; the number of rows written per table."""
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        for model in (Restaurant, Customer, Order):
+            if (await db.execute(select(model.id).limit(1))).first() is not None:
+                raise ValueError(f"{model.__tablename__} is not empty; seed a fresh database")
+
+    counts: Dict[str, int] = {}
+    catalog, columns = _catalog(config)
+    for model, model_columns in columns.items():
+        await _write(engine, [_statement(engine.dialect, model, model_columns)], config.batch_size)
+        counts[model.__tablename__] = len(model_columns["id"])
+
+    # Indexes are built once from the loaded rows instead of row by row
+    indexes = [index for model in (Order, OrderItem, Review) for index in model.__table__.indexes]
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(index.drop)
+
+    # Each batch is generated and converted in a thread while the previous one is written
+    ids = {Order: 1, OrderItem: 1, Review: 1}
+    writing, written = None, 0
+    for days in _batches(config):
+        statements = await asyncio.to_thread(_order_statements, engine.dialect, catalog, config, days, ids)
+        if writing is not None:
+            await writing
+            progress(f"{written:,} orders")
+        writing = asyncio.create_task(_write(engine, statements, config.batch_size))
+        written = ids[Order] - 1
+    if writing is not None:
+        await writing
+        progress(f"{written:,} orders")
+    counts.update({model.__tablename__: next_id - 1 for model, next_id in ids.items()})
+
+    progress("Building indexes")
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(index.create)
+        if engine.dialect.name == "postgresql":
+            for table, count in counts.items():
+                await conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), {max(count, 1)})"))
+
+    # Derived data, through the same rebuilds as api.utils.maintenance
+    progress("Rebuilding ratings, rollups, open windows and search indexes")
+    async with session_factory() as db:
+        await review_crud.recompute_restaurant_ratings(db)
+        await analytics_crud.rebuild_rollups(db)
+        await restaurant_crud.rebuild_open_windows(db)
+        for kind in search.SEARCHES:
+            await search.rebuild(db, kind)
+        await db.commit()
+    return counts
+
+async def main(config: SeedConfig) -> None:
+    # A crash half way leaves a database to throw away anyway, so skip the syncs;
+    # the large page cache keeps the indexes of the growing tables in memory
+    engine = create_engine_from_settings(replace(settings, sqlite_synchronous="OFF", sqlite_cache_size_kib=512 * 1024))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade_database)
+        start = time.perf_counter()
+
+        def progress(status: str):
+            print(f"\r{time.perf_counter() - start:6.0f} s  {status:<60}", end="", flush=True)
+
+        counts = await seed_database(engine, config, progress)
+        print(f"\nSeeded in {time.perf_counter() - start:,.1f} s: " + ", ".join(f"{count:,} {table}" for table, count in counts.items()))
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    defaults = SeedConfig()
+    parser.add_argument("--restaurants", type=int, default=defaults.restaurants)
+    parser.add_argument("--customers", type=int, default=defaults.customers)
+    parser.add_argument("--orders", type=int, default=defaults.orders)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--end", type=date.fromisoformat, default=defaults.end, help="Day after the last order, YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--zipf", type=float, default=defaults.zipf, help="Popularity skew of restaurants and dishes")
+    parser.add_argument("--review-rate", type=float, default=defaults.review_rate)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    args = parser.parse_args()
+    config = replace(defaults, **{name: value for name, value in vars(args).items()})
+    if config.restaurants < 1 or config.customers < 1:
+        parser.error("--restaurants and --customers must be positive")
+    try:
+        asyncio.run(main(config))
+    except ValueError as error:
+        parser.error(str(error))
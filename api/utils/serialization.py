@@ -0,0 +1,56 @@
+import enum
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Fast path for large list responses: routes select plain columns, get dicts back
+# from `build_page(..., as_dicts=True)` and return them through `fast_response`.
+# With FAST_JSON_RESPONSES on, that is a FastJSONResponse, which skips FastAPI's
+# response_model validation; the output matches what the response_model would
+# produce, so the stored data must already satisfy the schema. Off (the default),
+# FastAPI validates the dicts against the response_model as usual.
+
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "").lower() in ("1", "true", "yes", "on")
+
+def schema_columns(schema: Type[BaseModel], model) -> List[Any]:
+    """The model columns behind `schema`'s fields, in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _default(value: Any) -> Any:
+    # Rendered the way pydantic renders them in JSON mode
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        if value.tzinfo is not None and value.utcoffset() == timedelta(0):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def fast_response(content: Any) -> Any:
+    """What a list route returns: `content` encoded as is with FAST_JSON_RESPONSES, else for its response_model."""
+    return FastJSONResponse(content) if FAST_JSON_RESPONSES else content
@@ -0,0 +1,50 @@
+"""
+Menu onboarding: one create_menu_item call per item versus a single
+bulk_upsert_menu_items call, for a fresh import and for a re-import that
+updates every item.
+
+    python -m benchmarks.bulk_menu_import [--items 5000] [--single-items 500]
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from api.crud.menu_item import bulk_upsert_menu_items, create_menu_item
+from api.schemas.menu_item import MenuItemCreate
+from benchmarks.common import seed_restaurant, temporary_database
+
+
+def make_items(count: int, price: str):
+    return [
+        MenuItemCreate(name=f"Import Item {i}", price=Decimal(price), category="Main Course", preparation_time=10 + i % 20)
+        for i in range(count)
+    ]
+
+
+async def run(items: int, single_items: int):
+    async with temporary_database() as session_factory:
+        restaurant_id, _, _ = await seed_restaurant(session_factory, menu_size=0, index=0)
+        start = time.perf_counter()
+        async with session_factory() as db:
+            for item in make_items(single_items, "9.99"):
+                await create_menu_item(db, restaurant_id, item)
+        elapsed = time.perf_counter() - start
+        print(f"one call per item  {single_items:>6} items  {elapsed:7.3f} s  ({single_items / elapsed:9,.0f} items/s)")
+
+        restaurant_id, _, _ = await seed_restaurant(session_factory, menu_size=0, index=1)
+        for label, price in (("bulk insert", "9.99"), ("bulk update", "10.49")):
+            payload = make_items(items, price)
+            start = time.perf_counter()
+            async with session_factory() as db:
+                created, updated = await bulk_upsert_menu_items(db, restaurant_id, payload)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<18} {items:>6} items  {elapsed:7.3f} s  ({items / elapsed:9,.0f} items/s)  created {created} updated {updated}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--single-items", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.single_items))
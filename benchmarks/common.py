@@ -0,0 +1,101 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from datetime import time as dtime
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics, job
+from api.db.database import Base, DatabaseSettings, create_engine_from_settings
+from api.models.customer import Customer
+from api.models.menu_item import MenuItem
+from api.models.restaurant import Restaurant
+
+
+@asynccontextmanager
+async def temporary_read_write_database(settings: DatabaseSettings = None):
+    """Yield (write, read) session factories for a throwaway SQLite file with all tables created."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        settings = replace(settings or DatabaseSettings(), database_url=url)
+        engine = create_engine_from_settings(settings)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        read_engine = create_engine_from_settings(settings, read_only=True)
+        try:
+            yield (
+                async_sessionmaker(engine, expire_on_commit=False),
+                async_sessionmaker(read_engine, expire_on_commit=False),
+            )
+        finally:
+            await read_engine.dispose()
+            await engine.dispose()
+
+
+@asynccontextmanager
+async def temporary_database(settings: DatabaseSettings = None):
+    """Yield a session factory bound to a throwaway SQLite file with all tables created."""
+    async with temporary_read_write_database(settings) as (session_factory, _):
+        yield session_factory
+
+
+async def seed_restaurant(session_factory, menu_size: int = 50, index: int = 0):
+    """Create one restaurant, one customer and `menu_size` available menu items."""
+    async with session_factory() as db:
+        restaurant = Restaurant(
+            name=f"Bench Restaurant {index}",
+            cuisine_type="Indian",
+            address="1 Benchmark Street",
+            phone_number=f"+91000000{index:04d}",
+            opening_time=dtime(9, 0),
+            closing_time=dtime(23, 0),
+        )
+        customer = Customer(
+            name=f"Bench Customer {index}",
+            email=f"bench{index}@example.com",
+            phone_number=f"+91999999{index:04d}",
+            address="2 Benchmark Avenue",
+        )
+        db.add_all([restaurant, customer])
+        await db.flush()
+        items = [
+            MenuItem(
+                name=f"Item {i}",
+                price=Decimal("9.99"),
+                category="Main Course",
+                preparation_time=10 + i % 20,
+                restaurant_id=restaurant.id,
+            )
+            for i in range(menu_size)
+        ]
+        db.add_all(items)
+        await db.commit()
+        return restaurant.id, customer.id, [item.id for item in items]
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples) -> str:
+    """Format latency samples (seconds) as mean / p50 / p99 in milliseconds."""
+    return "mean {:7.2f} ms  p50 {:7.2f} ms  p99 {:7.2f} ms".format(
+        statistics.mean(samples) * 1000,
+        percentile(samples, 50) * 1000,
+        percentile(samples, 99) * 1000,
+    )
+
+
+async def timed(coro_factory, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,100 @@
+"""
+Mixed read/write throughput with the default and tuned engine configuration.
+
+"default" reproduces the previous engine: echo on, SQLite's own
+journal/synchronous/cache settings and every query on one pool. "tuned" is
+DatabaseSettings() as shipped: WAL, synchronous=NORMAL, busy_timeout, mmap,
+a larger page cache, BEGIN IMMEDIATE writes and reads on the read-only pool.
+
+    python -m benchmarks.engine_config [--operations 2000] [--concurrency 16] [--write-ratio 0.2]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import time
+
+from sqlalchemy.exc import OperationalError
+from api.crud.menu_item import get_restaurant_menu_items
+from api.crud.order import place_order
+from api.crud.restaurant import get_restaurant_with_menu
+from api.db.database import DatabaseSettings
+from api.schemas.order import OrderCreate
+from benchmarks.common import seed_restaurant, summarize, temporary_read_write_database
+
+# label -> (settings, whether reads use the read-only pool)
+CONFIGURATIONS = {
+    "default": (DatabaseSettings(
+        database_echo=True,
+        sqlite_journal_mode=None,
+        sqlite_synchronous=None,
+        sqlite_busy_timeout_ms=None,
+        sqlite_mmap_size=None,
+        sqlite_cache_size_kib=None,
+        sqlite_begin_immediate=False,
+    ), False),
+    "tuned": (DatabaseSettings(), True),
+}
+
+
+async def run_configuration(settings: DatabaseSettings, split_reads: bool, operations: int, concurrency: int, write_ratio: float):
+    async with temporary_read_write_database(settings) as (session_factory, read_factory):
+        read_factory = read_factory if split_reads else session_factory
+        seeded = [await seed_restaurant(session_factory, menu_size=30, index=i) for i in range(10)]
+        rng = random.Random(42)
+        plan = [rng.random() < write_ratio for _ in range(operations)]
+        reads, writes, errors = [], [], []
+        queue = asyncio.Queue()
+        for is_write in plan:
+            queue.put_nowait(is_write)
+
+        async def operation(db, is_write, restaurant_id, customer_id, item_ids):
+            if is_write:
+                await place_order(db, customer_id, OrderCreate(
+                    restaurant_id=restaurant_id,
+                    delivery_address="2 Benchmark Avenue",
+                    items=[{"menu_item_id": item_id, "quantity": 1} for item_id in rng.sample(item_ids, 3)],
+                ))
+            elif rng.random() < 0.5:
+                await get_restaurant_with_menu(db, restaurant_id)
+            else:
+                await get_restaurant_menu_items(db, restaurant_id)
+
+        async def worker():
+            while not queue.empty():
+                is_write = queue.get_nowait()
+                restaurant_id, customer_id, item_ids = rng.choice(seeded)
+                start = time.perf_counter()
+                try:
+                    async with (session_factory if is_write else read_factory)() as db:
+                        await operation(db, is_write, restaurant_id, customer_id, item_ids)
+                except OperationalError as e:
+                    # "database is locked" when a reader cannot upgrade to a writer
+                    errors.append(str(e.orig))
+                    continue
+                (writes if is_write else reads).append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return len(reads + writes) / elapsed, reads, writes, errors
+
+
+async def run(operations: int, concurrency: int, write_ratio: float):
+    for label, (settings, split_reads) in CONFIGURATIONS.items():
+        # echo=True logs to stdout; discard it so only its cost is measured
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            throughput, reads, writes, errors = await run_configuration(settings, split_reads, operations, concurrency, write_ratio)
+        print(f"{label:<8} {throughput:8.1f} ops/s  ({len(errors)} failed with lock errors)")
+        print(f"         reads  {summarize(reads)}")
+        print(f"         writes {summarize(writes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(args.operations, args.concurrency, args.write_ratio))
@@ -0,0 +1,91 @@
+"""
+Cost of the delivery ETA engine's kitchen queue.
+
+Seeds a restaurant with `--history` finished orders and `--open` open ones,
+then times an ETA estimate and a status change rescheduling the queue from the
+in-memory model, against reloading the queue from the database every time
+(what a stateless implementation would do).
+
+    python -m benchmarks.eta [--history 100000] [--open 200] [--repeat 200]
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from api.models.order import Order, OrderStatus
+from api.models.order_item import OrderItem
+from api.utils.eta import eta_engine
+from benchmarks.common import seed_restaurant, temporary_database
+
+BATCH = 20_000
+
+
+async def seed_orders(session_factory, restaurant_id: int, customer_id: int, item_ids, history: int, open_orders: int):
+    statuses = [OrderStatus.delivered] * history + [OrderStatus.placed, OrderStatus.confirmed, OrderStatus.preparing] * (open_orders // 3)
+    async with session_factory() as db:
+        for start in range(0, len(statuses), BATCH):
+            batch = range(start, min(start + BATCH, len(statuses)))
+            await db.execute(insert(Order), [
+                {"id": i + 1, "customer_id": customer_id, "restaurant_id": restaurant_id, "order_status": statuses[i],
+                 "total_amount": Decimal("9.99"), "delivery_address": "2 Benchmark Avenue"}
+                for i in batch
+            ])
+            await db.execute(insert(OrderItem), [
+                {"order_id": i + 1, "menu_item_id": item_ids[(i + line) % len(item_ids)], "quantity": 1, "item_price": Decimal("9.99")}
+                for i in batch for line in range(3)
+            ])
+        await db.commit()
+    return len(statuses) - len(statuses) % 3
+
+
+async def measure(factory, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await factory()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def run(history: int, open_orders: int, repeat: int):
+    async with temporary_database() as session_factory:
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, menu_size=30)
+        last_id = await seed_orders(session_factory, restaurant_id, customer_id, item_ids, history, open_orders)
+        # A waiting order near the back of the queue flipping between placed and confirmed:
+        # the queue is rescheduled each time, but (after the first) no estimate moves
+        moved = [SimpleNamespace(id=last_id - 2, restaurant_id=restaurant_id)]
+        flips = itertools.count()
+
+        async with session_factory() as db:
+            async def reschedule():
+                status = OrderStatus.confirmed if next(flips) % 2 else OrderStatus.placed
+                await eta_engine.record_status_changes(db, moved, status)
+                await db.commit()
+
+            async def cold(factory):
+                eta_engine.forget(restaurant_id)
+                return await factory()
+
+            estimate = lambda: eta_engine.estimate(db, restaurant_id, 20)
+            rows = [
+                ("estimate for a new order", await measure(estimate, repeat), await measure(lambda: cold(estimate), repeat)),
+                ("reschedule on status change", await measure(reschedule, repeat), await measure(lambda: cold(reschedule), repeat)),
+            ]
+        print(f"{history:,} past orders, {open_orders:,} open")
+        for label, warm, reload in rows:
+            print(f"{label:<28} in-memory queue p50 {warm:7.3f} ms   reload every time p50 {reload:7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", type=int, default=100_000)
+    parser.add_argument("--open", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.history, args.open, args.repeat))
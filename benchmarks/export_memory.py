@@ -0,0 +1,137 @@
+"""
+Peak RSS while streaming a restaurant's order history through the export
+encoder, for growing history sizes. A flat peak means memory use does not
+depend on the number of orders exported.
+
+RSS is sampled after every chunk and reported relative to the RSS just before
+the export started. Each export runs in a fresh interpreter, whose heap has no
+memory freed by the seeding for it to reuse unseen. SQLite's mmap is disabled
+and its page cache kept small so database pages do not show up as resident
+memory either.
+
+    python -m benchmarks.export_memory [--sizes 10000 100000 1000000] [--no-items]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.crud.order import EXPORT_ITEM_COLUMNS, stream_restaurant_orders
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.models.order import Order
+from api.models.order_item import OrderItem
+from api.schemas.order import OrderRead
+from api.utils.export import csv_stream, ndjson_stream
+from benchmarks.common import seed_restaurant, temporary_database
+
+SETTINGS = DatabaseSettings(sqlite_mmap_size=0, sqlite_cache_size_kib=1024)
+SEED_BATCH = 10_000
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE
+
+
+async def top_up_orders(session_factory, restaurant_id: int, customer_id: int, item_id: int, target: int):
+    """Insert orders (one line each) until the restaurant has `target` of them."""
+    async with session_factory() as db:
+        existing = (await db.execute(select(func.count(Order.id)))).scalar()
+        start = datetime(2020, 1, 1)
+        for offset in range(existing, target, SEED_BATCH):
+            count = min(SEED_BATCH, target - offset)
+            first_id = offset + 1
+            await db.execute(insert(Order), [
+                {
+                    "id": first_id + i,
+                    "customer_id": customer_id,
+                    "restaurant_id": restaurant_id,
+                    "total_amount": Decimal("19.98"),
+                    "delivery_address": "2 Benchmark Avenue",
+                    "order_date": start + timedelta(seconds=offset + i),
+                }
+                for i in range(count)
+            ])
+            await db.execute(insert(OrderItem), [
+                {"order_id": first_id + i, "menu_item_id": item_id, "quantity": 2, "item_price": Decimal("9.99")}
+                for i in range(count)
+            ])
+            await db.commit()
+
+
+async def measure(session_factory, restaurant_id: int, fmt: str, include_items: bool):
+    async def chunks():
+        async with session_factory() as db:
+            async for rows in stream_restaurant_orders(db, restaurant_id, include_items=include_items):
+                yield rows
+
+    if fmt == "csv":
+        item_columns = [column.key for column in EXPORT_ITEM_COLUMNS] if include_items else ()
+        body = csv_stream(chunks(), list(OrderRead.model_fields), item_columns)
+    else:
+        body = ndjson_stream(chunks())
+
+    baseline = peak = rss_bytes()
+    written = 0
+    start = time.perf_counter()
+    async for block in body:
+        written += len(block)
+        peak = max(peak, rss_bytes())
+    return peak - baseline, written, time.perf_counter() - start
+
+
+async def export_once(database_url: str, restaurant_id: int, fmt: str, include_items: bool):
+    engine = create_engine_from_settings(replace(SETTINGS, database_url=database_url))
+    try:
+        delta, written, elapsed = await measure(async_sessionmaker(engine, expire_on_commit=False), restaurant_id, fmt, include_items)
+    finally:
+        await engine.dispose()
+    print(delta, written, elapsed)
+
+
+def measure_in_fresh_process(session_factory, restaurant_id: int, fmt: str, include_items: bool):
+    """`measure` run by a new interpreter on the database behind `session_factory`."""
+    database_url = session_factory.kw["bind"].url.render_as_string(hide_password=False)
+    command = [sys.executable, "-m", "benchmarks.export_memory", "--export", database_url,
+               "--restaurant", str(restaurant_id), "--format", fmt]
+    if not include_items:
+        command.append("--no-items")
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    delta, written, elapsed = output.split()
+    return int(delta), int(written), float(elapsed)
+
+
+async def run(sizes, include_items: bool):
+    async with temporary_database(SETTINGS) as session_factory:
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, menu_size=1)
+        print(f"{'orders':>10} {'format':<7} {'peak RSS delta':>15} {'output':>10} {'seconds':>8}")
+        for size in sorted(sizes):
+            await top_up_orders(session_factory, restaurant_id, customer_id, item_ids[0], size)
+            for fmt in ("ndjson", "csv"):
+                delta, written, elapsed = measure_in_fresh_process(session_factory, restaurant_id, fmt, include_items)
+                print(f"{size:>10,} {fmt:<7} {delta / 2**20:>12.1f} MiB {written / 2**20:>6.0f} MiB {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--no-items", action="store_true", help="Export orders without their item lines")
+    parser.add_argument("--export", metavar="DATABASE_URL", help=argparse.SUPPRESS)
+    parser.add_argument("--restaurant", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--format", choices=["ndjson", "csv"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.export:
+        # One measurement for measure_in_fresh_process
+        asyncio.run(export_once(args.export, args.restaurant, args.format, not args.no_items))
+    else:
+        asyncio.run(run(args.sizes, not args.no_items))
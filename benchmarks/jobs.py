@@ -0,0 +1,84 @@
+"""
+Write latency with side effects deferred to the background job queue.
+
+Times `place_order` and `add_review` returning once their own transaction has
+committed (the rollup and rating updates left to the workers) against the same
+call followed by running its jobs, which is what the client used to wait for.
+Then measures how fast one worker drains a backlog of those jobs.
+
+    python -m benchmarks.jobs [--repeat 300]
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+
+from api.crud.order import place_order
+from api.crud.review import add_review
+from api.external_services.jobs import JobPool
+from api.models.job import Job
+from api.models.order import Order, OrderStatus
+from api.schemas.order import OrderCreate
+from api.schemas.review import ReviewCreate
+from benchmarks.common import seed_restaurant, summarize, temporary_database, timed
+
+
+async def delivered_orders(session_factory, restaurant_id: int, customer_id: int, count: int):
+    async with session_factory() as db:
+        result = await db.execute(
+            insert(Order).returning(Order.id),
+            [{"customer_id": customer_id, "restaurant_id": restaurant_id, "order_status": OrderStatus.delivered,
+              "total_amount": Decimal("9.99"), "delivery_address": "2 Benchmark Avenue"} for _ in range(count)]
+        )
+        ids = result.scalars().all()
+        await db.commit()
+    return iter(ids)
+
+
+async def run(repeat: int):
+    async with temporary_database() as session_factory:
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, menu_size=10)
+        pool = JobPool(workers=0)
+        pool.session_factory = session_factory
+        data = OrderCreate(
+            restaurant_id=restaurant_id,
+            delivery_address="2 Benchmark Avenue",
+            items=[{"menu_item_id": item_id, "quantity": 1} for item_id in item_ids[:3]],
+        )
+        review = ReviewCreate(rating=4, comment="Benchmark")
+        reviewable = await delivered_orders(session_factory, restaurant_id, customer_id, repeat * 4)
+
+        async def order():
+            async with session_factory() as db:
+                await place_order(db, customer_id, data)
+
+        async def review_order():
+            async with session_factory() as db:
+                await add_review(db, next(reviewable), review)
+
+        async def with_jobs(write):
+            await write()
+            await pool.run_due()
+
+        print(f"{'write':<16}  {'side effects':<14}  latency")
+        # Deferred runs last, so the in-request runs never drain their backlog
+        for mode in ("in request", "background"):
+            for label, write in (("POST order", order), ("POST review", review_order)):
+                factory = (lambda: with_jobs(write)) if mode == "in request" else write
+                print(f"{label:<16}  {mode:<14}  {summarize(await timed(factory, repeat))}")
+
+        async with session_factory() as db:
+            backlog = (await db.execute(select(func.count()).select_from(Job))).scalar()
+        start = time.perf_counter()
+        drained = await pool.run_due()
+        elapsed = time.perf_counter() - start
+        print(f"one worker drained {drained:,} of {backlog:,} queued jobs at {drained / elapsed:,.0f} jobs/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.repeat))
@@ -0,0 +1,387 @@
+"""
+HTTP load test and request log replay with per-route latency percentiles.
+
+Targets the app in-process through httpx's ASGI transport (the default), a
+uvicorn server started on a free local port (--serve), or any running server
+(--url). In the first two cases the app gets a throwaway database.
+
+Traffic is either
+  mixed   (default) --users virtual users, after restaurants, menus and
+          customers are seeded through the API: browsing and searching menus,
+          placing orders, moving them through the kitchen statuses and reviewing
+          them, for --duration seconds or --requests requests
+  replay  the requests of a JSONL log (--log), one per line, shared out between
+          --users concurrent senders in log order:
+              {"method": "PUT", "path": "/orders/12/status", "json": {"status": "confirmed"}}
+          The same seed data is created first; --record writes a mixed run's
+          requests in this format.
+
+Reports throughput and latency p50/p95/p99 per route template and, in-process,
+the SQL statements per request, as a table and as JSON (--output) to diff runs
+between releases; --baseline prints the p95 change per route against an
+earlier --output file.
+
+    python -m benchmarks.loadtest [--users 20] [--duration 30] [--output run.json]
+    python -m benchmarks.loadtest --log run.jsonl --users 8 --baseline run.json
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp.name, 'loadtest.db')}"
+
+import httpx
+from sqlalchemy import event
+
+from api.db.database import engine, read_engine
+from api.main import app
+from benchmarks.common import percentile
+
+CUISINES = ["Indian", "Italian", "Chinese", "Mexican", "Thai"]
+CATEGORIES = ["Appetizer", "Main Course", "Dessert", "Beverage"]
+DISHES = ["Paneer Tikka", "Margherita Pizza", "Kung Pao Chicken", "Tacos", "Green Curry", "Biryani",
+          "Tiramisu", "Mango Lassi", "Spring Rolls", "Pad Thai", "Dal Makhani", "Lasagna"]
+SEARCH_TERMS = ["pizza", "curry", "paneer", "tacos", "lassi", "rolls", "biryani"]
+NEXT_STATUS = {"placed": "confirmed", "confirmed": "preparing", "preparing": "out_for_delivery", "out_for_delivery": "delivered"}
+
+# Virtual user actions and their weights
+ACTIONS = {
+    "browse restaurants": 15,
+    "view menu": 25,
+    "search menu": 10,
+    "open now": 5,
+    "order history": 5,
+    "place order": 15,
+    "advance order": 20,
+    "review order": 5,
+}
+
+# Route template of the request being sent, for attributing SQL statements
+_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("loadtest_route", default=None)
+BACKGROUND = "(background)"
+
+
+class RouteMatcher:
+    """Maps request paths to the route templates of the OpenAPI schema."""
+
+    def __init__(self, openapi: dict):
+        self.routes = []
+        for template, operations in openapi["paths"].items():
+            pattern = re.compile("^" + re.sub(r"\\{[^/]+?\\}", "[^/]+", re.escape(template)) + "/?$")
+            for method in operations:
+                self.routes.append((method.upper(), template.count("{"), pattern, template))
+        # Literal segments win over parameters: /orders/status before /orders/{order_id}
+        self.routes.sort(key=lambda route: (route[1], -len(route[3])))
+
+    def __call__(self, method: str, path: str) -> str:
+        path = path.split("?", 1)[0]
+        for route_method, _, pattern, template in self.routes:
+            if route_method == method and pattern.match(path):
+                return f"{method} {template}"
+        return f"{method} (unmatched)"
+
+
+class Recorder:
+    def __init__(self, match: RouteMatcher, log=None):
+        self.match = match
+        self.log = log
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.statements: Dict[str, int] = defaultdict(int)
+        self.requests = 0
+        self.started = self.finished = 0.0
+
+    def count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("BEGIN", "PRAGMA", "COMMIT", "ROLLBACK")):
+            self.statements[_route.get() or BACKGROUND] += 1
+
+    async def send(self, client: httpx.AsyncClient, method: str, path: str, body=None) -> Optional[httpx.Response]:
+        route = self.match(method, path)
+        token = _route.set(route)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            outcome = f"{response.status_code // 100}xx"
+        except httpx.HTTPError as error:
+            response, outcome = None, type(error).__name__
+        finally:
+            _route.reset(token)
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][outcome] += 1
+        self.requests += 1
+        if self.log is not None:
+            self.log.write(json.dumps({"method": method, "path": path, "json": body}) + "\n")
+        return response
+
+    def report(self, config: dict) -> dict:
+        elapsed = self.finished - self.started
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            statuses = self.statuses[route]
+            routes[route] = {
+                "requests": len(samples),
+                "errors": sum(count for outcome, count in statuses.items() if outcome != "2xx" and outcome != "4xx"),
+                "statuses": dict(statuses),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(statistics.mean(samples) * 1000, 3),
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "statements_per_request": round(self.statements[route] / len(samples), 2) if config["in_process"] else None,
+            }
+        every = [sample for samples in self.latencies.values() for sample in samples]
+        return {
+            "config": config,
+            "totals": {
+                "requests": self.requests,
+                "errors": sum(route["errors"] for route in routes.values()),
+                "duration_s": round(elapsed, 3),
+                "throughput_rps": round(self.requests / elapsed, 2),
+                "p50_ms": round(percentile(every, 50) * 1000, 3),
+                "p95_ms": round(percentile(every, 95) * 1000, 3),
+                "p99_ms": round(percentile(every, 99) * 1000, 3),
+                "background_statements": self.statements[BACKGROUND] if config["in_process"] else None,
+            },
+            "routes": routes,
+        }
+
+
+async def seed(client: httpx.AsyncClient, restaurants: int, menu_size: int, customers: int) -> dict:
+    """Restaurants with menus and customers, created through the API. Deterministic for a fresh database."""
+    data = {"restaurants": [], "items": {}, "customers": []}
+    for r in range(restaurants):
+        response = await client.post("/restaurants/", json={
+            "name": f"Load Test Kitchen {r}", "cuisine_type": CUISINES[r % len(CUISINES)], "address": f"{r} Load Street",
+            "phone_number": f"+91{r:010d}", "opening_time": "08:00", "closing_time": "23:30",
+            "latitude": 12.9 + r * 0.01, "longitude": 77.5 + r * 0.01,
+        })
+        response.raise_for_status()
+        restaurant_id = response.json()["id"]
+        data["restaurants"].append(restaurant_id)
+        data["items"][restaurant_id] = []
+        for i in range(menu_size):
+            response = await client.post(f"/restaurants/{restaurant_id}/menu-items/", json={
+                "name": f"{DISHES[(r + i) % len(DISHES)]} {i}", "price": f"{5 + (r * 7 + i * 3) % 20}.50",
+                "category": CATEGORIES[i % len(CATEGORIES)], "is_vegetarian": i % 3 == 0, "preparation_time": 5 + i % 25,
+            })
+            response.raise_for_status()
+            data["items"][restaurant_id].append(response.json()["id"])
+    for c in range(customers):
+        response = await client.post("/customers/", json={
+            "name": f"Load Tester {c}", "email": f"load{c}@example.com", "phone_number": f"+92{c:010d}",
+            "address": f"{c} Load Test Avenue",
+        })
+        response.raise_for_status()
+        data["customers"].append(response.json()["id"])
+    return data
+
+
+async def virtual_user(index: int, client, recorder: Recorder, data: dict, stop, seed_value: int):
+    rng = random.Random(seed_value * 1_000_003 + index)
+    customer_id = data["customers"][index % len(data["customers"])]
+    restaurants = data["restaurants"]
+    # Popular restaurants get most of the traffic
+    popularity = [1 / (rank + 1) for rank in range(len(restaurants))]
+    open_orders: Dict[int, str] = {}
+    delivered: List[int] = []
+    actions, weights = list(ACTIONS), list(ACTIONS.values())
+
+    while not stop():
+        action = rng.choices(actions, weights)[0]
+        if action == "advance order" and not open_orders:
+            action = "place order"
+        if action == "review order" and not delivered:
+            action = "view menu"
+
+        if action == "browse restaurants":
+            await recorder.send(client, "GET", "/restaurants/?limit=20")
+        elif action == "view menu":
+            restaurant_id = rng.choices(restaurants, popularity)[0]
+            await recorder.send(client, "GET", f"/restaurants/{restaurant_id}/menu")
+        elif action == "search menu":
+            await recorder.send(client, "GET", f"/menu-items/search?q={rng.choice(SEARCH_TERMS)}&limit=20")
+        elif action == "open now":
+            await recorder.send(client, "GET", f"/restaurants/open?at={rng.randint(7, 23):02d}:{rng.choice(['00', '30'])}")
+        elif action == "order history":
+            await recorder.send(client, "GET", f"/customers/{customer_id}/orders?limit=20")
+        elif action == "place order":
+            restaurant_id = rng.choices(restaurants, popularity)[0]
+            items = rng.sample(data["items"][restaurant_id], k=min(rng.randint(1, 4), len(data["items"][restaurant_id])))
+            response = await recorder.send(client, "POST", f"/customers/{customer_id}/orders/", {
+                "restaurant_id": restaurant_id, "delivery_address": f"{customer_id} Load Test Avenue",
+                "items": [{"menu_item_id": item_id, "quantity": rng.randint(1, 3)} for item_id in items],
+            })
+            if response is not None and response.status_code == 201:
+                open_orders[response.json()["id"]] = "placed"
+        elif action == "advance order":
+            order_id = rng.choice(list(open_orders))
+            status = NEXT_STATUS[open_orders[order_id]]
+            response = await recorder.send(client, "PUT", f"/orders/{order_id}/status", {"status": status})
+            if response is not None and response.status_code == 200:
+                open_orders[order_id] = status
+                if status == "delivered":
+                    del open_orders[order_id]
+                    delivered.append(order_id)
+        elif action == "review order":
+            order_id = delivered.pop(rng.randrange(len(delivered)))
+            await recorder.send(client, "POST", f"/orders/{order_id}/review", {"rating": rng.randint(1, 5), "comment": "Load test"})
+
+
+async def replay_sender(lines, client, recorder: Recorder, stop):
+    for line in lines:
+        if stop():
+            return
+        request = json.loads(line)
+        await recorder.send(client, request["method"].upper(), request["path"], request.get("json"))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def target(args):
+    """Yield (client, in_process) for the chosen target."""
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+            yield client, False
+    elif args.serve:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=os.environ.copy(),
+        )
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+                for _ in range(300):
+                    try:
+                        (await client.get("/openapi.json")).raise_for_status()
+                        break
+                    except httpx.HTTPError:
+                        if server.poll() is not None:
+                            raise RuntimeError("uvicorn exited during startup")
+                        await asyncio.sleep(0.1)
+                yield client, False
+        finally:
+            server.terminate()
+            server.wait()
+    else:
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=30) as client:
+                yield client, True
+
+
+def print_report(report: dict, baseline: Optional[dict]):
+    totals = report["totals"]
+    print(f"{totals['requests']:,} requests in {totals['duration_s']:.1f} s: {totals['throughput_rps']:,.1f} req/s, "
+          f"{totals['errors']} errors, p50 {totals['p50_ms']:.2f} ms, p95 {totals['p95_ms']:.2f} ms, p99 {totals['p99_ms']:.2f} ms")
+    header = f"{'route':<52} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>7}"
+    if baseline:
+        header += f" {'p95 vs baseline':>16}"
+    print(header)
+    for route, stats in report["routes"].items():
+        sql = "-" if stats["statements_per_request"] is None else f"{stats['statements_per_request']:.1f}"
+        line = (f"{route:<52} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {sql:>7}")
+        if baseline:
+            before = baseline["routes"].get(route)
+            line += f" {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:>+15.1f}%" if before and before["p95_ms"] else f" {'new':>16}"
+        print(line)
+    if totals["background_statements"]:
+        print(f"{totals['background_statements']:,} statements from background jobs")
+
+
+async def run(args) -> dict:
+    async with target(args) as (client, in_process):
+        match = RouteMatcher((await client.get("/openapi.json")).json())
+        log = open(args.record, "w") if args.record else None
+        recorder = Recorder(match, log)
+        try:
+            data = await seed(client, args.restaurants, args.menu_size, max(args.customers, args.users))
+            if in_process:
+                for counted_engine in {engine, read_engine}:
+                    event.listen(counted_engine.sync_engine, "before_cursor_execute", recorder.count_statement)
+
+            deadline = time.perf_counter() + args.duration
+            stop = lambda: time.perf_counter() >= deadline or (args.requests and recorder.requests >= args.requests)
+            recorder.started = time.perf_counter()
+            if args.log:
+                with open(args.log) as source:
+                    lines = (line for line in source if line.strip())
+                    await asyncio.gather(*(replay_sender(lines, client, recorder, stop) for _ in range(args.users)))
+            else:
+                await asyncio.gather(*(
+                    virtual_user(index, client, recorder, data, stop, args.seed) for index in range(args.users)
+                ))
+            recorder.finished = time.perf_counter()
+        finally:
+            if in_process:
+                for counted_engine in {engine, read_engine}:
+                    event.remove(counted_engine.sync_engine, "before_cursor_execute", recorder.count_statement)
+            if log is not None:
+                log.close()
+
+    config = {
+        "mode": "replay" if args.log else "mixed",
+        "target": args.url or ("uvicorn" if args.serve else "in-process"),
+        "in_process": in_process,
+        "users": args.users,
+        "duration_s": args.duration,
+        "max_requests": args.requests,
+        "seed": args.seed,
+        "restaurants": args.restaurants,
+        "menu_size": args.menu_size,
+        "log": args.log,
+    }
+    return recorder.report(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--url", help="Base URL of a running server")
+    where.add_argument("--serve", action="store_true", help="Start a local uvicorn server on a free port")
+    parser.add_argument("--log", help="JSONL request log to replay instead of the mixed workload")
+    parser.add_argument("--record", help="Write the requests sent to this JSONL file")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users or replay senders")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run for")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0: no limit)")
+    parser.add_argument("--restaurants", type=int, default=20)
+    parser.add_argument("--menu-size", type=int, default=15)
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare p95 latencies with")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
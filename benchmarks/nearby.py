@@ -0,0 +1,90 @@
+"""
+Nearest-restaurant query time as the number of restaurants grows.
+
+For each size, seeds a migrated throwaway database with restaurants spread
+uniformly over a ~55 km square and times get_nearby_restaurants (k=10,
+5 km) from random points, once through the R*Tree index and once with
+the index disabled (a scan of the coordinate columns).
+
+    python -m benchmarks.nearby [--sizes 1000 10000 100000] [--queries 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import time as dtime
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics
+from api.crud.restaurant import get_nearby_restaurants
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.db.migrations import upgrade_database
+from api.models.restaurant import Restaurant
+from api.utils import geo
+
+# Bangalore-sized area
+MIN_LAT, MIN_LON, SPAN = 12.75, 77.35, 0.5
+CUISINES = ["Indian", "Chinese", "Italian", "Mexican", "Thai"]
+BATCH = 20_000
+
+
+async def seed(session_factory, count: int, rng: random.Random):
+    async with session_factory() as db:
+        for start in range(0, count, BATCH):
+            await db.execute(insert(Restaurant), [
+                {
+                    "name": f"Nearby Bench {i}", "cuisine_type": rng.choice(CUISINES), "address": "1 Benchmark Street",
+                    "phone_number": f"+91{i:010d}", "opening_time": dtime(9, 0), "closing_time": dtime(23, 0),
+                    "latitude": MIN_LAT + rng.random() * SPAN, "longitude": MIN_LON + rng.random() * SPAN,
+                    "rating": round(rng.uniform(2.5, 5.0), 1),
+                }
+                for i in range(start, min(start + BATCH, count))
+            ])
+        await db.commit()
+
+
+async def time_queries(session_factory, points, **filters):
+    timings = []
+    async with session_factory() as db:
+        for latitude, longitude in points:
+            start = time.perf_counter()
+            await get_nearby_restaurants(db, latitude, longitude, k=10, max_distance_km=5.0, **filters)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+async def run(sizes, queries: int):
+    rng = random.Random(0)
+    points = [(MIN_LAT + rng.random() * SPAN, MIN_LON + rng.random() * SPAN) for _ in range(queries)]
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = DatabaseSettings(database_url=f"sqlite+aiosqlite:///{os.path.join(tmp, 'nearby.db')}")
+            engine = create_engine_from_settings(settings)
+            async with engine.begin() as conn:
+                await conn.run_sync(upgrade_database)
+            session_factory = async_sessionmaker(engine, expire_on_commit=False)
+            await seed(session_factory, size, random.Random(size))
+
+            for label, use_index in (("r*tree", True), ("scan", False)):
+                geo._has_rtree = use_index
+                for filters in ({}, {"cuisine_type": "Thai", "min_rating": 4.5}):
+                    p50, p99 = await time_queries(session_factory, points, **filters)
+                    print(f"{size:>9,} restaurants  {label:<7} {'filtered' if filters else 'all':<9} "
+                          f"p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+            geo.reset()
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.queries))
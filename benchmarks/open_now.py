@@ -0,0 +1,94 @@
+"""
+"Open at" discovery query time over a range of times of day.
+
+Seeds a migrated throwaway database with restaurants whose hours are drawn
+from typical breakfast/lunch/dinner/late-night patterns (a third of them run
+past midnight) and times the first page of get_open_restaurants, against
+loading every restaurant and checking its hours in Python.
+
+    python -m benchmarks.open_now [--restaurants 100000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import time as dtime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics
+from api.crud.restaurant import get_open_restaurants, rebuild_open_windows
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.db.migrations import upgrade_database
+from api.models.restaurant import Restaurant
+from api.utils.schedule import minute_of_day, open_windows
+
+# (opening hour, closing hour) patterns
+HOURS = [(7, 15), (8, 17), (11, 15), (11, 22), (12, 23), (17, 23), (18, 1), (19, 2), (20, 4), (0, 0)]
+TIMES = [dtime(4, 0), dtime(7, 30), dtime(12, 0), dtime(19, 0), dtime(23, 30)]
+BATCH = 20_000
+
+
+async def seed(session_factory, count: int):
+    rng = random.Random(count)
+    async with session_factory() as db:
+        for start in range(0, count, BATCH):
+            rows = []
+            for i in range(start, min(start + BATCH, count)):
+                opening, closing = rng.choice(HOURS)
+                rows.append({
+                    "name": f"Open Bench {rng.random():.10f}", "cuisine_type": "Indian", "address": "1 Benchmark Street",
+                    "phone_number": f"+91{i:010d}", "rating": round(rng.uniform(2.5, 5.0), 1),
+                    "opening_time": dtime(opening, rng.choice([0, 30])), "closing_time": dtime(closing, 0),
+                })
+            await db.execute(insert(Restaurant), rows)
+        await db.commit()
+        await rebuild_open_windows(db)
+
+
+async def python_filter(db, at: dtime):
+    # What clients did before: fetch everything and check the hours themselves
+    minute = minute_of_day(at)
+    rows = (await db.execute(select(Restaurant.id, Restaurant.opening_time, Restaurant.closing_time))).all()
+    return [row.id for row in rows if any(o <= minute < c for o, c in open_windows(row.opening_time, row.closing_time))]
+
+
+async def measure(factory, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await factory()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+async def run(restaurants: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = DatabaseSettings(database_url=f"sqlite+aiosqlite:///{os.path.join(tmp, 'open.db')}")
+        engine = create_engine_from_settings(settings)
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade_database)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        await seed(session_factory, restaurants)
+
+        async with session_factory() as db:
+            for at in TIMES:
+                indexed, page = await measure(lambda: get_open_restaurants(db, at, as_dicts=True), repeat)
+                filtered = await measure(lambda: get_open_restaurants(db, at, min_rating=4.9, as_dicts=True), repeat)
+                naive, open_ids = await measure(lambda: python_filter(db, at), max(1, repeat // 5))
+                print(f"{at:%H:%M}  open {len(open_ids):>7,}  first page {indexed:7.2f} ms  "
+                      f"rating>=4.9 {filtered[0]:7.2f} ms  load-all {naive:8.2f} ms")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--restaurants", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.restaurants, args.repeat))
@@ -0,0 +1,72 @@
+"""
+Latency of order placement against basket size.
+
+Compares the set-based menu-item resolution in `place_order` with the
+previous one-`db.get`-per-line approach.
+
+    python -m benchmarks.place_order [--repeat 200]
+"""
+import argparse
+import asyncio
+from decimal import Decimal
+
+from api.crud.order import place_order
+from api.models.menu_item import MenuItem
+from api.models.order import Order
+from api.models.order_item import OrderItem
+from api.schemas.order import OrderCreate
+from benchmarks.common import seed_restaurant, summarize, temporary_database, timed
+
+BASKET_SIZES = [1, 5, 10, 20, 50]
+
+
+async def place_order_per_item(db, customer_id: int, data: OrderCreate) -> Order:
+    # Previous implementation: one round trip per line item
+    total_amount = Decimal(0)
+    order_items = []
+    for item_data in data.items:
+        menu_item = await db.get(MenuItem, item_data.menu_item_id)
+        if not menu_item or menu_item.restaurant_id != data.restaurant_id:
+            raise ValueError(f"Invalid menu item ID: {item_data.menu_item_id}")
+        total_amount += menu_item.price * item_data.quantity
+        order_items.append(OrderItem(
+            menu_item_id=item_data.menu_item_id,
+            quantity=item_data.quantity,
+            item_price=menu_item.price,
+        ))
+    order = Order(
+        customer_id=customer_id,
+        restaurant_id=data.restaurant_id,
+        total_amount=total_amount,
+        delivery_address=data.delivery_address,
+        items=order_items,
+    )
+    db.add(order)
+    await db.commit()
+    return order
+
+
+async def run(repeat: int):
+    async with temporary_database() as session_factory:
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, max(BASKET_SIZES))
+        print(f"{'basket':>6}  {'implementation':<14}  latency")
+        for size in BASKET_SIZES:
+            data = OrderCreate(
+                restaurant_id=restaurant_id,
+                delivery_address="2 Benchmark Avenue",
+                items=[{"menu_item_id": item_id, "quantity": 1} for item_id in item_ids[:size]],
+            )
+            for label, impl in (("per-item get", place_order_per_item), ("batched", place_order)):
+                async def one():
+                    # Fresh session per order so the identity map cannot serve menu items
+                    async with session_factory() as db:
+                        await impl(db, customer_id, data)
+                samples = await timed(one, repeat)
+                print(f"{size:>6}  {label:<14}  {summarize(samples)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.repeat))
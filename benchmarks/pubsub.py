@@ -0,0 +1,69 @@
+"""
+Fan-out cost of the order event broker.
+
+Opens `--subscribers` streams spread over `--topics` topics, each drained by its
+own task like an SSE response would, then publishes `--events` events and times
+how long publishing takes and how long until the last subscriber has each event.
+A final round with one subscriber that never reads checks that a slow consumer
+is dropped instead of slowing the publisher or growing without bound.
+
+    python -m benchmarks.pubsub [--subscribers 10000] [--topics 1000] [--events 1000]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from api.utils.pubsub import Broker, order_topic
+
+EVENT = {"id": 1, "restaurant_id": 1, "order_status": "preparing", "estimated_ready_time": "2026-01-01T12:30:00Z"}
+
+
+async def drain(subscription, received: list):
+    async for _ in subscription.frames(heartbeat=3600):
+        received.append(time.perf_counter())
+
+
+async def run(subscribers: int, topics: int, events: int):
+    broker = Broker()
+    received = [[] for _ in range(subscribers)]
+    subscriptions = [broker.subscribe(order_topic(i % topics)) for i in range(subscribers)]
+    tasks = [asyncio.create_task(drain(subscription, received[i])) for i, subscription in enumerate(subscriptions)]
+    await asyncio.sleep(0)
+
+    publish_timings, delivery_timings = [], []
+    for event in range(events):
+        topic = event % topics
+        start = time.perf_counter()
+        broker.publish(order_topic(topic), "status_changed", EVENT)
+        publish_timings.append((time.perf_counter() - start) * 1e6)
+        # Until every subscriber of the topic has taken the event off its queue
+        readers = range(topic, subscribers, topics)
+        while any(len(received[i]) <= event // topics for i in readers):
+            await asyncio.sleep(0)
+        delivery_timings.append((max(received[i][-1] for i in readers) - start) * 1e6)
+    print(f"{subscribers:,} subscribers on {topics:,} topics ({subscribers // topics} per topic)")
+    print(f"publish             p50 {statistics.median(publish_timings):8.1f} us")
+    print(f"last subscriber has p50 {statistics.median(delivery_timings):8.1f} us")
+
+    # Next to the draining subscribers of topic 0, one that never reads
+    slow = broker.subscribe(order_topic(0))
+    for _ in range(broker.queue_size * 4):
+        broker.publish(order_topic(0), "status_changed", EVENT)
+        await asyncio.sleep(0)
+    print(f"slow consumer: dropped={slow.dropped}, frames held={slow.queue.qsize()}, "
+          f"draining subscribers dropped={broker.dropped - 1}")
+    print(broker.stats())
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--topics", type=int, default=1_000)
+    parser.add_argument("--events", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.topics, args.events))
@@ -0,0 +1,67 @@
+"""
+Read latency during a sustained write burst, with and without the read-only pool.
+
+"shared" sends reads through the write engine (the previous behaviour);
+"split" sends them through the read-only pool used by GET routes.
+
+    python -m benchmarks.read_write_routing [--seconds 10] [--writers 8] [--readers 8]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from api.crud.menu_item import get_restaurant_menu_items
+from api.crud.order import place_order
+from api.db.database import DatabaseSettings
+from api.schemas.order import OrderCreate
+from benchmarks.common import seed_restaurant, summarize, temporary_read_write_database
+
+# A small pool makes connection queueing visible at benchmark concurrency
+SETTINGS = DatabaseSettings(database_pool_size=4, database_max_overflow=0)
+
+
+async def run_mode(mode: str, seconds: float, writers: int, readers: int):
+    async with temporary_read_write_database(SETTINGS) as (write_factory, read_factory):
+        read_factory = write_factory if mode == "shared" else read_factory
+        seeded = [await seed_restaurant(write_factory, menu_size=30, index=i) for i in range(10)]
+        rng = random.Random(7)
+        deadline = time.perf_counter() + seconds
+        read_latencies, orders = [], 0
+
+        async def writer():
+            nonlocal orders
+            while time.perf_counter() < deadline:
+                restaurant_id, customer_id, item_ids = rng.choice(seeded)
+                async with write_factory() as db:
+                    await place_order(db, customer_id, OrderCreate(
+                        restaurant_id=restaurant_id,
+                        delivery_address="2 Benchmark Avenue",
+                        items=[{"menu_item_id": item_id, "quantity": 1} for item_id in rng.sample(item_ids, 5)],
+                    ))
+                orders += 1
+
+        async def reader():
+            while time.perf_counter() < deadline:
+                restaurant_id, _, _ = rng.choice(seeded)
+                start = time.perf_counter()
+                async with read_factory() as db:
+                    await get_restaurant_menu_items(db, restaurant_id)
+                read_latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[writer() for _ in range(writers)], *[reader() for _ in range(readers)])
+        print(f"{mode:<7} reads {len(read_latencies):>6}  {summarize(read_latencies)}   orders/s {orders / seconds:7.1f}")
+
+
+async def run(seconds: float, writers: int, readers: int):
+    for mode in ("shared", "split"):
+        await run_mode(mode, seconds, writers, readers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds, args.writers, args.readers))
@@ -0,0 +1,154 @@
+"""
+Co-occurrence recommender build time and query latency at scale.
+
+Seeds a migrated throwaway database with `--lines` order lines: orders of one
+to six items at restaurants of `--menu-size` items, with Zipfian restaurant and
+item popularity. Then times the model build, the "ordered together" and
+per-customer queries (end to end through the CRUD functions), and the
+incremental update place_order does per order.
+
+    python -m benchmarks.recommendations [--lines 10000000] [--restaurants 5000] [--menu-size 40] [--queries 1000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import time as dtime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics
+from api.crud.menu_item import get_menu_item_recommendations
+from api.crud.order import get_customer_recommendations
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.db.migrations import upgrade_database
+from api.models.customer import Customer
+from api.models.menu_item import MenuItem
+from api.models.order import Order
+from api.models.order_item import OrderItem
+from api.models.restaurant import Restaurant
+from api.utils import recommender
+
+CUSTOMERS = 50_000
+BATCH = 50_000
+
+
+def zipf_choice(rng: np.random.Generator, size: int, count: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1 / np.arange(1, size + 1) ** exponent
+    return rng.choice(size, size=count, p=weights / weights.sum())
+
+
+def generate_orders(rng: np.random.Generator, lines: int, restaurants: int, menu_size: int):
+    """(order restaurant index, customer index, line order index, line item index) arrays."""
+    sizes = rng.integers(1, 7, size=lines // 3)
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), lines) + 1]
+    order_restaurants = zipf_choice(rng, restaurants, len(sizes), exponent=0.8)
+    order_customers = rng.integers(0, CUSTOMERS, size=len(sizes))
+    line_orders = np.repeat(np.arange(len(sizes)), sizes)[:lines]
+    line_items = order_restaurants[line_orders] * menu_size + zipf_choice(rng, menu_size, len(line_orders))
+    return order_restaurants, order_customers, line_orders, line_items
+
+
+async def seed(session_factory, lines: int, restaurants: int, menu_size: int):
+    rng = np.random.default_rng(lines)
+    order_restaurants, order_customers, line_orders, line_items = generate_orders(rng, lines, restaurants, menu_size)
+    async with session_factory() as db:
+        await db.execute(insert(Restaurant), [
+            {
+                "id": r + 1, "name": f"Recommender Bench {r}", "cuisine_type": "Indian", "address": "1 Benchmark Street",
+                "phone_number": f"+91{r:010d}", "opening_time": dtime(9, 0), "closing_time": dtime(23, 0),
+            }
+            for r in range(restaurants)
+        ])
+        await db.execute(insert(Customer), [
+            {"id": c + 1, "name": f"Bench {c}", "email": f"bench{c}@example.com", "phone_number": f"+92{c:010d}", "address": "2 Benchmark Avenue"}
+            for c in range(CUSTOMERS)
+        ])
+        for start in range(0, restaurants * menu_size, BATCH):
+            await db.execute(insert(MenuItem), [
+                {"id": i + 1, "restaurant_id": i // menu_size + 1, "name": f"Item {i}", "price": 9.99,
+                 "category": "Main Course", "preparation_time": 15}
+                for i in range(start, min(start + BATCH, restaurants * menu_size))
+            ])
+        for start in range(0, len(order_restaurants), BATCH):
+            await db.execute(insert(Order), [
+                {"id": o + 1, "customer_id": int(order_customers[o]) + 1, "restaurant_id": int(order_restaurants[o]) + 1,
+                 "total_amount": 9.99, "delivery_address": "2 Benchmark Avenue"}
+                for o in range(start, min(start + BATCH, len(order_restaurants)))
+            ])
+        for start in range(0, len(line_orders), BATCH):
+            await db.execute(insert(OrderItem), [
+                {"order_id": order_id + 1, "menu_item_id": item_id + 1, "quantity": 1, "item_price": 9.99}
+                for order_id, item_id in zip(line_orders[start:start + BATCH].tolist(), line_items[start:start + BATCH].tolist())
+            ])
+        await db.commit()
+    return len(order_restaurants), line_items + 1
+
+
+async def time_calls(factory, arguments):
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        await factory(argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+async def run(lines: int, restaurants: int, menu_size: int, queries: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = DatabaseSettings(database_url=f"sqlite+aiosqlite:///{os.path.join(tmp, 'recommendations.db')}")
+        engine = create_engine_from_settings(settings)
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade_database)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        start = time.perf_counter()
+        orders, line_items = await seed(session_factory, lines, restaurants, menu_size)
+        print(f"seeded {lines:,} order lines ({orders:,} orders) in {time.perf_counter() - start:.1f} s")
+
+        recommender.reset()
+        model = recommender.model()
+        async with session_factory() as db:
+            start = time.perf_counter()
+            await model.ensure_built(db)
+            print(f"built model in {time.perf_counter() - start:.1f} s: {len(model.item_ids):,} items, "
+                  f"{model.matrix.nnz:,} non-zeros, {model.matrix.data.nbytes + model.matrix.indices.nbytes >> 20} MB")
+
+            rng = np.random.default_rng(0)
+            # Items picked in proportion to how often they are ordered, like real page views
+            items = rng.choice(line_items, size=queries).tolist()
+            customers = rng.integers(1, CUSTOMERS + 1, size=queries).tolist()
+            p50, p99 = await time_calls(lambda item_id: asyncio.sleep(0, model.similar(item_id, 30)), items)
+            print(f"similar items (model only)     p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+            p50, p99 = await time_calls(lambda item_id: get_menu_item_recommendations(db, item_id, limit=10), items)
+            print(f"GET item recommendations       p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+            p50, p99 = await time_calls(lambda customer_id: get_customer_recommendations(db, customer_id, limit=10), customers)
+            print(f"GET customer recommendations   p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+
+        # Incremental updates, as place_order applies them
+        new_orders = [rng.choice(line_items, size=rng.integers(1, 7)).tolist() for _ in range(queries * 10)]
+        start = time.perf_counter()
+        for offset, order_items in enumerate(new_orders, start=orders + 1):
+            model.record_order(offset, order_items)
+        print(f"record_order                   {(time.perf_counter() - start) / len(new_orders) * 1e6:8.1f} us per order")
+        start = time.perf_counter()
+        model._merge()
+        print(f"merge of {len(new_orders):,} pending orders  {(time.perf_counter() - start) * 1000:8.1f} ms")
+        await engine.dispose()
+        recommender.reset()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--restaurants", type=int, default=5_000)
+    parser.add_argument("--menu-size", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.lines, args.restaurants, args.menu_size, args.queries))
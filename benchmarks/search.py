@@ -0,0 +1,155 @@
+"""
+Full-text menu search latency on a large migrated database.
+
+Seeds `--items` menu items (spread over restaurants of 100 items each) with
+names from a small dish vocabulary and descriptions from a Zipfian one, builds
+the search index and times search_menu_items for a mix of rare, common, prefix
+and multi-word queries with the default filters. With --facets, also times the
+same searches (and an unfiltered one) returning facet counts.
+
+    python -m benchmarks.search [--items 1000000] [--backend fts5|memory] [--repeat 50] [--facets]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import time as dtime
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Import all models to ensure they are registered with Base
+from api.models import customer, restaurant, menu_item, order, order_item, review, analytics
+from api.crud.analytics import rebuild_rollups
+from api.crud.menu_item import search_menu_items
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.db.migrations import upgrade_database
+from api.models.menu_item import MenuItem
+from api.models.restaurant import Restaurant
+from api.utils import search
+
+BASES = ["dosa", "biryani", "paneer", "tikka", "curry", "naan", "pizza", "pasta", "burger", "salad",
+         "noodles", "ramen", "sushi", "taco", "burrito", "falafel", "kebab", "soup", "sandwich", "wrap"]
+MODIFIERS = ["masala", "spicy", "smoked", "grilled", "crispy", "garlic", "butter", "cheese", "chicken", "lamb",
+             "mushroom", "truffle", "lemon", "ginger", "chilli", "herb", "coconut", "mango", "saffron", "pesto"]
+CATEGORIES = ["Appetizer", "Main Course", "Dessert", "Beverage", "Snack", "Side Dish"]
+SYLLABLES = ["ka", "ri", "mo", "sa", "lu", "te", "po", "na", "shi", "gu", "ve", "da", "lo", "mi", "ba", "zen"]
+
+QUERIES = {
+    "rare word": "saffron pesto",
+    "common word": "chicken",
+    "prefix": "chi",
+    "two words": "masala dosa",
+    "description word": "dabashimi",
+    "no match": "xylophone",
+}
+
+RESTAURANT_SIZE = 100
+BATCH = 20_000
+
+
+def description_vocabulary(rng: random.Random, size: int = 5000):
+    words = sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)})
+    rng.shuffle(words)
+    # Zipfian word frequencies, like real menu copy
+    return words + MODIFIERS, [1 / rank for rank in range(1, len(words) + 1)] + [0.5] * len(MODIFIERS)
+
+
+def menu_rows(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    words, weights = description_vocabulary(rng)
+    for i in range(count):
+        name = f"{rng.choice(MODIFIERS).title()} {rng.choice(BASES).title()} {i}"
+        description = " ".join(rng.choices(words, weights, k=8))
+        yield {
+            "restaurant_id": i // RESTAURANT_SIZE + 1,
+            "name": name,
+            "description": description,
+            "price": 9.99,
+            "category": rng.choice(CATEGORIES),
+            "is_vegetarian": rng.random() < 0.4,
+            "is_vegan": rng.random() < 0.1,
+            "is_available": rng.random() > 0.1,
+            "preparation_time": 15,
+        }
+
+
+async def seed(session_factory, items: int):
+    restaurants = [
+        {
+            "name": f"Search Bench {i}", "cuisine_type": "Indian", "address": "1 Benchmark Street",
+            "phone_number": f"+91{i:010d}", "opening_time": dtime(9, 0), "closing_time": dtime(23, 0),
+        }
+        for i in range((items + RESTAURANT_SIZE - 1) // RESTAURANT_SIZE)
+    ]
+    async with session_factory() as db:
+        await db.execute(insert(Restaurant), restaurants)
+        batch = []
+        for row in menu_rows(items):
+            batch.append(row)
+            if len(batch) == BATCH:
+                await db.execute(insert(MenuItem), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(MenuItem), batch)
+        await db.commit()
+
+
+async def time_search(db, repeat: int, **params):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page = await search_menu_items(db, as_dicts=True, **params)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return page, statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+async def run(items: int, backend_name: str, repeat: int, facets: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = DatabaseSettings(database_url=f"sqlite+aiosqlite:///{os.path.join(tmp, 'search.db')}")
+        engine = create_engine_from_settings(settings)
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade_database)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        search.reset()
+        if backend_name == "memory":
+            search._backend = search.InMemoryBackend()
+
+        start = time.perf_counter()
+        await seed(session_factory, items)
+        print(f"seeded {items:,} menu items in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        async with session_factory() as db:
+            await search.rebuild(db, "menu_items")
+            await db.commit()
+            print(f"built {(await search.backend(db)).name} index in {time.perf_counter() - start:.1f} s")
+            if facets:
+                await rebuild_rollups(db)
+
+        async with session_factory() as db:
+            queries = {"no query": None, **QUERIES} if facets else QUERIES
+            for label, q in queries.items():
+                page, p50, p99 = await time_search(db, repeat, q=q)
+                line = f"{label:<18} {q!r:<16} {len(page['items']):>3} hits  p50 {p50:8.2f} ms  p99 {p99:8.2f} ms"
+                if facets:
+                    _, p50, p99 = await time_search(db, repeat, q=q, vegetarian=True, facets=True)
+                    line += f"  | vegetarian + facets p50 {p50:8.2f} ms  p99 {p99:8.2f} ms"
+                print(line)
+        await engine.dispose()
+        search.reset()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--backend", choices=["fts5", "memory"], default="fts5")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--facets", action="store_true", help="also time searches returning facet counts")
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.backend, args.repeat, args.facets))
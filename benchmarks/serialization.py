@@ -0,0 +1,98 @@
+"""
+Rows/sec for list responses: ORM entities through the response_model versus
+column rows encoded by FastJSONResponse.
+
+"orm" mirrors what FastAPI does with a response_model: validate every entity
+with from_attributes, dump it in JSON mode and encode with the stdlib encoder.
+"fast" is the path the list routes use. Both outputs are checked to be equal.
+
+    python -m benchmarks.serialization [--rows 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+from api.crud.menu_item import get_menu_items
+from api.crud.order import get_restaurant_orders
+from api.models.order import Order, OrderStatus
+from api.schemas.menu_item import MenuItemRead
+from api.schemas.order import OrderRead
+from api.schemas.pagination import Page
+from api.utils.serialization import FastJSONResponse
+from benchmarks.common import seed_restaurant, temporary_database
+
+
+async def seed_orders(session_factory, restaurant_id: int, customer_id: int, count: int):
+    start = datetime(2024, 1, 1)
+    statuses = list(OrderStatus)
+    async with session_factory() as db:
+        await db.execute(insert(Order), [
+            {
+                "customer_id": customer_id,
+                "restaurant_id": restaurant_id,
+                "order_status": statuses[i % len(statuses)],
+                "total_amount": Decimal("12.50") + i,
+                "delivery_address": "2 Benchmark Avenue",
+                "order_date": start + timedelta(minutes=i),
+            }
+            for i in range(count)
+        ])
+        await db.commit()
+
+
+async def measure(label: str, session_factory, load, schema, rows: int, repeat: int):
+    adapter = TypeAdapter(Page[schema])
+
+    async def orm():
+        async with session_factory() as db:
+            page = await load(db, False)
+        validated = adapter.validate_python(page, from_attributes=True)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    async def fast():
+        async with session_factory() as db:
+            page = await load(db, True)
+        return FastJSONResponse(page).body
+
+    outputs = {}
+    for mode, path in (("orm", orm), ("fast", fast)):
+        outputs[mode] = await path()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await path()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18} {mode:<5} {rows * repeat / elapsed:>10,.0f} rows/s")
+
+    if json.loads(outputs["orm"]) != json.loads(outputs["fast"]):
+        raise SystemExit(f"{label}: fast path output differs from the response_model output")
+
+
+async def run(rows: int, repeat: int):
+    async with temporary_database() as session_factory:
+        restaurant_id, customer_id, _ = await seed_restaurant(session_factory, menu_size=rows)
+        await seed_orders(session_factory, restaurant_id, customer_id, rows)
+
+        await measure(
+            "menu items", session_factory,
+            lambda db, as_dicts: get_menu_items(db, limit=rows, as_dicts=as_dicts),
+            MenuItemRead, rows, repeat,
+        )
+        await measure(
+            "restaurant orders", session_factory,
+            lambda db, as_dicts: get_restaurant_orders(db, restaurant_id, limit=rows, as_dicts=as_dicts),
+            OrderRead, rows, repeat,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
@@ -0,0 +1,97 @@
+import itertools
+import os
+import tempfile
+
+# The app reads its configuration at import time
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp.name, 'test.db')}"
+# Tests run due jobs themselves (jobs.pool.run_due), so nothing runs between requests
+os.environ["JOB_WORKERS"] = "0"
+# Every request a test makes must stay within its route's statement budget
+os.environ["QUERY_BUDGET_STRICT"] = "1"
+
+import httpx
+import pytest
+
+from api.db.database import AsyncSessionLocal, engine, read_engine
+from api.external_services import jobs
+from api.main import app
+from api.utils.cache import menu_cache
+
+_unique = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def client():
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    menu_cache.clear()
+    await engine.dispose()
+    await read_engine.dispose()
+
+@pytest.fixture
+def db_session():
+    """A write session factory on the test database, for checks the API does not expose."""
+    return AsyncSessionLocal
+
+@pytest.fixture
+def run_jobs():
+    """Runs the background jobs enqueued so far, as a worker would; returns how many ran."""
+    async def run() -> int:
+        return await jobs.pool.run_due(AsyncSessionLocal)
+    return run
+
+class Factory:
+    """Creates records through the API, with unique emails and phone numbers."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def _post(self, path: str, body: dict, status: int = None) -> dict:
+        response = await self.client.post(path, json=body)
+        assert response.status_code in ((status,) if status else (200, 201)), response.text
+        return response.json()
+
+    async def customer(self, **fields) -> dict:
+        n = next(_unique)
+        return await self._post("/customers/", {
+            "name": f"Customer {n}", "email": f"customer{n}@example.com",
+            "phone_number": f"+91{n:010d}", "address": f"{n} Test Avenue, Test City", **fields,
+        })
+
+    async def restaurant(self, **fields) -> dict:
+        n = next(_unique)
+        return await self._post("/restaurants/", {
+            "name": f"Restaurant {n}", "cuisine_type": "Indian", "address": f"{n} Test Street",
+            "phone_number": f"+92{n:010d}", "opening_time": "09:00", "closing_time": "23:00", **fields,
+        })
+
+    async def menu_item(self, restaurant_id: int, **fields) -> dict:
+        n = next(_unique)
+        return await self._post(f"/restaurants/{restaurant_id}/menu-items/", {
+            "name": f"Dish {n}", "price": "9.50", "category": "Main Course", "preparation_time": 10, **fields,
+        })
+
+    async def order(self, customer_id: int, restaurant_id: int, items, **fields) -> dict:
+        return await self._post(f"/customers/{customer_id}/orders/", {
+            "restaurant_id": restaurant_id, "delivery_address": "1 Test Avenue, Test City",
+            "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in items], **fields,
+        }, status=201)
+
+    async def set_status(self, order_id: int, *statuses: str) -> dict:
+        for status in statuses:
+            response = await self.client.put(f"/orders/{order_id}/status", json={"status": status})
+            assert response.status_code == 200, response.text
+        return response.json()
+
+    async def delivered_order(self, customer_id: int, restaurant_id: int, items) -> dict:
+        order = await self.order(customer_id, restaurant_id, items)
+        return await self.set_status(order["id"], "confirmed", "preparing", "out_for_delivery", "delivered")
+
+@pytest.fixture
+def factory(client) -> Factory:
+    return Factory(client)
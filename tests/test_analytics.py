@@ -0,0 +1,167 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import case, func, literal, select
+
+from api.crud.analytics import rebuild_rollups
+from api.models.analytics import CustomerRestaurantStats, CustomerStats, MenuItemSales, RestaurantStats
+from api.models.order import Order, OrderStatus
+from api.models.order_item import OrderItem
+from api.utils.eta import eta_engine
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def history(factory):
+    """Two customers' orders at two restaurants, some delivered and one cancelled."""
+    first, second = await factory.customer(), await factory.customer()
+    restaurant, other = await factory.restaurant(), await factory.restaurant()
+    dosa = await factory.menu_item(restaurant["id"], price="12.00")
+    lassi = await factory.menu_item(restaurant["id"], price="3.50", category="Beverage")
+    thali = await factory.menu_item(other["id"], price="20.00")
+
+    await factory.delivered_order(first["id"], restaurant["id"], [(dosa["id"], 2), (lassi["id"], 1)])
+    await factory.delivered_order(first["id"], restaurant["id"], [(lassi["id"], 3)])
+    cancelled = await factory.order(first["id"], other["id"], [(thali["id"], 1)])
+    await factory.set_status(cancelled["id"], "cancelled")
+    await factory.delivered_order(second["id"], other["id"], [(thali["id"], 2)])
+    # Placed, not delivered yet: counted as an order, not as revenue
+    await factory.order(second["id"], restaurant["id"], [(dosa["id"], 1)])
+    return {"customers": [first["id"], second["id"]], "restaurants": [restaurant["id"], other["id"]],
+            "names": {restaurant["id"]: restaurant["name"], other["id"]: other["name"]},
+            "items": {"dosa": dosa, "lassi": lassi, "thali": thali}}
+
+async def rollups(db_session, history) -> dict:
+    customers, restaurants = history["customers"], history["restaurants"]
+    async with db_session() as db:
+        return {
+            "restaurants": sorted((await db.execute(
+                select(RestaurantStats.restaurant_id, RestaurantStats.total_orders, RestaurantStats.delivered_orders,
+                       RestaurantStats.cancelled_orders, RestaurantStats.total_revenue)
+                .where(RestaurantStats.restaurant_id.in_(restaurants))
+            )).all()),
+            "customers": sorted((await db.execute(
+                select(CustomerStats.customer_id, CustomerStats.total_orders, CustomerStats.delivered_orders,
+                       CustomerStats.cancelled_orders, CustomerStats.total_spending)
+                .where(CustomerStats.customer_id.in_(customers))
+            )).all()),
+            "pairs": sorted((await db.execute(
+                select(CustomerRestaurantStats.customer_id, CustomerRestaurantStats.restaurant_id, CustomerRestaurantStats.order_count)
+                .where(CustomerRestaurantStats.customer_id.in_(customers))
+            )).all()),
+            "sales": sorted((await db.execute(
+                select(MenuItemSales.menu_item_id, MenuItemSales.restaurant_id, MenuItemSales.quantity_sold)
+                .where(MenuItemSales.restaurant_id.in_(restaurants))
+            )).all()),
+        }
+
+async def live(db_session, history) -> dict:
+    """The same figures computed from the orders themselves."""
+    customers, restaurants = history["customers"], history["restaurants"]
+    delivered = func.sum(case((Order.order_status == OrderStatus.delivered, 1), else_=0))
+    cancelled = func.sum(case((Order.order_status == OrderStatus.cancelled, 1), else_=0))
+    revenue = func.sum(case((Order.order_status == OrderStatus.delivered, Order.total_amount), else_=literal(0)))
+    async with db_session() as db:
+        def totals(key, keys):
+            return db.execute(
+                select(key, func.count(), delivered, cancelled, revenue).where(key.in_(keys)).group_by(key)
+            )
+        return {
+            "restaurants": sorted((await totals(Order.restaurant_id, restaurants)).all()),
+            "customers": sorted((await totals(Order.customer_id, customers)).all()),
+            "pairs": sorted((await db.execute(
+                select(Order.customer_id, Order.restaurant_id, func.count())
+                .where(Order.customer_id.in_(customers))
+                .group_by(Order.customer_id, Order.restaurant_id)
+            )).all()),
+            "sales": sorted((await db.execute(
+                select(OrderItem.menu_item_id, Order.restaurant_id, func.sum(OrderItem.quantity))
+                .join(Order, OrderItem.order_id == Order.id)
+                .where(Order.restaurant_id.in_(restaurants))
+                .group_by(OrderItem.menu_item_id, Order.restaurant_id)
+            )).all()),
+        }
+
+def normalized(figures: dict) -> dict:
+    # SQLite sums DECIMAL columns as floats
+    return {name: [tuple(Decimal(str(value)).quantize(Decimal("0.01")) if isinstance(value, (float, Decimal)) else value
+                         for value in row) for row in rows]
+            for name, rows in figures.items()}
+
+async def test_rollups_match_the_orders(client, history, run_jobs, db_session):
+    await run_jobs()
+    assert normalized(await rollups(db_session, history)) == normalized(await live(db_session, history))
+
+async def test_rebuild_reproduces_the_incremental_rollups(client, history, run_jobs, db_session):
+    await run_jobs()
+    incremental = await rollups(db_session, history)
+    async with db_session() as db:
+        await rebuild_rollups(db)
+    assert normalized(await rollups(db_session, history)) == normalized(incremental)
+
+async def test_rollups_wait_for_their_jobs(client, history, run_jobs, db_session):
+    # Jobs enqueued by the writes above have not run: nothing counted yet for these ids
+    assert await rollups(db_session, history) == {"restaurants": [], "customers": [], "pairs": [], "sales": []}
+    await run_jobs()
+    assert (await rollups(db_session, history))["restaurants"]
+
+async def test_analytics_endpoints(client, history, run_jobs):
+    await run_jobs()
+    restaurant, other = history["restaurants"]
+    first, second = history["customers"]
+
+    analytics = (await client.get(f"/restaurants/{restaurant}/analytics")).json()
+    assert (analytics["total_orders"], Decimal(analytics["total_revenue"])) == (3, Decimal("38.00"))
+    assert analytics["popular_items"] == [
+        {"item_name": history["items"]["lassi"]["name"], "quantity_sold": 4},
+        {"item_name": history["items"]["dosa"]["name"], "quantity_sold": 3},
+    ]
+
+    spending = (await client.get(f"/customers/{first}/analytics")).json()
+    assert (spending["total_orders"], Decimal(spending["total_spending"])) == (3, Decimal("38.00"))
+    assert spending["favorite_restaurant"] == history["names"][restaurant]
+    spending = (await client.get(f"/customers/{second}/analytics")).json()
+    assert (spending["total_orders"], Decimal(spending["total_spending"])) == (2, Decimal("40.00"))
+
+async def test_analytics_without_orders(client, factory):
+    restaurant = await factory.restaurant()
+    customer = await factory.customer()
+    assert (await client.get(f"/restaurants/{restaurant['id']}/analytics")).json() == {
+        "total_revenue": "0.0", "total_orders": 0, "average_rating": 0.0, "popular_items": [],
+    }
+    analytics = (await client.get(f"/customers/{customer['id']}/analytics")).json()
+    assert (analytics["total_orders"], analytics["favorite_restaurant"]) == (0, None)
+    assert (await client.get("/restaurants/999999/analytics")).status_code == 404
+
+async def test_order_with_an_empty_basket_is_counted(client, factory, run_jobs):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    await factory.order(customer["id"], restaurant["id"], [])
+    await run_jobs()
+    assert (await client.get(f"/restaurants/{restaurant['id']}/analytics")).json()["total_orders"] == 1
+    assert (await client.get(f"/customers/{customer['id']}/analytics")).json()["total_orders"] == 1
+
+@pytest.mark.parametrize("counted", ["all", "none", "some"])
+async def test_deleting_a_customer_matches_a_rebuild(client, factory, history, run_jobs, db_session, counted):
+    first = history["customers"][0]
+    restaurant = history["restaurants"][0]
+    dosa = history["items"]["dosa"]["id"]
+    if counted != "none":
+        await run_jobs()
+    # Still in the kitchen queue when the customer goes
+    waiting = await factory.order(first, restaurant, [(dosa, 4)])
+    if counted == "some":
+        # Placed and delivered since the jobs last ran: neither counted yet
+        await factory.delivered_order(first, restaurant, [(dosa, 1)])
+        await run_jobs()
+        late = await factory.order(first, restaurant, [(dosa, 2)])
+        await factory.set_status(late["id"], "cancelled")
+
+    assert (await client.delete(f"/customers/{first}")).status_code == 204
+    assert waiting["id"] not in eta_engine.queues[restaurant].orders
+    await run_jobs()
+    incremental = await rollups(db_session, history)
+    assert normalized(incremental) == normalized(await live(db_session, history))
+    async with db_session() as db:
+        await rebuild_rollups(db)
+    assert normalized(await rollups(db_session, history)) == normalized(incremental)
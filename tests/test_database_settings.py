@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from api.db.database import DatabaseSettings, create_engine_from_settings
+from api.utils.instrumentation import TimedQueuePool
+
+pytestmark = pytest.mark.anyio
+
+def test_defaults_without_environment():
+    assert DatabaseSettings.from_env({}) == DatabaseSettings()
+
+def test_from_env_converts_to_field_types():
+    settings = DatabaseSettings.from_env({
+        "DATABASE_URL": "postgresql+asyncpg://app@db/app",
+        "DATABASE_READ_URL": "postgresql+asyncpg://app@replica/app",
+        "DATABASE_POOL_SIZE": "20",
+        "DATABASE_POOL_TIMEOUT": "2.5",
+        "DATABASE_ECHO": "yes",
+        "DATABASE_POOL_PRE_PING": "0",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "250",
+        "SQLITE_MMAP_SIZE": "none",
+        "SQLITE_CACHE_SIZE_KIB": "",
+        "UNRELATED": "ignored",
+    })
+    assert settings.database_url == "postgresql+asyncpg://app@db/app"
+    assert settings.database_read_url == "postgresql+asyncpg://app@replica/app"
+    assert (settings.database_pool_size, settings.database_pool_timeout) == (20, 2.5)
+    assert (settings.database_echo, settings.database_pool_pre_ping) == (True, False)
+    assert (settings.sqlite_synchronous, settings.sqlite_busy_timeout_ms) == ("FULL", 250)
+    assert settings.sqlite_mmap_size is None and settings.sqlite_cache_size_kib is None
+    assert not settings.is_sqlite
+
+def test_invalid_number_is_rejected():
+    with pytest.raises(ValueError):
+        DatabaseSettings.from_env({"DATABASE_POOL_SIZE": "many"})
+
+def test_sqlite_pragmas():
+    settings = DatabaseSettings(sqlite_mmap_size=None)
+    assert settings.sqlite_pragmas() == {
+        "journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000, "cache_size": -64 * 1024,
+    }
+    # Read-only connections leave the file's journal settings to the writer
+    assert settings.sqlite_pragmas(read_only=True) == {"busy_timeout": 5000, "cache_size": -64 * 1024, "query_only": 1}
+
+@pytest.mark.parametrize("url, read_url", [
+    ("sqlite+aiosqlite:///./app.db", "sqlite+aiosqlite:///file:./app.db?mode=ro&uri=true"),
+    ("sqlite+aiosqlite:///:memory:", "sqlite+aiosqlite:///:memory:"),
+    ("postgresql+asyncpg://app@db/app", "postgresql+asyncpg://app@db/app"),
+])
+def test_read_url(url, read_url):
+    assert make_url(DatabaseSettings(database_url=url).read_url) == make_url(read_url)
+
+def test_explicit_read_url_wins():
+    settings = DatabaseSettings(database_read_url="sqlite+aiosqlite:///./replica.db")
+    assert settings.read_url == "sqlite+aiosqlite:///./replica.db"
+
+async def test_engines_apply_the_settings(tmp_path):
+    settings = DatabaseSettings(database_url=f"sqlite+aiosqlite:///{os.path.join(tmp_path, 'settings.db')}",
+                                sqlite_busy_timeout_ms=1234, database_pool_size=3)
+    writer = create_engine_from_settings(settings)
+    reader = create_engine_from_settings(settings, read_only=True)
+    begins = []
+    event.listen(writer.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: begins.append(statement) if statement.startswith("BEGIN") else None)
+    try:
+        assert isinstance(writer.pool, TimedQueuePool) and writer.pool.size() == 3
+        async with writer.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 1234
+        assert begins == ["BEGIN IMMEDIATE"]
+
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM t"))).scalar() == 0
+            assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO t VALUES (1)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+async def test_in_memory_engine_is_not_pool_sized():
+    engine = create_engine_from_settings(DatabaseSettings(database_url="sqlite+aiosqlite:///:memory:"))
+    try:
+        assert not isinstance(engine.pool, TimedQueuePool)
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "memory"
+    finally:
+        await engine.dispose()
@@ -0,0 +1,156 @@
+"""
+Check that every CRUD read query is served by an index.
+
+Runs the CRUD functions against a migrated throwaway database, captures the
+SQL they emit and runs EXPLAIN QUERY PLAN on each statement. A statement
+fails if it scans a table, through an index or not, rather than searching it
+with a constraint, unless its check allows that table; or if it sorts a
+keyset-paginated list with a temporary B-tree.
+"""
+import os
+import re
+import tempfile
+from datetime import time as dtime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from api.crud import analytics as analytics_crud
+from api.crud import customer as customer_crud
+from api.crud import menu_item as menu_item_crud
+from api.crud import order as order_crud
+from api.crud import restaurant as restaurant_crud
+from api.crud import review as review_crud
+from api.db.migrations import upgrade_database
+from api.external_services.jobs import JobPool
+from api.schemas.order import OrderCreate
+from api.utils import recommender
+from api.utils.eta import eta_engine
+from api.utils.pagination import encode_cursor
+from benchmarks.common import seed_restaurant
+
+pytestmark = pytest.mark.anyio
+
+# Any walk over a whole table or index. Derived tables (anon_N) hold rows the
+# plan's own steps produced, and virtual tables (FTS5, R*Tree) apply their
+# constraints inside the scan.
+FULL_SCAN = re.compile(r"^SCAN (?!anon_\d+\b|CONSTANT ROW\b)(\w+)\b(?! VIRTUAL TABLE)")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+DATE_CURSOR = encode_cursor(["2100-01-01 00:00:00", 10 ** 9])
+
+async def estimate_cold(db, restaurant_id: int):
+    eta_engine.forget(restaurant_id)
+    return await eta_engine.estimate(db, restaurant_id, 15)
+
+async def claim_jobs(session_factory):
+    pool = JobPool(workers=0)
+    pool.session_factory = session_factory
+    return await pool._claim()
+
+def place_one(db, seeded):
+    return order_crud.place_order(db, seeded.customer_id, OrderCreate(
+        restaurant_id=seeded.restaurant_id,
+        delivery_address="2 Benchmark Avenue",
+        items=[{"menu_item_id": seeded.item_ids[0], "quantity": 1}],
+    ))
+
+# (label, coroutine factory, whether an ORDER BY sort is acceptable, tables it may scan)
+CHECKS = [
+    ("get_restaurants", lambda db, s: restaurant_crud.get_restaurants(db, cursor=encode_cursor(["A", 0])), False, ()),
+    ("get_restaurant_with_menu", lambda db, s: restaurant_crud.get_restaurant_with_menu(db, s.restaurant_id), False, ()),
+    ("get_open_restaurants (morning)", lambda db, s: restaurant_crud.get_open_restaurants(db, dtime(7, 0)), True, ()),
+    ("get_open_restaurants (night)", lambda db, s: restaurant_crud.get_open_restaurants(db, dtime(23, 30)), True, ()),
+    ("get_nearby_restaurants", lambda db, s: restaurant_crud.get_nearby_restaurants(db, 12.97, 77.59, max_distance_km=2), False, ()),
+    ("get_customers", lambda db, s: customer_crud.get_customers(db, cursor=encode_cursor([0])), False, ()),
+    ("get_customer_by_email", lambda db, s: customer_crud.get_customer_by_email(db, "bench0@example.com"), False, ()),
+    ("get_menu_items", lambda db, s: menu_item_crud.get_menu_items(db, cursor=DATE_CURSOR), False, ()),
+    ("search_menu_items", lambda db, s: menu_item_crud.search_menu_items(db, category="Main Course", vegetarian=False), False, ()),
+    # Without a category the page is read off ix_menu_items_name in keyset order,
+    # stopping once it has a page of matches
+    ("search_menu_items (no category)", lambda db, s: menu_item_crud.search_menu_items(db, vegetarian=False), False, ("menu_items",)),
+    ("get_restaurant_menu_items", lambda db, s: menu_item_crud.get_restaurant_menu_items(db, s.restaurant_id), True, ()),
+    ("get_restaurant_average_price", lambda db, s: menu_item_crud.get_restaurant_average_price(db, s.restaurant_id), False, ()),
+    ("place_order", place_one, False, ()),
+    ("kitchen queue load", lambda db, s: estimate_cold(db, s.restaurant_id), False, ()),
+    ("job claim", lambda db, s: claim_jobs(s.session_factory), False, ()),
+    ("get_order_details", lambda db, s: order_crud.get_order_details(db, 1), False, ()),
+    ("get_menu_item_recommendations", lambda db, s: menu_item_crud.get_menu_item_recommendations(db, s.item_ids[0]), False, ()),
+    ("get_customer_recommendations", lambda db, s: order_crud.get_customer_recommendations(db, s.customer_id), True, ()),
+    ("get_customer_orders", lambda db, s: order_crud.get_customer_orders(db, s.customer_id, cursor=DATE_CURSOR), False, ()),
+    ("get_restaurant_orders", lambda db, s: order_crud.get_restaurant_orders(db, s.restaurant_id, cursor=DATE_CURSOR), False, ()),
+    ("get_restaurant_reviews", lambda db, s: review_crud.get_restaurant_reviews(db, s.restaurant_id, cursor=DATE_CURSOR), False, ()),
+    ("get_customer_reviews", lambda db, s: review_crud.get_customer_reviews(db, s.customer_id, cursor=DATE_CURSOR), False, ()),
+    ("get_restaurant_performance", lambda db, s: analytics_crud.get_restaurant_performance(db, s.restaurant_id), False, ()),
+    ("get_customer_analytics", lambda db, s: analytics_crud.get_customer_analytics(db, s.customer_id), False, ()),
+]
+
+def plan_problems(plan, allow_sort: bool, allowed_scans) -> list:
+    problems = [step for step in plan if (match := FULL_SCAN.search(step)) and match.group(1) not in allowed_scans]
+    if not allow_sort:
+        problems += [step for step in plan if step == TEMP_SORT]
+    return problems
+
+def test_full_scan_pattern():
+    assert FULL_SCAN.search("SCAN menu_items")
+    assert FULL_SCAN.search("SCAN menu_items USING INDEX ix_menu_items_name")
+    assert FULL_SCAN.search("SCAN orders USING COVERING INDEX ix_orders_customer_date")
+    assert not FULL_SCAN.search("SEARCH menu_items USING INDEX ix_menu_items_category_name (category=?)")
+    assert not FULL_SCAN.search("SCAN anon_1")
+    assert not FULL_SCAN.search("SCAN CONSTANT ROW")
+    assert not FULL_SCAN.search("SCAN restaurants_rtree VIRTUAL TABLE INDEX 2:D1B0D3B2")
+
+@pytest.fixture(scope="module")
+async def seeded():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'explain.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade_database)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, menu_size=20)
+        # The ETA queue and recommendation model are process-wide: keep this
+        # database's state out of the other tests
+        eta_engine.forget(restaurant_id)
+        async with session_factory() as db:
+            await order_crud.place_order(db, customer_id, OrderCreate(
+                restaurant_id=restaurant_id,
+                delivery_address="2 Benchmark Avenue",
+                items=[{"menu_item_id": item_id, "quantity": 1} for item_id in item_ids[:3]],
+            ))
+            # Building the recommendation model reads every order line by design
+            await recommender.model().ensure_built(db)
+
+        captured = []
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            # The job claim is an UPDATE around its due-jobs SELECT
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE JOBS")):
+                captured.append((statement, parameters))
+
+        yield SimpleNamespace(
+            engine=engine, session_factory=session_factory, captured=captured,
+            restaurant_id=restaurant_id, customer_id=customer_id, item_ids=item_ids,
+        )
+        eta_engine.forget(restaurant_id)
+        recommender.reset()
+        await engine.dispose()
+
+@pytest.mark.parametrize("label, factory, allow_sort, allowed_scans", [pytest.param(*check, id=check[0]) for check in CHECKS])
+async def test_query_plan_uses_indexes(seeded, label, factory, allow_sort, allowed_scans):
+    seeded.captured.clear()
+    async with seeded.session_factory() as db:
+        await factory(db, seeded)
+    assert seeded.captured, "no statements captured"
+
+    failures = []
+    async with seeded.engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        for statement, parameters in list(seeded.captured):
+            rows = await (await raw.driver_connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)).fetchall()
+            plan = [row[-1] for row in rows]
+            if plan_problems(plan, allow_sort, allowed_scans):
+                failures.append(f"{' | '.join(plan)}\n    {statement}")
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+from sqlalchemy import event
+
+from api.crud.order import stream_restaurant_orders
+from api.db.database import engine
+from api.utils.export import ndjson_stream
+from benchmarks import export_memory
+from benchmarks.common import seed_restaurant, temporary_database
+
+pytestmark = pytest.mark.anyio
+
+# Set in memory as aware datetimes when the order is placed, read back naive
+ETA_FIELDS = {"estimated_ready_time", "estimated_delivery_time"}
+
+def without(row: dict, fields) -> dict:
+    return {key: value for key, value in row.items() if key not in fields}
+
+@pytest.fixture
+async def history(factory):
+    """A restaurant with three orders: two single-line ones and one with two lines."""
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    main = await factory.menu_item(restaurant["id"], price="12.00")
+    side = await factory.menu_item(restaurant["id"], price="3.50", category="Side Dish")
+    orders = [
+        await factory.order(customer["id"], restaurant["id"], [(main["id"], 1)]),
+        await factory.order(customer["id"], restaurant["id"], [(main["id"], 2), (side["id"], 1)]),
+        await factory.order(customer["id"], restaurant["id"], [(side["id"], 3)]),
+    ]
+    return restaurant, orders, main, side
+
+async def test_ndjson_export(client, history):
+    restaurant, orders, main, side = history
+    response = await client.get(f"/restaurants/{restaurant['id']}/orders/export", params={"include_items": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == f'attachment; filename="restaurant-{restaurant["id"]}-orders.ndjson"'
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [order["id"] for order in orders]
+    assert without(lines[1], {"items", *ETA_FIELDS}) == without(orders[1], ETA_FIELDS)
+    assert [(item["menu_item_id"], item["quantity"]) for item in lines[1]["items"]] == [(main["id"], 2), (side["id"], 1)]
+    assert lines[1]["items"][0]["item_price"] == "12.00"
+
+async def test_ndjson_export_without_items(client, history):
+    restaurant, orders, _, _ = history
+    lines = [json.loads(line) for line in (await client.get(f"/restaurants/{restaurant['id']}/orders/export")).text.splitlines()]
+    assert [without(line, ETA_FIELDS) for line in lines] == [without(order, ETA_FIELDS) for order in orders]
+
+async def test_csv_export_has_one_line_per_item(client, history):
+    restaurant, orders, main, side = history
+    response = await client.get(f"/restaurants/{restaurant['id']}/orders/export", params={"format": "csv", "include_items": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(int(row["id"]), int(row["menu_item_id"]), int(row["quantity"])) for row in rows] == [
+        (orders[0]["id"], main["id"], 1),
+        (orders[1]["id"], main["id"], 2),
+        (orders[1]["id"], side["id"], 1),
+        (orders[2]["id"], side["id"], 3),
+    ]
+    # The order's own id and the line's id do not collide
+    assert "item_id" in rows[0] and rows[1]["item_id"] != rows[2]["item_id"]
+    assert rows[0]["order_status"] == "placed"
+    assert rows[1]["total_amount"] == orders[1]["total_amount"]
+
+async def test_export_of_missing_restaurant(client):
+    assert (await client.get("/restaurants/999999/orders/export")).status_code == 404
+
+async def test_stream_reads_in_chunks(client, history, db_session):
+    restaurant, orders, _, _ = history
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with db_session() as db:
+            chunks = [chunk async for chunk in stream_restaurant_orders(db, restaurant["id"], include_items=True, chunk_size=2)]
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert [[order["id"] for order in chunk] for chunk in chunks] == [[orders[0]["id"], orders[1]["id"]], [orders[2]["id"]]]
+    # One cursor over the orders, plus one IN query for the lines of each chunk
+    assert len(statements) == 1 + len(chunks)
+
+async def test_encoder_pulls_one_chunk_per_block():
+    pulled = []
+
+    async def chunks():
+        for n in range(3):
+            pulled.append(n)
+            yield [{"id": n}]
+
+    blocks = ndjson_stream(chunks())
+    assert await blocks.__anext__() == b'{"id":0}\n'
+    # Nothing past the first chunk has been read yet
+    assert pulled == [0]
+    assert [block async for block in blocks] == [b'{"id":1}\n', b'{"id":2}\n']
+
+# Allowed growth in peak RSS from 2k to 20k exported orders. Streaming grows
+# by under 2 MiB (and no further by 200k); holding the whole history grows by
+# about 10 MiB.
+RSS_TOLERANCE = 4 * 2**20
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="reads RSS from /proc")
+async def test_export_memory_does_not_grow_with_history():
+    async with temporary_database(export_memory.SETTINGS) as session_factory:
+        restaurant_id, customer_id, item_ids = await seed_restaurant(session_factory, menu_size=1)
+        peaks = {}
+        for size in (2_000, 20_000):
+            await export_memory.top_up_orders(session_factory, restaurant_id, customer_id, item_ids[0], size)
+            for fmt in ("ndjson", "csv"):
+                peaks[fmt, size] = export_memory.measure_in_fresh_process(session_factory, restaurant_id, fmt, True)[0]
+
+    for fmt in ("ndjson", "csv"):
+        assert peaks[fmt, 20_000] <= peaks[fmt, 2_000] + RSS_TOLERANCE, peaks
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import func, select
+
+from api.crud.analytics import FACET_COLUMNS
+from api.models.menu_item import MenuItem
+from api.utils import search
+
+pytestmark = pytest.mark.anyio
+
+async def live_facets(db_session, q=None, **filters) -> dict:
+    """Facet counts from a GROUP BY over menu_items per facet, each under the other facets' filters."""
+    async with db_session() as db:
+        matching = await search.matching(db, "menu_items", q) if q is not None else None
+        counts = {}
+        for column in FACET_COLUMNS:
+            facet = getattr(MenuItem, column)
+            query = select(facet, func.count()).group_by(facet).order_by(facet)
+            if matching is not None:
+                query = query.where(matching)
+            for other, value in filters.items():
+                if other != column and value is not None:
+                    query = query.where(getattr(MenuItem, other) == value)
+            counts[column] = {
+                value if isinstance(value, str) else str(value).lower(): count
+                for value, count in (await db.execute(query)).all()
+            }
+    return counts
+
+async def faceted(client, **params) -> dict:
+    response = await client.get("/menu-items/search", params={"facets": "true", **params})
+    assert response.status_code == 200, response.text
+    return response.json()["facets"]
+
+@pytest.fixture
+async def menus(client, factory):
+    """Menus changed through every writer that moves items between facet buckets."""
+    restaurant, closing = await factory.restaurant(), await factory.restaurant()
+    await factory.menu_item(restaurant["id"], name="Facet Paneer", category="Main Course", is_vegetarian=True)
+    tofu = await factory.menu_item(restaurant["id"], name="Facet Tofu", category="Appetizer", is_vegetarian=True, is_vegan=True)
+    await factory.menu_item(restaurant["id"], name="Facet Chai", category="Beverage", is_vegetarian=True, is_available=False)
+    gone = await factory.menu_item(restaurant["id"], name="Facet Kebab", category="Snack")
+    for n in range(3):
+        await factory.menu_item(closing["id"], name=f"Facet Closing {n}", category="Dessert")
+
+    assert (await client.put(f"/menu-items/{tofu['id']}", json={"category": "Side Dish", "is_available": False})).status_code == 200
+    response = await client.post(f"/restaurants/{restaurant['id']}/menu-items/bulk", json=[
+        {"name": "Facet Paneer", "price": "9.00", "category": "Main Course", "preparation_time": 10, "is_vegan": True},
+        {"name": "Facet Lassi", "price": "3.00", "category": "Beverage", "preparation_time": 5, "is_vegetarian": True},
+    ])
+    assert response.json() == {"created": 1, "updated": 1, "errors": []}
+    assert (await client.delete(f"/menu-items/{gone['id']}")).status_code == 200
+    assert (await client.delete(f"/restaurants/{closing['id']}")).status_code == 200
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"available_only": "false"},
+    {"vegetarian": "true"},
+    {"category": "Beverage", "vegan": "false"},
+    {"category": "Dessert", "vegetarian": "false", "available_only": "false"},
+])
+async def test_rollup_counts_match_a_live_group_by(client, menus, db_session, filters):
+    expected = await live_facets(
+        db_session,
+        category=filters.get("category"),
+        is_vegetarian={"true": True, "false": False}.get(filters.get("vegetarian")),
+        is_vegan={"true": True, "false": False}.get(filters.get("vegan")),
+        is_available=None if filters.get("available_only") == "false" else True,
+    )
+    assert await faceted(client, **filters) == expected
+
+@pytest.mark.parametrize("filters", [{}, {"category": "Main Course"}, {"vegetarian": "true", "available_only": "false"}])
+async def test_text_search_counts_match_a_live_group_by(client, menus, db_session, filters):
+    expected = await live_facets(
+        db_session, "facet",
+        category=filters.get("category"),
+        is_vegetarian={"true": True}.get(filters.get("vegetarian")),
+        is_available=None if filters.get("available_only") == "false" else True,
+    )
+    assert await faceted(client, q="facet", **filters) == expected
+
+async def test_a_facet_ignores_its_own_filter(client, menus):
+    facets = await faceted(client, q="facet", category="Main Course")
+    # Picking another category would find the lassi
+    assert facets["category"]["Beverage"] >= 1
+    # The other facets count main courses only
+    assert sum(facets["is_vegan"].values()) == facets["category"]["Main Course"]
+
+async def test_facets_only_when_asked(client, menus):
+    page = (await client.get("/menu-items/search", params={"q": "facet"})).json()
+    assert page.get("facets") is None
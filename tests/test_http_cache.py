@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.utils.http_cache import validator_headers
+
+pytestmark = pytest.mark.anyio
+
+async def test_menu_etag_changes_with_a_write_in_the_same_second(client, factory):
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+    first = await client.get(f"/restaurants/{restaurant['id']}/menu")
+    etag = first.headers["etag"]
+
+    assert (await client.get(f"/restaurants/{restaurant['id']}/menu", headers={"If-None-Match": etag})).status_code == 304
+
+    await client.put(f"/menu-items/{item['id']}", json={"price": "11.25"})
+    response = await client.get(f"/restaurants/{restaurant['id']}/menu", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["price"] == "11.25"
+    assert response.headers["etag"] != etag
+
+def test_last_modified_waits_for_its_second_to_pass():
+    now = datetime.now(timezone.utc)
+    # Written within the last second: only the ETag can validate the copy
+    assert "Last-Modified" not in validator_headers('"tag"', now)
+    headers = validator_headers('"tag"', (now - timedelta(seconds=2)).replace(tzinfo=None))
+    assert headers["Last-Modified"] == (now - timedelta(seconds=2)).strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+@pytest.mark.parametrize("kind", ["restaurant", "customer", "menu-item", "menu-item-with-restaurant"])
+async def test_entity_etag_changes_with_a_write_in_the_same_second(client, factory, kind):
+    restaurant = await factory.restaurant()
+    if kind == "restaurant":
+        path, update_path, change = f"/restaurants/{restaurant['id']}", f"/restaurants/{restaurant['id']}", {"description": "Changed"}
+    elif kind == "customer":
+        customer = await factory.customer()
+        path = update_path = f"/customers/{customer['id']}"
+        change = {"name": "Changed Name"}
+    else:
+        item = await factory.menu_item(restaurant["id"])
+        update_path = f"/menu-items/{item['id']}"
+        path = update_path if kind == "menu-item" else f"{update_path}/with-restaurant"
+        change = {"price": "3.75"}
+
+    first = await client.get(path)
+    assert first.status_code == 200
+    assert (await client.get(path, headers={"If-None-Match": first.headers["etag"]})).status_code == 304
+
+    assert (await client.put(update_path, json=change)).status_code == 200
+    second = await client.get(path, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.json() != first.json()
+
+async def test_not_modified_repeats_the_validators(client, factory):
+    customer = await factory.customer()
+    first = await client.get(f"/customers/{customer['id']}")
+    response = await client.get(f"/customers/{customer['id']}", headers={"If-None-Match": f'W/{first.headers["etag"]}, "other"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == first.headers["etag"]
+    assert response.content == b""
+
+async def test_menu_etag_changes_when_an_item_is_deleted(client, factory):
+    restaurant = await factory.restaurant()
+    await factory.menu_item(restaurant["id"])
+    item = await factory.menu_item(restaurant["id"])
+    own = (await client.get(f"/restaurants/{restaurant['id']}")).headers["etag"]
+    etags = {path: (await client.get(f"/restaurants/{restaurant['id']}/{path}")).headers["etag"] for path in ("menu", "with-menu")}
+
+    assert (await client.delete(f"/menu-items/{item['id']}")).status_code == 200
+    for path, etag in etags.items():
+        response = await client.get(f"/restaurants/{restaurant['id']}/{path}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert item["id"] not in [entry["id"] for entry in (response.json() if path == "menu" else response.json()["menu_items"])]
+    # The restaurant's own representation did not change
+    assert (await client.get(f"/restaurants/{restaurant['id']}", headers={"If-None-Match": own})).status_code == 304
+
+async def test_restaurant_change_moves_the_with_menu_etag_only(client, factory):
+    restaurant = await factory.restaurant()
+    await factory.menu_item(restaurant["id"])
+    etags = {path: (await client.get(f"/restaurants/{restaurant['id']}/{path}")).headers["etag"] for path in ("menu", "with-menu")}
+    assert (await client.put(f"/restaurants/{restaurant['id']}", json={"name": "Renamed"})).status_code == 200
+    assert (await client.get(f"/restaurants/{restaurant['id']}/menu", headers={"If-None-Match": etags["menu"]})).status_code == 304
+    assert (await client.get(f"/restaurants/{restaurant['id']}/with-menu", headers={"If-None-Match": etags["with-menu"]})).status_code == 200
+
+async def test_a_reused_id_gets_new_etags(client, factory):
+    # The newest row's id is handed out again once it is deleted
+    first = await factory.customer()
+    etag = (await client.get(f"/customers/{first['id']}")).headers["etag"]
+    assert (await client.delete(f"/customers/{first['id']}")).status_code == 204
+    second = await factory.customer()
+    assert second["id"] == first["id"]
+    response = await client.get(f"/customers/{second['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["email"] == second["email"]
+
+@pytest.mark.parametrize("path", ["/restaurants/999999", "/customers/999999", "/menu-items/999999", "/menu-items/999999/with-restaurant"])
+async def test_conditional_get_of_a_missing_entity(client, path):
+    assert (await client.get(path, headers={"If-None-Match": '"stale"'})).status_code == 404
@@ -0,0 +1,100 @@
+import re
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from api.db.database import engine
+from api.utils import instrumentation
+from api.utils.instrumentation import QueryBudgetExceeded, SQLInstrumentationMiddleware, statement_shape
+
+pytestmark = pytest.mark.anyio
+
+# name{labels} value, as in the Prometheus text exposition format
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+def test_statement_shape_collapses_in_lists():
+    two = "SELECT menu_items.id FROM menu_items WHERE menu_items.id IN (?, ?) AND menu_items.is_available = 1"
+    five = "SELECT menu_items.id FROM menu_items WHERE menu_items.id IN (?, ?, ?, ?, ?) AND menu_items.is_available = 1"
+    assert statement_shape(two) == statement_shape(five)
+    assert "IN (...)" in statement_shape(two)
+    assert statement_shape("SELECT count(*) FROM orders WHERE id = ?") == "SELECT count(*) FROM orders WHERE id = ?"
+
+async def test_route_over_its_budget_raises(client, factory, monkeypatch):
+    customer = await factory.customer()
+    monkeypatch.setitem(instrumentation.QUERY_BUDGETS, "GET /customers/{customer_id}", 0)
+    with pytest.raises(QueryBudgetExceeded, match=r"GET /customers/\{customer_id\}: 1 statements, over the budget of 0"):
+        await client.get(f"/customers/{customer['id']}")
+
+async def test_budget_is_only_counted_outside_strict_mode(client, factory, monkeypatch):
+    customer = await factory.customer()
+    monkeypatch.setitem(instrumentation.QUERY_BUDGETS, "GET /customers/{customer_id}", 0)
+    monkeypatch.setattr(instrumentation, "QUERY_BUDGET_STRICT", False)
+    labels = (("method", "GET"), ("route", "/customers/{customer_id}"))
+    before = instrumentation.metrics.over_budget.series[labels]
+    assert (await client.get(f"/customers/{customer['id']}")).status_code == 200
+    assert instrumentation.metrics.over_budget.series[labels] == before + 1
+
+async def test_repeated_statement_is_reported_as_n_plus_one(client):
+    # One query per id, with IN lists of different lengths: still one shape
+    app = FastAPI()
+
+    @app.get("/lines/{count}")
+    async def lines(count: int):
+        async with engine.connect() as conn:
+            for n in range(1, count + 1):
+                ids = ", ".join(str(i) for i in range(n + 1))
+                await conn.execute(text(f"SELECT id FROM orders WHERE id IN ({ids})"))
+        return {}
+
+    app.add_middleware(SQLInstrumentationMiddleware)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as direct:
+        assert (await direct.get("/lines/2")).status_code == 200
+        with pytest.raises(QueryBudgetExceeded, match=r"3 runs of one statement \(likely N\+1\): SELECT id FROM orders WHERE id IN \(\.\.\.\)"):
+            await direct.get(f"/lines/{instrumentation.REPEATED_STATEMENT_THRESHOLD}")
+
+def test_chunked_export_is_not_flagged():
+    stats = instrumentation.RequestStats(statements=25)
+    stats.shapes["SELECT order_items.order_id FROM order_items WHERE order_items.order_id IN (...)"] = 24
+    assert instrumentation._budget_failures("GET", "/restaurants/{restaurant_id}/orders/export", stats) == []
+    assert instrumentation._budget_failures("GET", "/restaurants/{restaurant_id}/orders", stats)
+
+async def test_metrics_renders_prometheus_text(client, factory):
+    restaurant = await factory.restaurant()
+    await client.get(f"/restaurants/{restaurant['id']}")
+    await client.get("/no-such-route")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert response.text.endswith("\n")
+
+    types, samples = {}, []
+    for line in response.text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("counter", "gauge", "histogram")
+            assert name not in types, f"{name} declared twice"
+            types[name] = kind
+        elif not line.startswith("# HELP "):
+            match = SAMPLE.match(line)
+            assert match, f"not a sample line: {line!r}"
+            float(match.group(3))
+            samples.append((match.group(1), match.group(2) or "", float(match.group(3))))
+
+    for name, labels, value in samples:
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if name not in types else name
+        assert family in types, f"{name} has no TYPE"
+        if types[family] == "counter":
+            assert name.endswith("_total")
+
+    route = 'route="/restaurants/{restaurant_id}"'
+    buckets = [value for name, labels, value in samples
+               if name == "http_request_duration_seconds_bucket" and route in labels and 'method="GET"' in labels]
+    count = next(value for name, labels, value in samples
+                 if name == "http_request_duration_seconds_count" and route in labels and 'method="GET"' in labels)
+    assert buckets == sorted(buckets) and buckets[-1] == count >= 1
+    assert any(name == "http_requests_total" and 'route="(unmatched)"' in labels and 'status="404"' in labels
+               for name, labels, value in samples)
+    assert ("job_queue_pending", "") in {(name, labels) for name, labels, value in samples}
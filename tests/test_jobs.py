@@ -0,0 +1,154 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from api.external_services import jobs
+from api.external_services.jobs import JobPool
+from api.models.job import Job, JobStatus
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def pool(client, run_jobs, db_session, monkeypatch):
+    """A pool of its own, on a migrated queue with no jobs due from other tests."""
+    await run_jobs()
+    monkeypatch.setattr(jobs, "retry_delay", lambda attempts: 0)
+    pool = JobPool(workers=0)
+    pool.session_factory = db_session
+    return pool
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Registers the test handlers; each call appends its payload's "n"."""
+    calls = []
+
+    async def record(db, payload):
+        calls.append(payload["n"])
+        jobs.after_commit(db, lambda: calls.append(("committed", payload["n"])))
+
+    async def fail(db, payload):
+        await record(db, payload)
+        raise ValueError(f"failed {payload['n']}")
+
+    monkeypatch.setitem(jobs._handlers, "test_record", record)
+    monkeypatch.setitem(jobs._handlers, "test_fail", fail)
+    return calls
+
+async def enqueue(db_session, kind: str, n: int) -> int:
+    async with db_session() as db:
+        jobs.enqueue(db, kind, {"n": n})
+        await db.flush()
+        job_id = (await db.execute(select(Job.id).order_by(Job.id.desc()).limit(1))).scalar_one()
+        await db.commit()
+    return job_id
+
+async def get_job(db_session, job_id: int):
+    async with db_session() as db:
+        return await db.get(Job, job_id)
+
+async def test_job_runs_once_its_transaction_commits(pool, calls, db_session, monkeypatch):
+    woken = JobPool(workers=0)
+    woken._wakeup = asyncio.Event()
+    monkeypatch.setattr(jobs, "pool", woken)
+
+    async with db_session() as db:
+        jobs.enqueue(db, "test_record", {"n": 1})
+        await db.flush()
+        await db.rollback()
+    assert not woken._wakeup.is_set()
+    assert await pool.run_due() == 0
+
+    job_id = await enqueue(db_session, "test_record", 2)
+    assert woken._wakeup.is_set()
+    assert await pool.run_due() == 1
+    assert calls == [2, ("committed", 2)]
+    assert await get_job(db_session, job_id) is None
+    assert pool.completed == 1
+
+async def test_failing_job_is_retried_then_marked_failed(pool, calls, db_session, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 3)
+    job_id = await enqueue(db_session, "test_fail", 7)
+
+    await pool.run_due()
+    # The handler's after_commit callbacks never run: its transaction rolled back
+    assert calls == [7, 7, 7]
+    job = await get_job(db_session, job_id)
+    assert (job.status, job.attempts, job.last_error) == (JobStatus.failed, 3, "ValueError: failed 7")
+    assert (pool.retried, pool.exhausted, pool.completed) == (2, 1, 0)
+    # A failed job is not claimed again
+    assert await pool.run_due() == 0
+
+def test_retry_delay_backs_off():
+    assert 0.5 <= jobs.retry_delay(1) <= 1
+    assert 4 <= jobs.retry_delay(4) <= 8
+    assert jobs.retry_delay(30) <= jobs.RETRY_MAX_SECONDS
+
+async def test_expired_lease_is_claimed_again(pool, calls, db_session, monkeypatch):
+    job_id = await enqueue(db_session, "test_record", 3)
+    # The first worker's lease runs out as soon as it is written
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 0)
+    [stalled] = await pool._claim()
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 60)
+
+    other = JobPool(workers=0)
+    other.session_factory = db_session
+    [taken_over] = await other._claim()
+    assert (taken_over.id, taken_over.attempts) == (job_id, 2)
+
+    # The first worker finishes late: its changes are rolled back
+    await pool._run(stalled)
+    assert pool.abandoned == 1 and pool.completed == 0
+    assert (await get_job(db_session, job_id)).status == JobStatus.running
+
+    await other._run(taken_over)
+    assert other.completed == 1
+    assert await get_job(db_session, job_id) is None
+    assert calls == [3, 3, ("committed", 3)]
+
+async def test_worker_backs_off_on_database_errors(pool, calls, db_session, monkeypatch, caplog):
+    claims = 0
+    real_claim = pool._claim
+
+    async def flaky_claim(limit=jobs.CLAIM_BATCH):
+        nonlocal claims
+        claims += 1
+        if claims <= 2:
+            raise OperationalError("SELECT 1", {}, Exception("database is locked"))
+        return await real_claim(limit)
+
+    monkeypatch.setattr(pool, "_claim", flaky_claim)
+    await enqueue(db_session, "test_record", 4)
+    pool.workers = 1
+    with caplog.at_level(logging.ERROR, logger=jobs.__name__):
+        pool.start(db_session)
+        try:
+            for _ in range(100):
+                if ("committed", 4) in calls:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+
+    assert calls == [4, ("committed", 4)]
+    assert [record.getMessage() for record in caplog.records] == [
+        "Job worker could not reach the database (1 failures in a row)",
+        "Job worker could not reach the database (2 failures in a row)",
+    ]
+
+async def test_worker_logs_and_stops_on_other_errors(pool, db_session, monkeypatch, caplog):
+    async def broken_claim(limit=jobs.CLAIM_BATCH):
+        raise TypeError("bad claim")
+
+    monkeypatch.setattr(pool, "_claim", broken_claim)
+    pool.workers = 1
+    with caplog.at_level(logging.ERROR, logger=jobs.__name__):
+        pool.start(db_session)
+        [task] = pool._tasks
+        with pytest.raises(TypeError, match="bad claim"):
+            await task
+    assert pool.stats()["workers"] == 0
+    assert caplog.records[0].getMessage() == "Job worker stopped"
+    await pool.stop()
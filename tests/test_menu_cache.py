@@ -0,0 +1,122 @@
+import pytest
+
+from api.utils.cache import MenuCache, menu_cache
+
+pytestmark = pytest.mark.anyio
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def fill(cache: MenuCache, kind: str, restaurant_id: int, payload):
+    cache.set(kind, restaurant_id, payload, cache.generation(restaurant_id))
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = MenuCache(ttl_seconds=10, clock=clock)
+    fill(cache, "menu", 1, b"[]")
+    clock.now = 9.9
+    assert cache.get("menu", 1) == b"[]"
+    clock.now = 10
+    assert cache.get("menu", 1) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "evictions": 0, "expirations": 1, "invalidations": 0}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MenuCache(max_entries=2)
+    fill(cache, "menu", 1, "one")
+    fill(cache, "menu", 2, "two")
+    cache.get("menu", 1)
+    fill(cache, "menu", 3, "three")
+    assert [cache.get("menu", n) for n in (1, 2, 3)] == ["one", None, "three"]
+    assert cache.evictions == 1
+
+def test_invalidation_drops_every_kind_of_one_restaurant():
+    cache = MenuCache()
+    for kind in ("menu", "with-menu"):
+        fill(cache, kind, 1, kind)
+        fill(cache, kind, 2, kind)
+    cache.invalidate(1)
+    assert [cache.get(kind, 1) for kind in ("menu", "with-menu")] == [None, None]
+    assert [cache.get(kind, 2) for kind in ("menu", "with-menu")] == ["menu", "with-menu"]
+
+def test_load_racing_a_write_is_not_stored():
+    cache = MenuCache()
+    generation = cache.generation(1)
+    # A write commits and invalidates while the reader is still loading the old menu
+    cache.invalidate(1)
+    cache.set("menu", 1, "before the write", generation)
+    assert cache.get("menu", 1) is None
+    fill(cache, "menu", 1, "after the write")
+    assert cache.get("menu", 1) == "after the write"
+
+def test_clear_also_fences_loads_in_flight():
+    cache = MenuCache()
+    generation = cache.generation(1)
+    fill(cache, "menu", 2, "two")
+    cache.clear()
+    cache.set("menu", 1, "before the clear", generation)
+    assert cache.get("menu", 1) is None and cache.get("menu", 2) is None
+
+@pytest.fixture
+async def menu(client, factory):
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"], name="Masala Dosa", price="8.00")
+    return restaurant, item
+
+async def cached_get(client, path: str):
+    """Fetch `path` twice, checking the second read came from the cache."""
+    first = await client.get(path)
+    hits = menu_cache.hits
+    second = await client.get(path)
+    assert menu_cache.hits == hits + 1
+    assert second.content == first.content
+    return second.json()
+
+async def test_menu_is_served_from_the_cache(client, menu):
+    restaurant, item = menu
+    assert [entry["id"] for entry in await cached_get(client, f"/restaurants/{restaurant['id']}/menu")] == [item["id"]]
+    assert (await cached_get(client, f"/restaurants/{restaurant['id']}/with-menu"))["menu_items"][0]["id"] == item["id"]
+
+async def test_item_update_reaches_the_menu(client, menu):
+    restaurant, item = menu
+    await cached_get(client, f"/restaurants/{restaurant['id']}/menu")
+    assert (await client.put(f"/menu-items/{item['id']}", json={"price": "9.25"})).status_code == 200
+    assert [entry["price"] for entry in (await client.get(f"/restaurants/{restaurant['id']}/menu")).json()] == ["9.25"]
+
+async def test_item_create_and_delete_reach_the_menu(client, factory, menu):
+    restaurant, item = menu
+    path = f"/restaurants/{restaurant['id']}/menu"
+    await cached_get(client, path)
+    added = await factory.menu_item(restaurant["id"])
+    assert {entry["id"] for entry in (await cached_get(client, path))} == {item["id"], added["id"]}
+    assert (await client.delete(f"/menu-items/{item['id']}")).status_code == 200
+    assert [entry["id"] for entry in (await client.get(path)).json()] == [added["id"]]
+
+async def test_bulk_upsert_reaches_the_menu(client, menu):
+    restaurant, item = menu
+    path = f"/restaurants/{restaurant['id']}/menu"
+    await cached_get(client, path)
+    response = await client.post(f"/restaurants/{restaurant['id']}/menu-items/bulk", json=[
+        {"name": "Masala Dosa", "price": "8.50", "category": "Main Course", "preparation_time": 10},
+        {"name": "Filter Coffee", "price": "2.00", "category": "Beverage", "preparation_time": 5},
+    ])
+    assert response.json() == {"created": 1, "updated": 1, "errors": []}
+    assert sorted((entry["name"], entry["price"]) for entry in (await client.get(path)).json()) == [
+        ("Filter Coffee", "2.00"), ("Masala Dosa", "8.50"),
+    ]
+
+async def test_restaurant_update_reaches_the_with_menu_payload(client, menu):
+    restaurant, _ = menu
+    path = f"/restaurants/{restaurant['id']}/with-menu"
+    await cached_get(client, path)
+    assert (await client.put(f"/restaurants/{restaurant['id']}", json={"cuisine_type": "Kerala"})).status_code == 200
+    assert (await client.get(path)).json()["cuisine_type"] == "Kerala"
+
+async def test_deleted_restaurant_menu_is_gone(client, menu):
+    restaurant, _ = menu
+    await cached_get(client, f"/restaurants/{restaurant['id']}/menu")
+    assert (await client.delete(f"/restaurants/{restaurant['id']}")).status_code == 200
+    assert (await client.get(f"/restaurants/{restaurant['id']}/menu")).status_code == 404
@@ -0,0 +1,127 @@
+import itertools
+import math
+
+import pytest
+
+from api.utils import geo
+
+pytestmark = pytest.mark.anyio
+
+# Each test searches around its own spot, away from every other test's restaurants
+_centres = itertools.count()
+
+def offset(latitude: float, longitude: float, north_km: float = 0.0, east_km: float = 0.0):
+    return (latitude + north_km / geo.KM_PER_DEGREE,
+            longitude + east_km / (geo.KM_PER_DEGREE * math.cos(math.radians(latitude))))
+
+def test_haversine():
+    assert geo.haversine_km(12.0, 77.0, 12.0, 77.0) == 0
+    assert geo.haversine_km(0.0, 0.0, 1.0, 0.0) == pytest.approx(geo.KM_PER_DEGREE)
+    # Across the antimeridian the short way round
+    assert geo.haversine_km(0.0, 179.5, 0.0, -179.5) == pytest.approx(geo.KM_PER_DEGREE)
+
+def destination(latitude: float, longitude: float, bearing: float, km: float):
+    """The point `km` from (latitude, longitude) heading `bearing` degrees from north."""
+    lat, angle, arc = math.radians(latitude), math.radians(bearing), km / geo.EARTH_RADIUS_KM
+    lat2 = math.asin(math.sin(lat) * math.cos(arc) + math.cos(lat) * math.sin(arc) * math.cos(angle))
+    lon2 = longitude + math.degrees(math.atan2(math.sin(angle) * math.sin(arc) * math.cos(lat),
+                                               math.cos(arc) - math.sin(lat) * math.sin(lat2)))
+    return math.degrees(lat2), (lon2 + 180) % 360 - 180
+
+@pytest.mark.parametrize("latitude, longitude", [(12.97, 77.59), (-33.9, 151.2), (64.1, -21.9), (0.0, 179.99), (89.99, 0.0)])
+def test_bounding_boxes_cover_the_circle(latitude, longitude):
+    boxes = geo.bounding_boxes(latitude, longitude, 5.0)
+    for bearing in range(0, 360, 15):
+        lat2, lon2 = destination(latitude, longitude, bearing, 4.99)
+        assert geo.haversine_km(latitude, longitude, lat2, lon2) < 5.0
+        assert any(b[0] <= lat2 <= b[1] and b[2] <= lon2 <= b[3] for b in boxes), (bearing, lat2, lon2)
+
+def test_bounding_boxes_split_at_the_antimeridian():
+    boxes = geo.bounding_boxes(0.0, 179.99, 5.0)
+    assert len(boxes) == 2
+    assert boxes[0][3] == 180.0 and boxes[1][2] == -180.0
+
+@pytest.fixture
+async def spot(client, factory):
+    """A centre point and a coroutine function placing a restaurant `north_km`/`east_km` from it."""
+    centre = (-40.0 + next(_centres) * 0.5, 60.0)
+
+    async def place(north_km: float = 0.0, east_km: float = 0.0, **fields) -> dict:
+        latitude, longitude = offset(*centre, north_km, east_km)
+        return await factory.restaurant(latitude=latitude, longitude=longitude, **fields)
+    return centre, place
+
+async def nearby(client, centre, **params) -> list:
+    response = await client.get("/restaurants/nearby", params={"latitude": centre[0], "longitude": centre[1], **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.fixture(params=["rtree", "scan"])
+def index(request, monkeypatch):
+    """Runs the test with the R*Tree and again with a scan of the coordinate columns."""
+    if request.param == "scan":
+        monkeypatch.setattr(geo, "_has_rtree", False)
+    else:
+        geo.reset()
+    yield request.param
+    geo.reset()
+
+async def test_nearest_first_with_distances(client, spot, index):
+    centre, place = spot
+    far = await place(east_km=4.0)
+    near = await place(north_km=0.1)
+    middle = await place(north_km=-1.5, east_km=1.0)
+    await place(north_km=6.0)  # outside the default 5 km
+
+    found = await nearby(client, centre)
+    assert [r["id"] for r in found] == [near["id"], middle["id"], far["id"]]
+    for restaurant in found:
+        assert restaurant["distance_km"] == round(
+            geo.haversine_km(*centre, restaurant["latitude"], restaurant["longitude"]), 3)
+    assert [r["distance_km"] for r in found] == pytest.approx([0.1, math.hypot(1.5, 1.0), 4.0], abs=0.01)
+
+async def test_k_and_max_distance(client, spot, index):
+    centre, place = spot
+    ids = [(await place(east_km=km))["id"] for km in (0.5, 1.0, 2.0, 8.0)]
+    assert [r["id"] for r in await nearby(client, centre, k=2)] == ids[:2]
+    assert [r["id"] for r in await nearby(client, centre, max_distance_km=1.5)] == ids[:2]
+    # Fewer than k in the neighbourhood: the second query searches the whole radius
+    assert [r["id"] for r in await nearby(client, centre, k=4, max_distance_km=10)] == ids
+    assert await nearby(client, centre, max_distance_km=0.1) == []
+
+async def test_filters(client, spot, index):
+    centre, place = spot
+    kept = await place(east_km=1.0, cuisine_type="Kerala", rating=4.5)
+    await place(east_km=0.5, cuisine_type="Kerala", rating=3.0)
+    await place(east_km=0.2, cuisine_type="Punjabi", rating=5.0)
+    await place(east_km=0.1, cuisine_type="Kerala", rating=5.0, is_active=False)
+    assert [r["id"] for r in await nearby(client, centre, cuisine_type="Kerala", min_rating=4)] == [kept["id"]]
+
+async def test_moved_restaurant_is_found_at_its_new_place(client, spot, index):
+    centre, place = spot
+    restaurant = await place(north_km=20.0)
+    assert await nearby(client, centre) == []
+    latitude, longitude = offset(*centre, east_km=2.0)
+    response = await client.put(f"/restaurants/{restaurant['id']}", json={"latitude": latitude, "longitude": longitude})
+    assert response.status_code == 200
+    assert [r["id"] for r in await nearby(client, centre)] == [restaurant["id"]]
+
+async def test_across_the_antimeridian(client, factory, index):
+    latitude = 20.0 + next(_centres)
+    restaurant = await factory.restaurant(latitude=latitude, longitude=-179.99)
+    found = await nearby(client, (latitude, 179.99))
+    assert [r["id"] for r in found] == [restaurant["id"]]
+    assert found[0]["distance_km"] == pytest.approx(0.02 * geo.KM_PER_DEGREE * math.cos(math.radians(latitude)), abs=0.01)
+
+async def test_around_a_customer(client, factory, spot):
+    centre, place = spot
+    restaurant = await place(east_km=1.0)
+    customer = await factory.customer(latitude=centre[0], longitude=centre[1])
+    found = (await client.get("/restaurants/nearby", params={"customer_id": customer["id"]})).json()
+    assert [r["id"] for r in found] == [restaurant["id"]]
+
+    nowhere = await factory.customer()
+    response = await client.get("/restaurants/nearby", params={"customer_id": nowhere["id"]})
+    assert (response.status_code, response.json()["detail"]) == (400, "Customer has no coordinates")
+    assert (await client.get("/restaurants/nearby", params={"customer_id": 999999})).status_code == 404
+    assert (await client.get("/restaurants/nearby", params={"latitude": 1.0})).status_code == 400
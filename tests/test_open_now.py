@@ -0,0 +1,105 @@
+import itertools
+from datetime import time
+
+import pytest
+from sqlalchemy import select
+
+from api.crud import restaurant as restaurant_crud
+from api.models.restaurant import RestaurantOpenWindow
+from api.utils.schedule import MINUTES_PER_DAY, open_windows
+
+pytestmark = pytest.mark.anyio
+
+_cuisines = (f"Open Now {n}" for n in itertools.count(1))
+
+@pytest.mark.parametrize("opening, closing, windows", [
+    (time(9, 0), time(23, 0), [(540, 1380)]),
+    (time(18, 0), time(1, 30), [(1080, MINUTES_PER_DAY), (0, 90)]),
+    (time(22, 0), time(0, 0), [(1320, MINUTES_PER_DAY)]),
+    (time(0, 0), time(6, 0), [(0, 360)]),
+    (time(10, 0), time(10, 0), [(0, MINUTES_PER_DAY)]),
+])
+def test_open_windows(opening, closing, windows):
+    assert open_windows(opening, closing) == windows
+
+@pytest.fixture
+async def late(client, factory):
+    """Restaurants with one cuisine of their own: a late-night one open 18:00 to 01:30 and a day one."""
+    cuisine = next(_cuisines)
+    night = await factory.restaurant(cuisine_type=cuisine, opening_time="18:00", closing_time="01:30")
+    day = await factory.restaurant(cuisine_type=cuisine, opening_time="09:00", closing_time="23:00")
+    return cuisine, night, day
+
+async def open_at(client, cuisine: str, at: str, **params) -> list:
+    response = await client.get("/restaurants/open", params={"at": at, "cuisine_type": cuisine, **params})
+    assert response.status_code == 200, response.text
+    return [restaurant["id"] for restaurant in response.json()["items"]]
+
+@pytest.fixture(params=["sorted", "walked"])
+def result_size(request, monkeypatch):
+    """Runs the test with the small result set path and again with the one for large result sets."""
+    if request.param == "walked":
+        monkeypatch.setattr(restaurant_crud, "OPEN_NOW_SORT_LIMIT", 0)
+    return request.param
+
+@pytest.mark.parametrize("at, open_names", [
+    ("17:59", ["day"]),
+    ("18:00", ["day", "night"]),
+    ("23:00", ["night"]),
+    ("23:30", ["night"]),
+    ("00:00", ["night"]),
+    ("01:29", ["night"]),
+    ("01:30", []),
+    ("02:00", []),
+    ("09:00", ["day"]),
+])
+async def test_open_across_midnight(client, late, result_size, at, open_names):
+    cuisine, night, day = late
+    ids = {"night": night["id"], "day": day["id"]}
+    assert sorted(await open_at(client, cuisine, at)) == sorted(ids[name] for name in open_names)
+
+async def test_hours_update_moves_the_windows(client, late, db_session):
+    cuisine, night, _ = late
+    response = await client.put(f"/restaurants/{night['id']}", json={"opening_time": "06:00", "closing_time": "11:00"})
+    assert response.status_code == 200
+    assert night["id"] not in await open_at(client, cuisine, "23:30")
+    assert night["id"] in await open_at(client, cuisine, "06:00")
+    async with db_session() as db:
+        windows = (await db.execute(
+            select(RestaurantOpenWindow.open_minute, RestaurantOpenWindow.close_minute)
+            .where(RestaurantOpenWindow.restaurant_id == night["id"])
+        )).all()
+    assert [tuple(window) for window in windows] == [(360, 660)]
+
+    # Only one bound changed: the window still follows both
+    assert (await client.put(f"/restaurants/{night['id']}", json={"closing_time": "02:00"})).status_code == 200
+    assert night["id"] in await open_at(client, cuisine, "01:00")
+
+async def test_filters(client, factory, late):
+    cuisine, night, _ = late
+    assert (await client.put(f"/restaurants/{night['id']}", json={"is_active": False})).status_code == 200
+    assert await open_at(client, cuisine, "23:30") == []
+    assert await open_at(client, cuisine, "23:30", active_only=False) == [night["id"]]
+    rated = await factory.restaurant(cuisine_type=cuisine, opening_time="20:00", closing_time="02:00", rating=4.5)
+    assert await open_at(client, cuisine, "23:30", min_rating=4) == [rated["id"]]
+
+async def test_pages_by_name(client, factory, result_size):
+    cuisine = next(_cuisines)
+    for name in ("Zeta Night", "Alpha Night", "Mu Night"):
+        await factory.restaurant(name=name, cuisine_type=cuisine, opening_time="20:00", closing_time="03:00")
+    names, cursor = [], None
+    while True:
+        params = {"at": "02:15", "cuisine_type": cuisine, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/restaurants/open", params=params)).json()
+        names.extend(restaurant["name"] for restaurant in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == ["Alpha Night", "Mu Night", "Zeta Night"]
+
+async def test_rebuild_reproduces_the_windows(client, late, db_session):
+    query = select(RestaurantOpenWindow.restaurant_id, RestaurantOpenWindow.open_minute, RestaurantOpenWindow.close_minute)
+    async with db_session() as db:
+        before = sorted((await db.execute(query)).all())
+        await restaurant_crud.rebuild_open_windows(db)
+        assert sorted((await db.execute(query)).all()) == before
@@ -0,0 +1,74 @@
+import pytest
+
+from api.models.order import ORDER_STATUS_TRANSITIONS, OrderStatus, status_predecessors
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def placed(factory):
+    """Places an order; returns a coroutine function placing another."""
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+
+    async def place() -> dict:
+        return await factory.order(customer["id"], restaurant["id"], [(item["id"], 1)])
+    return place
+
+def test_predecessors_invert_the_transitions():
+    for status in OrderStatus:
+        assert set(status_predecessors(status)) == {source for source, targets in ORDER_STATUS_TRANSITIONS.items() if status in targets}
+    assert status_predecessors(OrderStatus.placed) == []
+    assert status_predecessors(OrderStatus.delivered) == [OrderStatus.out_for_delivery]
+
+async def test_order_moves_through_its_lifecycle(client, factory, placed):
+    order = await placed()
+    assert order["order_status"] == "placed" and order["delivery_time"] is None
+    for status in ("confirmed", "preparing", "out_for_delivery"):
+        moved = await factory.set_status(order["id"], status)
+        assert moved["order_status"] == status and moved["delivery_time"] is None
+
+    delivered = await factory.set_status(order["id"], "delivered")
+    assert delivered["order_status"] == "delivered"
+    assert delivered["delivery_time"] is not None
+    fetched = (await client.get(f"/orders/{order['id']}")).json()
+    assert fetched["order_status"] == "delivered" and fetched["delivery_time"] is not None
+
+@pytest.mark.parametrize("reached, requested", [
+    ((), "preparing"),
+    ((), "delivered"),
+    (("confirmed",), "out_for_delivery"),
+    (("confirmed", "preparing", "out_for_delivery"), "cancelled"),
+    (("confirmed", "preparing", "out_for_delivery", "delivered"), "cancelled"),
+    (("cancelled",), "confirmed"),
+    (("confirmed",), "confirmed"),
+])
+async def test_illegal_transition_is_a_conflict(client, factory, placed, reached, requested):
+    order = await placed()
+    if reached:
+        await factory.set_status(order["id"], *reached)
+    current = reached[-1] if reached else "placed"
+
+    response = await client.put(f"/orders/{order['id']}/status", json={"status": requested})
+    assert response.status_code == 409
+    assert response.json()["detail"] == f"Order {order['id']} cannot move from '{current}' to '{requested}'"
+    assert (await client.get(f"/orders/{order['id']}")).json()["order_status"] == current
+
+async def test_status_of_missing_order(client):
+    response = await client.put("/orders/999999/status", json={"status": "confirmed"})
+    assert response.status_code == 404
+
+async def test_bulk_transition_reports_conflicts_and_missing_orders(client, factory, placed):
+    first, second, confirmed = await placed(), await placed(), await placed()
+    await factory.set_status(confirmed["id"], "confirmed")
+
+    response = await client.put("/orders/status", json={
+        "order_ids": [first["id"], confirmed["id"], 999999, second["id"], first["id"]],
+        "status": "confirmed",
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert sorted(order["id"] for order in result["updated"]) == [first["id"], second["id"]]
+    assert all(order["order_status"] == "confirmed" for order in result["updated"])
+    assert result["not_found"] == [999999]
+    assert result["conflicts"] == [{"id": confirmed["id"], "order_status": "confirmed"}]
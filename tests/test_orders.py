@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from api.models.job import Job
+
+pytestmark = pytest.mark.anyio
+
+async def test_place_order_writes_every_line(client, factory):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    main = await factory.menu_item(restaurant["id"], price="12.00")
+    side = await factory.menu_item(restaurant["id"], price="3.50", category="Side Dish")
+
+    order = await factory.order(customer["id"], restaurant["id"], [(main["id"], 1), (side["id"], 2)])
+    assert Decimal(order["total_amount"]) == Decimal("19.00")
+
+    details = (await client.get(f"/orders/{order['id']}")).json()
+    assert sorted((line["menu_item_id"], line["quantity"]) for line in details["items"]) == [(main["id"], 1), (side["id"], 2)]
+
+async def test_place_order_with_an_empty_basket(client, factory, run_jobs, db_session):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+
+    order = await factory.order(customer["id"], restaurant["id"], [])
+    assert Decimal(order["total_amount"]) == 0
+    assert (await client.get(f"/orders/{order['id']}")).json()["items"] == []
+
+    # Its background rollups go through too: a job waiting to retry or failed is left behind
+    assert await run_jobs()
+    async with db_session() as db:
+        left = (await db.execute(
+            select(Job.kind, Job.status, Job.last_error).where(Job.payload["order_id"].as_integer() == order["id"])
+        )).all()
+    assert left == []
+    assert (await client.get(f"/restaurants/{restaurant['id']}/analytics")).json()["total_orders"] == 1
+    assert (await client.get(f"/customers/{customer['id']}/analytics")).json()["total_orders"] == 1
+
+async def test_an_ordered_menu_item_is_not_deleted(client, factory):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+    order = await factory.order(customer["id"], restaurant["id"], [(item["id"], 1)])
+
+    response = await client.delete(f"/menu-items/{item['id']}")
+    assert response.status_code == 409
+    assert (await client.get(f"/menu-items/{item['id']}")).status_code == 200
+    details = (await client.get(f"/orders/{order['id']}")).json()
+    assert [line["menu_item_id"] for line in details["items"]] == [item["id"]]
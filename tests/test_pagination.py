@@ -0,0 +1,79 @@
+from datetime import datetime, time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from api.models.order import Order
+from api.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+async def pages(client, path: str, limit: int, **params) -> list:
+    """Every page of a list endpoint, following next_cursor."""
+    result, cursor = [], None
+    while True:
+        response = await client.get(path, params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= limit
+        result.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return result
+
+def test_cursor_round_trip():
+    values = ["Dosa", 7, datetime(2024, 5, 1, 12, 30), time(23, 30), Decimal("9.50"), None]
+    assert decode_cursor(encode_cursor(values)) == values
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_cursor([1])[:-2] + "!!",
+    "W3siZHQiOiJ5ZXN0ZXJkYXkifV0",  # [{"dt": "yesterday"}]
+])
+def test_malformed_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+async def test_orders_with_equal_dates_page_without_gaps_or_repeats(client, factory, db_session):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+    ids = [(await factory.order(customer["id"], restaurant["id"], [(item["id"], 1)]))["id"] for _ in range(7)]
+    async with db_session() as db:
+        await db.execute(update(Order).where(Order.id.in_(ids[:5])).values(order_date=datetime(2024, 5, 1, 12, 0)))
+        await db.execute(update(Order).where(Order.id.in_(ids[5:])).values(order_date=datetime(2024, 5, 2, 9, 0)))
+        await db.commit()
+
+    # Newest first; orders placed at the same moment, by id
+    expected = ids[6:4:-1] + ids[4::-1]
+    for path in (f"/customers/{customer['id']}/orders", f"/restaurants/{restaurant['id']}/orders"):
+        result = await pages(client, path, limit=2)
+        assert [len(page) for page in result] == [2, 2, 2, 1]
+        assert [order["id"] for page in result for order in page] == expected
+
+async def test_restaurants_with_equal_names_page_by_id(client, factory):
+    created = [(await factory.restaurant(name="Zzz Same Name"))["id"] for _ in range(5)]
+    listed = [restaurant["id"] for page in await pages(client, "/restaurants/", limit=3) for restaurant in page]
+    assert len(listed) == len(set(listed))
+    assert [restaurant_id for restaurant_id in listed if restaurant_id in created] == created
+
+async def test_last_page_has_no_cursor(client, factory):
+    customer = await factory.customer()
+    page = (await client.get(f"/customers/{customer['id']}/orders", params={"limit": 5})).json()
+    assert page == {"items": [], "next_cursor": None}
+
+@pytest.mark.parametrize("path", ["/customers/", "/restaurants/", "/menu-items/", "/menu-items/search"])
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor([1, 2, 3, 4])])
+async def test_invalid_cursor_is_a_bad_request(client, path, cursor):
+    response = await client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid pagination cursor"}
+
+async def test_invalid_cursor_on_nested_lists(client, factory):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    for path in (f"/customers/{customer['id']}/orders", f"/restaurants/{restaurant['id']}/orders",
+                 f"/restaurants/{restaurant['id']}/reviews", f"/customers/{customer['id']}/reviews"):
+        response = await client.get(path, params={"cursor": "%%%"})
+        assert response.status_code == 400, path
@@ -0,0 +1,171 @@
+"""
+Per-endpoint SQL statement counts, checked against a budget.
+
+Each case sets up its own customer, restaurant, menu items and pending order,
+then counts the statements its request sends (transaction control and PRAGMAs
+excluded), so a reintroduced existence check or lazy load fails the case. The
+requests also run in strict mode (see conftest), which holds every route to its
+QUERY_BUDGETS entry and rejects statements repeated per row.
+"""
+import itertools
+
+import pytest
+from sqlalchemy import event
+
+from api.db.database import engine, read_engine
+from api.utils import recommender
+from api.utils.cache import menu_cache
+from api.utils.eta import eta_engine
+
+pytestmark = pytest.mark.anyio
+
+def _status(status):
+    return [("PUT", "/orders/{order_id}/status", {"status": status})]
+
+CONFIRM, PREPARE, DISPATCH = _status("confirmed"), _status("preparing"), _status("out_for_delivery")
+DELIVER = CONFIRM + PREPARE + DISPATCH + _status("delivered")
+REVIEW = [("POST", "/orders/{order_id}/review", {"rating": 4, "comment": "Counted"})]
+REORDER = [("POST", "/customers/{customer_id}/orders/", {"restaurant_id": "{restaurant_id}", "delivery_address": "2 Benchmark Avenue", "items": [{"menu_item_id": "{item_id}", "quantity": 1}]})]
+
+# (label, method, path template, json body, expected status, statement budget[, uncounted setup requests])
+ENDPOINTS = [
+    ("create customer", "POST", "/customers/", {"name": "Query Count", "email": "new{n}@example.com", "phone_number": "+93{n:010d}", "address": "2 Benchmark Avenue"}, 201, 1),
+    ("create customer (duplicate email)", "POST", "/customers/", {"name": "Query Count", "email": "{customer_email}", "phone_number": "+94{n:010d}", "address": "2 Benchmark Avenue"}, 400, 1),
+    ("get restaurant", "GET", "/restaurants/{restaurant_id}", None, 200, 1),
+    ("get customer", "GET", "/customers/{customer_id}", None, 200, 1),
+    # If-None-Match with the ETag of a current copy, or of an outdated one
+    ("get restaurant (current copy)", "GET", "/restaurants/{restaurant_id}", None, 304, 1),
+    ("get restaurant (stale copy)", "GET", "/restaurants/{restaurant_id}", None, 200, 2),
+    ("get customer (current copy)", "GET", "/customers/{customer_id}", None, 304, 1),
+    ("get customer (stale copy)", "GET", "/customers/{customer_id}", None, 200, 2),
+    ("get menu item (current copy)", "GET", "/menu-items/{item_id}", None, 304, 1),
+    ("get menu item with restaurant (current copy)", "GET", "/menu-items/{item_id}/with-restaurant", None, 304, 1),
+    ("get menu item with restaurant (stale copy)", "GET", "/menu-items/{item_id}/with-restaurant", None, 200, 2),
+    ("get menu (cold, current copy)", "GET", "/restaurants/{restaurant_id}/menu", None, 304, 1),
+    ("get restaurant with menu (cold, current copy)", "GET", "/restaurants/{restaurant_id}/with-menu", None, 304, 1),
+    ("update customer", "PUT", "/customers/{customer_id}", {"name": "Query Counted"}, 200, 1),
+    ("update restaurant", "PUT", "/restaurants/{restaurant_id}", {"description": "Counted"}, 200, 1),
+    ("nearby restaurants (whole radius)", "GET", "/restaurants/nearby?latitude=-75&longitude=10&k=5", None, 200, 2),
+    ("open restaurants", "GET", "/restaurants/open?at=23:30", None, 200, 2),
+    ("update restaurant hours", "PUT", "/restaurants/{restaurant_id}", {"closing_time": "01:30"}, 200, 3),
+    ("update restaurant (missing)", "PUT", "/restaurants/999999", {"description": "Counted"}, 404, 1),
+    ("add menu item", "POST", "/restaurants/{restaurant_id}/menu-items/", {"name": "Counted Dish {n}", "price": "4.50", "category": "Snack", "preparation_time": 5}, 200, 4),
+    ("add menu item (missing restaurant)", "POST", "/restaurants/999999/menu-items/", {"name": "Counted Dish {n}", "price": "4.50", "category": "Snack", "preparation_time": 5}, 404, 1),
+    ("create menu item", "POST", "/menu-items/?restaurant_id={restaurant_id}", {"name": "Counted Dish {n}", "price": "4.50", "category": "Snack", "preparation_time": 5}, 200, 4),
+    ("bulk upsert menu items", "POST", "/restaurants/{restaurant_id}/menu-items/bulk", [{"name": "Counted Dish {n}", "price": "4.50", "category": "Snack", "preparation_time": 5}, {"name": "{item_name}", "price": "6.75", "category": "Main Course", "preparation_time": 10}], 200, 8),
+    ("bulk upsert menu items (missing restaurant)", "POST", "/restaurants/999999/menu-items/bulk", [{"name": "Counted Dish {n}", "price": "4.50", "category": "Snack", "preparation_time": 5}], 404, 1),
+    ("bulk upsert menu items (missing restaurant, no valid rows)", "POST", "/restaurants/999999/menu-items/bulk?partial=true", [{"name": "Counted Dish {n}"}], 404, 1),
+    ("update menu item", "PUT", "/menu-items/{item_id}", {"price": "5.25"}, 200, 2),
+    ("update menu item facets", "PUT", "/menu-items/{item_id}", {"is_vegetarian": True}, 200, 4),
+    ("search menu items", "GET", "/menu-items/search?q=counted", None, 200, 1),
+    ("faceted menu search", "GET", "/menu-items/search?vegetarian=true&facets=true", None, 200, 2),
+    ("faceted menu text search", "GET", "/menu-items/search?q=counted&category=Snack&facets=true", None, 200, 2),
+    ("search restaurants", "GET", "/restaurants/search?q=query", None, 200, 1),
+    ("get menu item with restaurant", "GET", "/menu-items/{item_id}/with-restaurant", None, 200, 1),
+    ("get menu (cold)", "GET", "/restaurants/{restaurant_id}/menu", None, 200, 2),
+    ("get menu (missing restaurant)", "GET", "/restaurants/999999/menu", None, 404, 1),
+    ("place order", "POST", "/customers/{customer_id}/orders/", {"restaurant_id": "{restaurant_id}", "delivery_address": "2 Benchmark Avenue", "items": [{"menu_item_id": "{item_id}", "quantity": 2}]}, 201, 4),
+    ("place order (several items)", "POST", "/customers/{customer_id}/orders/", {"restaurant_id": "{restaurant_id}", "delivery_address": "2 Benchmark Avenue", "items": [{"menu_item_id": "{item_id}", "quantity": 1}, {"menu_item_id": "{item2_id}", "quantity": 2, "special_requests": "Extra spicy"}]}, 201, 4),
+    ("place order (missing customer)", "POST", "/customers/999999/orders/", {"restaurant_id": "{restaurant_id}", "delivery_address": "2 Benchmark Avenue", "items": [{"menu_item_id": "{item_id}", "quantity": 2}]}, 404, 1),
+    # A cold model's build reads order_items straight from the DB-API cursor, outside these counts
+    ("menu item recommendations (cold)", "GET", "/menu-items/{item_id}/recommendations", None, 200, 1),
+    ("menu item recommendations", "GET", "/menu-items/{item_id}/recommendations", None, 200, 1, [("GET", "/menu-items/{item_id}/recommendations", None)]),
+    ("customer recommendations (cold)", "GET", "/customers/{customer_id}/recommendations", None, 200, 2),
+    ("customer recommendations", "GET", "/customers/{customer_id}/recommendations", None, 200, 2, [("GET", "/customers/{customer_id}/recommendations", None)]),
+    ("customer order history", "GET", "/customers/{customer_id}/orders", None, 200, 1),
+    ("customer order history (missing)", "GET", "/customers/999999/orders", None, 404, 2),
+    ("restaurant orders", "GET", "/restaurants/{restaurant_id}/orders", None, 200, 1),
+    ("review undelivered order", "POST", "/orders/{order_id}/review", {"rating": 5, "comment": "Counted"}, 400, 1),
+    ("update order status", "PUT", "/orders/{order_id}/status", {"status": "confirmed"}, 200, 1),
+    ("update order status (illegal)", "PUT", "/orders/{order_id}/status", {"status": "delivered"}, 409, 2),
+    ("update order status (preparing)", "PUT", "/orders/{order_id}/status", {"status": "preparing"}, 200, 1, CONFIRM),
+    ("update order status (out for delivery)", "PUT", "/orders/{order_id}/status", {"status": "out_for_delivery"}, 200, 1, CONFIRM + PREPARE),
+    ("update order status (delivered)", "PUT", "/orders/{order_id}/status", {"status": "delivered"}, 200, 2, CONFIRM + PREPARE + DISPATCH),
+    # More orders waiting than kitchen stations: the cancellation moves the others' estimates
+    ("cancel order (others queued)", "PUT", "/orders/{order_id}/status", {"status": "cancelled"}, 200, 3, REORDER * 4),
+    ("cancel order (others queued, queue not loaded)", "PUT", "/orders/{order_id}/status", {"status": "cancelled"}, 200, 4, REORDER * 4),
+    ("deliver order (others queued)", "PUT", "/orders/{order_id}/status", {"status": "delivered"}, 200, 2, CONFIRM + PREPARE + DISPATCH + REORDER * 4),
+    ("review order", "POST", "/orders/{order_id}/review", {"rating": 4, "comment": "Counted"}, 201, 3, DELIVER),
+    ("review order (duplicate)", "POST", "/orders/{order_id}/review", {"rating": 4, "comment": "Counted"}, 400, 1, DELIVER + REVIEW),
+    ("restaurant reviews", "GET", "/restaurants/{restaurant_id}/reviews", None, 200, 2, DELIVER + REVIEW),
+    ("customer reviews", "GET", "/customers/{customer_id}/reviews", None, 200, 2, DELIVER + REVIEW),
+    ("restaurant analytics", "GET", "/restaurants/{restaurant_id}/analytics", None, 200, 2, DELIVER + REVIEW),
+    ("delete menu item", "DELETE", "/menu-items/{item2_id}", None, 200, 4),
+    ("delete menu item (missing)", "DELETE", "/menu-items/999999", None, 404, 2),
+    ("delete menu item (ordered)", "DELETE", "/menu-items/{item_id}", None, 409, 2),
+    ("delete restaurant", "DELETE", "/restaurants/{idle_restaurant_id}", None, 200, 15),
+    ("delete restaurant (missing)", "DELETE", "/restaurants/999999", None, 404, 1),
+    ("delete customer", "DELETE", "/customers/{customer_id}", None, 204, 13),
+    ("delete customer (several orders)", "DELETE", "/customers/{customer_id}", None, 204, 15, DELIVER + REVIEW + REORDER * 3),
+    # Orders already in the rollups are subtracted; open ones leave a kitchen queue loaded for it
+    ("delete customer (several orders, jobs run, queue not loaded)", "DELETE", "/customers/{customer_id}", None, 204, 20, DELIVER + REVIEW + REORDER * 4),
+]
+
+_unique = itertools.count(1)
+
+def fill(value, ids):
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+@pytest.fixture
+def statements():
+    sent = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("BEGIN", "PRAGMA", "COMMIT", "ROLLBACK")):
+            sent.append(statement)
+
+    for counted_engine in {engine, read_engine}:
+        event.listen(counted_engine.sync_engine, "before_cursor_execute", count)
+    yield sent
+    for counted_engine in {engine, read_engine}:
+        event.remove(counted_engine.sync_engine, "before_cursor_execute", count)
+
+@pytest.mark.parametrize("label, method, path, body, expected_status, budget, setup", [
+    pytest.param(*endpoint, *([()] if len(endpoint) == 6 else []), id=endpoint[0]) for endpoint in ENDPOINTS
+])
+async def test_statement_budget(client, factory, run_jobs, statements, label, method, path, body, expected_status, budget, setup):
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+    item2 = await factory.menu_item(restaurant["id"], category="Side Dish", price="3.49", preparation_time=5)
+    order = await factory.order(customer["id"], restaurant["id"], [(item["id"], 1)])
+    ids = {
+        "customer_id": customer["id"], "customer_email": customer["email"], "restaurant_id": restaurant["id"],
+        "item_id": item["id"], "item_name": item["name"], "item2_id": item2["id"], "order_id": order["id"],
+        "n": next(_unique),
+    }
+    # A cold recommendation model: only the setup requests below build it
+    recommender.reset()
+    if "{idle_restaurant_id}" in path:
+        # A restaurant with a few menu items and no orders
+        idle = await factory.restaurant()
+        for _ in range(3):
+            await factory.menu_item(idle["id"])
+        ids["idle_restaurant_id"] = idle["id"]
+    for setup_method, setup_path, setup_body in setup:
+        response = await client.request(setup_method, fill(setup_path, ids), json=fill(setup_body, ids))
+        assert response.status_code < 400, response.text
+    headers = {}
+    if "current copy" in label:
+        headers["If-None-Match"] = (await client.get(fill(path, ids))).headers["etag"]
+    elif "stale copy" in label:
+        headers["If-None-Match"] = '"stale"'
+
+    if "jobs run" in label:
+        await run_jobs()
+    menu_cache.clear()
+    if "queue not loaded" in label:
+        # As on a worker that has not served this restaurant's kitchen queue yet
+        eta_engine.forget(restaurant["id"])
+    statements.clear()
+    response = await client.request(method, fill(path, ids), json=fill(body, ids), headers=headers)
+    assert response.status_code == expected_status, response.text
+    assert len(statements) <= budget, "\n".join(statements)
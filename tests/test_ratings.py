@@ -0,0 +1,121 @@
+import pytest
+from sqlalchemy import func, select
+
+from api.crud.review import RATING_JOB, recompute_restaurant_ratings
+from api.models.job import Job
+from api.models.restaurant import Restaurant
+from api.models.review import Review
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def delivered(factory):
+    """A restaurant, and a coroutine function delivering an order from it to a new customer."""
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"])
+
+    async def deliver() -> dict:
+        customer = await factory.customer()
+        return await factory.delivered_order(customer["id"], restaurant["id"], [(item["id"], 1)])
+    return restaurant, deliver
+
+async def review(client, order_id: int, rating: int):
+    response = await client.post(f"/orders/{order_id}/review", json={"rating": rating, "comment": "Fine"})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def aggregates(db_session, restaurant_id: int):
+    async with db_session() as db:
+        row = (await db.execute(
+            select(Restaurant.rating, Restaurant.rating_sum, Restaurant.rating_count).where(Restaurant.id == restaurant_id)
+        )).one()
+        average = (await db.execute(
+            select(func.round(func.avg(Review.rating), 2)).where(Review.restaurant_id == restaurant_id)
+        )).scalar_one()
+    return tuple(row), average
+
+async def test_rating_follows_reviews_once_jobs_run(client, delivered, run_jobs, db_session):
+    restaurant, deliver = delivered
+    for rating in (5, 4, 4):
+        await review(client, (await deliver())["id"], rating)
+    # The reviews are in; the rating catches up when their jobs run
+    assert (await client.get(f"/restaurants/{restaurant['id']}")).json()["rating"] == 0.0
+
+    await run_jobs()
+    (rating, rating_sum, rating_count), average = await aggregates(db_session, restaurant["id"])
+    assert (rating_sum, rating_count) == (13, 3)
+    assert rating == average == 4.33
+    assert (await client.get(f"/restaurants/{restaurant['id']}")).json()["rating"] == 4.33
+
+async def test_rating_reaches_the_cached_menu_payload(client, delivered, run_jobs):
+    restaurant, deliver = delivered
+    path = f"/restaurants/{restaurant['id']}/with-menu"
+    assert (await client.get(path)).json()["rating"] == 0.0
+    await review(client, (await deliver())["id"], 3)
+    await run_jobs()
+    assert (await client.get(path)).json()["rating"] == 3.0
+
+async def test_recompute_matches_the_running_aggregates(client, delivered, run_jobs, db_session):
+    restaurant, deliver = delivered
+    for rating in (1, 2):
+        await review(client, (await deliver())["id"], rating)
+    await run_jobs()
+    # One review whose job is still pending when the ratings are rebuilt
+    await review(client, (await deliver())["id"], 5)
+
+    async with db_session() as db:
+        await recompute_restaurant_ratings(db)
+    # The rebuild counted the pending review and cancelled its job
+    await run_jobs()
+    (rating, rating_sum, rating_count), average = await aggregates(db_session, restaurant["id"])
+    assert (rating_sum, rating_count) == (8, 3)
+    assert rating == average == 2.67
+
+@pytest.mark.parametrize("case, status", [("undelivered", 400), ("reviewed", 400), ("missing", 404)])
+async def test_rejected_review_leaves_the_rating_alone(client, factory, delivered, run_jobs, db_session, case, status):
+    restaurant, deliver = delivered
+    order = await deliver()
+    await review(client, order["id"], 4)
+    if case == "undelivered":
+        customer = await factory.customer()
+        item = (await client.get(f"/restaurants/{restaurant['id']}/menu")).json()[0]
+        order_id = (await factory.order(customer["id"], restaurant["id"], [(item["id"], 1)]))["id"]
+    else:
+        order_id = order["id"] if case == "reviewed" else 999999
+
+    response = await client.post(f"/orders/{order_id}/review", json={"rating": 1})
+    assert response.status_code == status
+    await run_jobs()
+    assert (await aggregates(db_session, restaurant["id"]))[0] == (4.0, 4, 1)
+
+async def test_deleted_customer_reviews_leave_the_rating(client, factory, delivered, run_jobs, db_session):
+    restaurant, _ = delivered
+    item = (await client.get(f"/restaurants/{restaurant['id']}/menu")).json()[0]
+    leaving, staying = await factory.customer(), await factory.customer()
+    for customer, rating in ((leaving, 5), (staying, 3), (leaving, 4)):
+        order = await factory.delivered_order(customer["id"], restaurant["id"], [(item["id"], 1)])
+        await review(client, order["id"], rating)
+        if rating != 4:
+            await run_jobs()
+    path = f"/restaurants/{restaurant['id']}/with-menu"
+    assert (await client.get(path)).json()["rating"] == 4.0
+
+    # One counted review and one whose rating job is still pending
+    assert (await client.delete(f"/customers/{leaving['id']}")).status_code == 204
+    assert (await aggregates(db_session, restaurant["id"]))[0] == (3.0, 3, 1)
+    assert (await client.get(path)).json()["rating"] == 3.0
+
+    # The pending job was cancelled with the review, so it cannot count a later
+    # review of an order that reuses the id
+    async with db_session() as db:
+        assert (await db.execute(select(func.count()).select_from(Job).where(Job.kind == RATING_JOB))).scalar_one() == 0
+    await run_jobs()
+    assert (await aggregates(db_session, restaurant["id"]))[0] == (3.0, 3, 1)
+
+async def test_rating_kept_when_the_last_review_goes(client, factory, delivered, run_jobs, db_session):
+    restaurant, deliver = delivered
+    order = await deliver()
+    await review(client, order["id"], 2)
+    await run_jobs()
+    assert (await client.delete(f"/customers/{order['customer_id']}")).status_code == 204
+    assert (await aggregates(db_session, restaurant["id"]))[0] == (2.0, 0, 0)
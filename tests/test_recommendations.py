@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from api.utils import recommender
+from api.utils.recommender import CoOccurrenceModel
+
+pytestmark = pytest.mark.anyio
+
+def test_cooccurrence_counts_orders_not_lines():
+    # Order 1 has the dosa on two lines
+    item_ids, matrix, order_ids = CoOccurrenceModel._cooccurrence(np.array([1, 1, 1, 2, 2, 5]), np.array([10, 10, 20, 10, 30, 20]))
+    assert item_ids.tolist() == [10, 20, 30]
+    assert matrix.toarray().tolist() == [[2, 1, 1], [1, 2, 0], [1, 0, 1]]
+    assert order_ids.tolist() == [1, 2, 5]
+
+@pytest.fixture
+def model():
+    """A fresh co-occurrence model, built from the database on its first query."""
+    recommender.reset()
+    yield
+    recommender.reset()
+
+@pytest.fixture
+async def menu(client, factory):
+    """A customer and a restaurant with a dosa, chutney, lassi, halwa and vada."""
+    customer = await factory.customer()
+    restaurant = await factory.restaurant()
+    names = ["dosa", "chutney", "lassi", "halwa", "vada"]
+    items = {name: (await factory.menu_item(restaurant["id"], name=f"Recommended {name}"))["id"] for name in names}
+
+    async def basket(*names, customer_id=customer["id"]) -> dict:
+        return await factory.order(customer_id, restaurant["id"], [(items[name], 1) for name in names])
+    return customer, items, basket
+
+async def recommended(client, item_id: int, **params) -> list:
+    response = await client.get(f"/menu-items/{item_id}/recommendations", params=params)
+    assert response.status_code == 200, response.text
+    return [(item["id"], round(item["score"], 2)) for item in response.json()]
+
+async def fill(client, items, basket):
+    for _ in range(3):
+        await basket("dosa", "chutney")
+    await basket("dosa", "lassi", "vada")
+    await basket("dosa")
+    await basket("chutney", "halwa")
+    # Off the menu now: never recommended
+    assert (await client.put(f"/menu-items/{items['vada']}", json={"is_available": False})).status_code == 200
+
+async def test_items_ordered_together_rank_first(client, model, menu):
+    _, items, basket = menu
+    await fill(client, items, basket)
+    # Share of the dosa's five orders that also had each item; the vada is unavailable
+    assert await recommended(client, items["dosa"]) == [(items["chutney"], 0.6), (items["lassi"], 0.2)]
+    assert await recommended(client, items["chutney"]) == [(items["dosa"], 0.75), (items["halwa"], 0.25)]
+    assert await recommended(client, items["dosa"], limit=1) == [(items["chutney"], 0.6)]
+    # Ordered, but never with anything else
+    assert await recommended(client, items["halwa"]) == [(items["chutney"], 1.0)]
+
+@pytest.mark.parametrize("merge_threshold", [recommender.MERGE_THRESHOLD, 1])
+async def test_orders_after_the_build_match_a_rebuild(client, model, menu, monkeypatch, merge_threshold):
+    monkeypatch.setattr(recommender, "MERGE_THRESHOLD", merge_threshold)
+    _, items, basket = menu
+    await fill(client, items, basket)
+    await recommended(client, items["dosa"])  # builds the matrix
+
+    # Recorded as they are placed, into the pending delta or merged straight away
+    for _ in range(4):
+        await basket("dosa", "lassi")
+    incremental = {name: await recommended(client, item_id) for name, item_id in items.items()}
+    assert incremental["dosa"] == [(items["lassi"], 0.56), (items["chutney"], 0.33)]
+
+    recommender.reset()
+    assert {name: await recommended(client, item_id) for name, item_id in items.items()} == incremental
+
+async def test_orders_committed_out_of_id_order(client, model, menu, monkeypatch):
+    _, items, basket = menu
+    await fill(client, items, basket)
+    await recommended(client, items["dosa"])  # builds the matrix
+
+    # Hold back what place_order records, then replay it newest first and twice over
+    held = []
+    monkeypatch.setattr(recommender, "record_order", lambda order_id, menu_item_ids: held.append((order_id, menu_item_ids)))
+    await basket("dosa", "lassi")
+    await basket("halwa", "lassi")
+    monkeypatch.undo()
+    for order_id, menu_item_ids in reversed(held * 2):
+        recommender.record_order(order_id, menu_item_ids)
+    incremental = {name: await recommended(client, item_id) for name, item_id in items.items()}
+    assert incremental["lassi"] == [(items["dosa"], 0.67), (items["halwa"], 0.33)]
+
+    recommender.reset()
+    assert {name: await recommended(client, item_id) for name, item_id in items.items()} == incremental
+
+async def test_unknown_and_unordered_items(client, model, menu):
+    _, items, _ = menu
+    assert await recommended(client, items["halwa"]) == []
+    assert (await client.get("/menu-items/999999/recommendations")).status_code == 404
+
+async def test_customer_recommendations_skip_what_they_ordered(client, factory, model, menu):
+    customer, items, basket = menu
+    await fill(client, items, basket)
+    newcomer = await factory.customer()
+    await basket("dosa", customer_id=newcomer["id"])
+
+    response = await client.get(f"/customers/{newcomer['id']}/recommendations")
+    assert response.status_code == 200
+    assert [(item["id"], round(item["score"], 2)) for item in response.json()] == [(items["chutney"], 0.5), (items["lassi"], 0.17)]
+    # Every menu item is in the first customer's history
+    assert (await client.get(f"/customers/{customer['id']}/recommendations")).json() == []
+    assert (await client.get("/customers/999999/recommendations")).status_code == 404
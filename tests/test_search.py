@@ -0,0 +1,142 @@
+import pytest
+from sqlalchemy import select
+
+from api.models.menu_item import MenuItem
+from api.utils import search
+from api.utils.search import FTS5Backend, InMemoryBackend, tokenize
+
+pytestmark = pytest.mark.anyio
+
+def test_tokenize_folds_case_and_diacritics():
+    assert tokenize("Crème Brûlée, PANEER-tikka_2") == ["creme", "brulee", "paneer", "tikka", "2"]
+    assert tokenize(None) == tokenize("") == tokenize(" ,.; ") == []
+
+@pytest.fixture
+async def dishes(client, factory):
+    """A restaurant whose menu gives the ranking something to order."""
+    restaurant = await factory.restaurant(name="Quokka Curry House", cuisine_type="Quokka Fusion")
+    await factory.restaurant(name="Quokkaville Grill", cuisine_type="Barbecue")
+    await factory.restaurant(name="Harbour Fish", cuisine_type="Quokka Seafood Quokka")
+    menu = [
+        ("Quokka Paneer Tikka", "Smoky paneer from the quokka tandoor"),
+        ("Quokka Paneer Butter Masala", "Creamy"),
+        ("Garlic Naan", "Baked in the quokka tandoor, brushed with garlic butter"),
+        ("Quokka Crème Brûlée", None),
+        ("Mango Lassi", "Sweet yoghurt drink, a quokka favourite"),
+        ("Quokkaberry Sorbet", "Tart"),
+    ]
+    items = {}
+    for name, description in menu:
+        fields = {"description": description} if description else {}
+        if name == "Mango Lassi":
+            fields["category"] = "Beverage"
+        items[name] = await factory.menu_item(restaurant["id"], name=name, **fields)
+    return items
+
+async def ranked(db, backend, kind: str, text: str, query=None, limit: int = 100) -> list:
+    """Every id the backend returns for `text`, following the cursor."""
+    model = search.SEARCHES[kind].model
+    query = select(model.id) if query is None else query
+    ids, cursor = [], None
+    while True:
+        page = await backend.search(db, kind, tokenize(text), query, cursor, limit, as_dicts=True)
+        ids.extend(row["id"] for row in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("kind, text", [
+    ("menu_items", "quokka"),
+    ("menu_items", "quokka paneer"),
+    ("menu_items", "quok tand"),
+    ("menu_items", "creme brulee"),
+    ("menu_items", "QUOKKA garlic"),
+    ("menu_items", "quokka nothing-like-this"),
+    ("restaurants", "quokka"),
+    ("restaurants", "quokka fusion"),
+])
+async def test_fallback_ranks_like_fts5(dishes, db_session, kind, text):
+    async with db_session() as db:
+        expected = await ranked(db, FTS5Backend(), kind, text)
+        # A fresh index, loaded from the same rows on its first search
+        assert await ranked(db, InMemoryBackend(), kind, text) == expected
+        # Small pages cross the same (score, id) boundaries
+        assert await ranked(db, InMemoryBackend(), kind, text, limit=2) == expected
+
+async def test_fallback_filters_like_fts5(dishes, db_session):
+    query = select(MenuItem.id).where(MenuItem.category == "Main Course")
+    async with db_session() as db:
+        expected = await ranked(db, FTS5Backend(), "menu_items", "quokka", query)
+        assert dishes["Mango Lassi"]["id"] not in expected
+        assert await ranked(db, InMemoryBackend(), "menu_items", "quokka", query, limit=2) == expected
+
+async def test_fallback_matching_like_fts5(dishes, db_session):
+    async with db_session() as db:
+        for text in ("quokka paneer", "sorbet", "quokkab"):
+            terms = tokenize(text)
+            fts_ids = (await db.execute(select(MenuItem.id).where(await FTS5Backend().matching(db, "menu_items", terms)))).scalars()
+            memory_ids = (await db.execute(select(MenuItem.id).where(await InMemoryBackend().matching(db, "menu_items", terms)))).scalars()
+            assert sorted(memory_ids) == sorted(fts_ids)
+
+async def test_fallback_follows_committed_writes_only(dishes, db_session):
+    fallback = InMemoryBackend()
+    async with db_session() as db:
+        await fallback.rebuild(db, "menu_items")
+        naan = dishes["Garlic Naan"]["id"]
+
+        # Rolled back: the index keeps the stored name
+        await db.execute(MenuItem.__table__.update().where(MenuItem.id == naan).values(name="Wallaby Naan"))
+        await fallback.index(db, "menu_items", [naan])
+        await db.rollback()
+        assert naan not in await ranked(db, fallback, "menu_items", "wallaby")
+
+        await db.execute(MenuItem.__table__.update().where(MenuItem.id == naan).values(name="Wallaby Naan"))
+        await fallback.index(db, "menu_items", [naan])
+        # Keep the FTS5 tables in step for the tests after this one
+        await FTS5Backend().index(db, "menu_items", [naan])
+        # Not applied before the commit
+        assert naan not in await ranked(db, fallback, "menu_items", "wallaby")
+        await db.commit()
+        assert naan in await ranked(db, fallback, "menu_items", "wallaby")
+
+        await fallback.remove(db, "menu_items", [naan])
+        await db.commit()
+        assert naan not in await ranked(db, fallback, "menu_items", "naan")
+
+async def test_search_endpoints(client, dishes):
+    async def pages(path: str, q: str, limit: int) -> list:
+        names, cursor = [], None
+        while True:
+            response = await client.get(path, params={"q": q, "limit": limit, **({"cursor": cursor} if cursor else {})})
+            assert response.status_code == 200, response.text
+            names.extend(entry["name"] for entry in response.json()["items"])
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return names
+
+    one_page = await pages("/menu-items/search", "quokka paneer", limit=100)
+    assert set(one_page) == {"Quokka Paneer Tikka", "Quokka Paneer Butter Masala"}
+    assert await pages("/menu-items/search", "quokka paneer", limit=1) == one_page
+    assert set(await pages("/restaurants/search", "quokka fusion", limit=1)) == {"Quokka Curry House"}
+    assert (await client.get("/menu-items/search", params={"q": " ,. "})).json()["items"] == []
+
+@pytest.mark.parametrize("category", [None, "Main Course"])
+async def test_only_the_newest_candidates_are_ranked(dishes, db_session, monkeypatch, category):
+    query = select(MenuItem.id)
+    if category:
+        query = query.where(MenuItem.category == category)
+    async with db_session() as db:
+        matches = await ranked(db, FTS5Backend(), "menu_items", "quokka", query)
+        monkeypatch.setattr(search, "SEARCH_CANDIDATES", 3)
+        expected = await ranked(db, FTS5Backend(), "menu_items", "quokka", query)
+        assert sorted(expected) == sorted(matches)[-3:]
+        assert await ranked(db, FTS5Backend(), "menu_items", "quokka", query, limit=1) == expected
+        assert await ranked(db, InMemoryBackend(), "menu_items", "quokka", query, limit=2) == expected
+
+async def test_short_words_match_whole_words(db_session, factory):
+    restaurant = await factory.restaurant()
+    item = await factory.menu_item(restaurant["id"], name="Vitamin C Quokkapop")
+    async with db_session() as db:
+        for backend in (FTS5Backend(), InMemoryBackend()):
+            assert item["id"] in await ranked(db, backend, "menu_items", "c quokkapop")
+            assert item["id"] not in await ranked(db, backend, "menu_items", "v quokkapop")
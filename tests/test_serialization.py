@@ -0,0 +1,39 @@
+import pytest
+
+from api.utils import serialization
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def lists(factory, run_jobs):
+    """A delivered order and a nearby restaurant, so every list route has rows to return."""
+    customer = await factory.customer()
+    restaurant = await factory.restaurant(name="Serialized Wombat Diner", latitude=-42.88, longitude=147.33)
+    main = await factory.menu_item(restaurant["id"], name="Wombat Stew", price="14.25")
+    side = await factory.menu_item(restaurant["id"], name="Wombat Chips", price="4.00", is_vegetarian=True)
+    await factory.delivered_order(customer["id"], restaurant["id"], [(main["id"], 2), (side["id"], 1)])
+    await run_jobs()
+    return [
+        "/menu-items/?limit=5",
+        "/menu-items/search?q=wombat&facets=true",
+        f"/menu-items/{main['id']}/recommendations",
+        f"/customers/{customer['id']}/orders",
+        f"/customers/{customer['id']}/recommendations",
+        f"/restaurants/{restaurant['id']}/orders",
+        "/restaurants/search?q=wombat",
+        "/restaurants/nearby?latitude=-42.88&longitude=147.33",
+        "/restaurants/open?at=12:00&limit=5",
+    ]
+
+async def test_fast_responses_match_the_response_model(client, lists, monkeypatch):
+    validated = {}
+    for path in lists:
+        response = await client.get(path)
+        assert response.status_code == 200, response.text
+        validated[path] = response.json()
+
+    monkeypatch.setattr(serialization, "FAST_JSON_RESPONSES", True)
+    for path in lists:
+        response = await client.get(path)
+        assert response.status_code == 200, response.text
+        assert response.json() == validated[path], path